@@ -1,12 +1,14 @@
 
 from promptflow.core import tool
+from telemetry import instrument
 import logging
 
 # The inputs section will change based on the arguments of the tool function, after you save the code
 # Adding type to arguments and return value will help the system show the types properly
 # Please update the function name/signature per need
 @tool
-def my_python_tool(input1: object, input2: object, input3: object, input4: object, input5: object) -> object:
+@instrument("aggregation")
+def my_python_tool(input1: object, input2: object, input3: object, input4: object, input5: object, input6: object = None) -> object:
     #check witch input is not null and return it
     
     if input1:
@@ -17,6 +19,8 @@ def my_python_tool(input1: object, input2: object, input3: object, input4: objec
         return input3
     elif input4:
         return input4
+    elif input6:
+        return input6
     elif input5 == False or input5 == True:
         out = {"Found": input5}
         return out
@@ -1,25 +1,17 @@
 
 from promptflow import tool
+from telemetry import instrument
 from promptflow.connections import CustomConnection
-from azure.core.credentials import AzureKeyCredential
-from azure.search.documents import SearchClient
+from search_backend import get_search_backend
+from index_presence import file_indexed
 @tool
+@instrument("check_index")
 def my_python_tool(filename: str, groups: str, searchconnection:CustomConnection) -> str:
-    search_endpoint = searchconnection.search_endpoint
     search_index = searchconnection.search_document_index
-    search_key = searchconnection.search_key    
 
-    search_client = SearchClient(search_endpoint, search_index, AzureKeyCredential(search_key))
+    backend = get_search_backend(searchconnection)
     # filter for the groups and where filename is the same
-    #group_filter = "adgroup/any(t: search.in(t, '{}'))".format(",".join(groups))
-    filter = "filename eq '{}'".format(filename)
-    results = search_client.search(
-        search_text="*",  # Use '*' to match all documents
-        filter=filter,
-        include_total_count=True  # Include the total count in the results
-    )
-    count = results.get_count()  # Get the total count of matching documents
-    if count:
-        return True
-    else:
-        return False
\ No newline at end of file
+    #filters = {"filename": filename, "adgroup": groups}
+    # Count-only query on the exact filename, answered from the per-worker
+    # cache while it is fresh
+    return file_indexed(backend.count, search_index, filename)
\ No newline at end of file
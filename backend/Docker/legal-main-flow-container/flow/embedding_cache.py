@@ -0,0 +1,166 @@
+import hashlib
+import os
+import tempfile
+import threading
+import time
+from array import array
+from collections import OrderedDict
+
+from bounded_sqlite import BoundedTable, remember
+
+# -----------------------------
+# Configuration
+# -----------------------------
+# The same settings are read by the indexing scripts and the PromptFlow tools,
+# so pointing both at one path lets them share a single cache on a machine.
+DEFAULT_PATH = os.environ.get(
+    "ALLY_EMBEDDING_CACHE_PATH", os.path.join(tempfile.gettempdir(), "ally-embedding-cache.sqlite")
+)
+DEFAULT_MAX_BYTES = int(float(os.environ.get("ALLY_EMBEDDING_CACHE_MAX_MB", "512")) * 1024 * 1024)
+DEFAULT_MEMORY_ITEMS = int(os.environ.get("ALLY_EMBEDDING_CACHE_MEMORY_ITEMS", "2048"))
+ENABLED = os.environ.get("ALLY_EMBEDDING_CACHE", "on").lower() not in ("0", "off", "false", "no")
+
+
+def cache_key(deployment, text):
+    return hashlib.sha256(f"{deployment}\x00{text}".encode("utf-8")).hexdigest()
+
+
+class EmbeddingCache:
+    """Embedding cache keyed by deployment name plus a hash of the text.
+
+    Lookups go to an in-process LRU first and then to a SQLite file, which
+    several processes (gunicorn workers, indexing runs) can share. The file is
+    kept under `max_bytes` by evicting the least recently used vectors.
+    Vectors are stored as float32.
+    """
+
+    def __init__(self, path=DEFAULT_PATH, max_bytes=DEFAULT_MAX_BYTES, memory_items=DEFAULT_MEMORY_ITEMS):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.memory_items = memory_items
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self._table = BoundedTable(
+            path, "embeddings",
+            "key TEXT PRIMARY KEY, deployment TEXT NOT NULL, vector BLOB NOT NULL,"
+            " size INTEGER NOT NULL, last_used REAL NOT NULL",
+            max_bytes,
+        )
+
+    # -----------------------------
+    # Lookups
+    # -----------------------------
+    def get_many(self, deployment, texts):
+        """Return a list aligned with `texts`, with None for every miss."""
+        keys = [cache_key(deployment, text) for text in texts]
+        vectors = [None] * len(texts)
+        with self._lock:
+            disk_keys = []
+            for i, key in enumerate(keys):
+                if key in self._memory:
+                    self._memory.move_to_end(key)
+                    vectors[i] = self._memory[key]
+                    self.memory_hits += 1
+                else:
+                    disk_keys.append(i)
+
+            found = self._read([keys[i] for i in disk_keys])
+            for i in disk_keys:
+                vector = found.get(keys[i])
+                if vector is None:
+                    self.misses += 1
+                    continue
+                vectors[i] = vector
+                self.disk_hits += 1
+                self._remember(keys[i], vector)
+        return vectors
+
+    def get(self, deployment, text):
+        return self.get_many(deployment, [text])[0]
+
+    def put_many(self, deployment, texts, vectors):
+        now = time.time()
+        rows = []
+        with self._lock:
+            for text, vector in zip(texts, vectors):
+                key = cache_key(deployment, text)
+                self._remember(key, list(vector))
+                blob = array("f", vector).tobytes()
+                rows.append((key, deployment, blob, len(blob), now))
+            self._table.insert(rows, [row[3] for row in rows])
+
+    def put(self, deployment, text, vector):
+        self.put_many(deployment, [text], [vector])
+
+    def embed(self, deployment, texts, embed_fn):
+        """Return embeddings for `texts`, calling `embed_fn(missing_texts)`
+        only for texts that are not cached. Duplicates are embedded once."""
+        vectors = self.get_many(deployment, texts)
+        missing = list(dict.fromkeys(text for text, vector in zip(texts, vectors) if vector is None))
+        if missing:
+            fresh = dict(zip(missing, embed_fn(missing)))
+            self.put_many(deployment, missing, [fresh[text] for text in missing])
+            vectors = [fresh[text] if vector is None else vector for text, vector in zip(texts, vectors)]
+        return vectors
+
+    # -----------------------------
+    # Reporting
+    # -----------------------------
+    def stats(self):
+        with self._lock:
+            entries, size = self._table.count(), self._table.total
+            lookups = self.memory_hits + self.disk_hits + self.misses
+            return {
+                "memory_hits": self.memory_hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "hit_rate": (self.memory_hits + self.disk_hits) / lookups if lookups else 0.0,
+                "entries": entries,
+                "bytes": size,
+            }
+
+    def report(self):
+        s = self.stats()
+        return (f"embedding cache: {s['memory_hits']} memory hits, {s['disk_hits']} disk hits, "
+                f"{s['misses']} misses ({s['hit_rate']:.0%} saved), {s['entries']} entries, "
+                f"{s['bytes'] / 1024 / 1024:.1f} MB")
+
+    # -----------------------------
+    # Internals (called with the lock held)
+    # -----------------------------
+    def _remember(self, key, vector):
+        remember(self._memory, key, vector, self.memory_items)
+
+    def _read(self, keys):
+        found = {}
+        # SQLite limits the number of bound parameters per statement
+        for start in range(0, len(keys), 500):
+            chunk = keys[start:start + 500]
+            placeholders = ",".join("?" * len(chunk))
+            rows = self._table.db.execute(
+                f"SELECT key, vector FROM embeddings WHERE key IN ({placeholders})", chunk
+            ).fetchall()
+            for key, blob in rows:
+                found[key] = array("f", blob).tolist()
+            if rows:
+                self._table.touch(chunk, time.time())
+        return found
+
+
+_default_cache = None
+_default_lock = threading.Lock()
+
+
+def get_default_cache():
+    """Process-wide cache built from the ALLY_EMBEDDING_CACHE_* settings,
+    or None when caching is turned off."""
+    global _default_cache
+    if not ENABLED:
+        return None
+    with _default_lock:
+        if _default_cache is None:
+            _default_cache = EmbeddingCache()
+        return _default_cache
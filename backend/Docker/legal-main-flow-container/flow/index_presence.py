@@ -0,0 +1,86 @@
+import os
+import threading
+import time
+
+import telemetry
+
+# -----------------------------
+# Configuration
+# -----------------------------
+# The add-in asks whether the open document is indexed (query_type 99) every
+# time the taskpane opens. Answers are kept per worker: a file found in the
+# index is trusted for POSITIVE_TTL, a file not found only for NEGATIVE_TTL,
+# so one indexed by another process shows up soon after. An indexer running
+# in the worker's process marks the files it writes with `mark_indexed`.
+ENABLED = os.environ.get("ALLY_INDEX_CHECK_CACHE", "on").lower() not in ("0", "off", "false", "no")
+POSITIVE_TTL = float(os.environ.get("ALLY_INDEX_CHECK_TTL", "300"))
+NEGATIVE_TTL = float(os.environ.get("ALLY_INDEX_CHECK_NEGATIVE_TTL", "15"))
+MAX_ENTRIES = int(os.environ.get("ALLY_INDEX_CHECK_MAX_ENTRIES", "4096"))
+
+
+class PresenceCache:
+    """Whether (index, filename) had paragraphs in the index, and when that
+    was read."""
+
+    def __init__(self, positive_ttl=POSITIVE_TTL, negative_ttl=NEGATIVE_TTL, max_entries=MAX_ENTRIES):
+        self.positive_ttl = positive_ttl
+        self.negative_ttl = negative_ttl
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._entries = {}  # (index, filename) -> (indexed, when)
+
+    def get(self, index_name, filename):
+        """True or False while the answer is fresh, None otherwise."""
+        with self._lock:
+            entry = self._entries.get((index_name, filename))
+        if entry is None:
+            return None
+        indexed, when = entry
+        ttl = self.positive_ttl if indexed else self.negative_ttl
+        return indexed if time.monotonic() - when <= ttl else None
+
+    def put(self, index_name, filename, indexed):
+        with self._lock:
+            if len(self._entries) >= self.max_entries:
+                # Answers are cheap to read again; start over rather than track recency
+                self._entries.clear()
+            self._entries[(index_name, filename)] = (bool(indexed), time.monotonic())
+
+    def invalidate(self, index_name=None, filename=None):
+        with self._lock:
+            if index_name is None:
+                self._entries.clear()
+            else:
+                self._entries.pop((index_name, filename), None)
+
+
+def file_indexed(count, index_name, filename, node="check_index", cache=None):
+    """Whether `filename` has paragraphs in `index_name`. `count(index_name,
+    filters)` is asked for the number of paragraphs with exactly that
+    filename, and only when the cache has no fresh answer."""
+    cache = cache or get_default_cache()
+    indexed = cache.get(index_name, filename) if ENABLED else None
+    telemetry.record_cache("index_presence", node, "miss" if indexed is None else "hit")
+    if indexed is None:
+        indexed = count(index_name, {"filename": filename}) > 0
+        cache.put(index_name, filename, indexed)
+    return indexed
+
+
+def mark_indexed(index_name, filename, indexed=True, cache=None):
+    """For indexers: record that `filename` was just written to (or removed
+    from) `index_name`."""
+    (cache or get_default_cache()).put(index_name, filename, indexed)
+
+
+_default_cache = None
+_default_lock = threading.Lock()
+
+
+def get_default_cache():
+    """Process-wide cache built from the ALLY_INDEX_CHECK_* settings."""
+    global _default_cache
+    with _default_lock:
+        if _default_cache is None:
+            _default_cache = PresenceCache()
+        return _default_cache
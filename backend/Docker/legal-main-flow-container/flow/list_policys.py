@@ -1,26 +1,19 @@
 
 from promptflow.core import tool
+from telemetry import instrument
 from promptflow.connections import CustomConnection
-from azure.core.credentials import AzureKeyCredential
-from azure.search.documents import SearchClient
+from search_backend import get_search_backend
 
 # The inputs section will change based on the arguments of the tool function, after you save the code
 # Adding type to arguments and return value will help the system show the types properly
 # Please update the function name/signature per need
 @tool
+@instrument("list_policys")
 def list_policy_tool(input:str, searchconnection: CustomConnection) -> object:
-    search_endpoint = searchconnection.search_endpoint
-    search_index = searchconnection.search_policy_index
-    search_key = searchconnection.search_key
-    # use ai azure search to query 
-
-    search_client = SearchClient(search_endpoint, search_index, AzureKeyCredential(search_key))
-    results = search_client.search(
-        search_text="*",  # Use '*' to match all documents
-        select="title,instruction"     # Specify the fields to include in the results
-    )
+    # Served from the per-worker policy catalog instead of scanning the index
+    catalog = get_search_backend(searchconnection).policy_catalog()
     policy_list = []
-    for result in results:
-        policy_list.append({"title": result["title"], "instruction": result["instruction"]})
+    for policy in catalog.policies():
+        policy_list.append({"title": policy["title"], "instruction": policy["instruction"]})
         
     return policy_list
@@ -0,0 +1,111 @@
+import json
+import os
+
+import token_count
+
+# -----------------------------
+# Configuration
+# -----------------------------
+# Every chat prompt is assembled within a token budget: the instructions and
+# the user's text always go in, and the context items (policies, search
+# results), ranked best first, are added until the budget is used up. The
+# budget is per node, ALLY_PROMPT_BUDGET_<NODE> (e.g.
+# ALLY_PROMPT_BUDGET_SUMMARY_DOCUMENT), falling back to ALLY_PROMPT_BUDGET.
+# It covers the prompt only; keep it below the deployment's context length
+# minus the longest response expected.
+DEFAULT_BUDGET = int(os.environ.get("ALLY_PROMPT_BUDGET", "12000"))
+# gpt-4o's encoding; cl100k_base for gpt-4 and gpt-35-turbo deployments
+ENCODING = os.environ.get("ALLY_PROMPT_ENCODING", "o200k_base")
+
+# Tokens the chat format adds around every message, and once per request
+MESSAGE_OVERHEAD = 4
+REQUEST_OVERHEAD = 3
+# A context item is cut down to the room left only when at least this many
+# tokens of it would go in; otherwise it is dropped
+MIN_TRIM_TOKENS = 64
+# When the user's text has to be cut, this share of the budget is kept for
+# the context (if it needs that much): a prompt without policies or search
+# results cannot be answered anyway
+CONTEXT_SHARE = 0.25
+
+def count_tokens(text):
+    return token_count.count_tokens(text, ENCODING)
+
+
+def truncate(text, max_tokens):
+    """The start of `text`, at most `max_tokens` long."""
+    if max_tokens <= 0:
+        return ""
+    if count_tokens(text) <= max_tokens:
+        return text
+    encoding = token_count.get_encoding(ENCODING)
+    if encoding is None:
+        return text[:max_tokens * 4]
+    return encoding.decode(encoding.encode(text, disallowed_special=())[:max_tokens])
+
+
+def message_tokens(messages):
+    return REQUEST_OVERHEAD + sum(MESSAGE_OVERHEAD + count_tokens(str(message["content"])) for message in messages)
+
+
+def compact(value):
+    """Context as JSON without indentation or spaces after separators:
+    the same content as indented JSON or a Python repr in fewer tokens."""
+    return json.dumps(value, ensure_ascii=False, separators=(",", ":"), default=str)
+
+
+def node_budget(node):
+    return int(os.environ.get(f"ALLY_PROMPT_BUDGET_{node.upper()}", DEFAULT_BUDGET))
+
+
+def fit(node, render, items=(), text="", budget=None, serialize=compact, trim_field=None):
+    """Chat messages `render(context, text)` that fit the node's budget.
+
+    `items` are the context items, ranked best first; `context` is
+    `serialize` of those that fit, in order, after which the rest are
+    dropped. The first item that does not fit has its `trim_field` cut to
+    the room left instead, when that room is worth it. `text`, the user's
+    input, is only cut (from the end) when the prompt would not fit with
+    CONTEXT_SHARE of the budget left for context. Prints the budget used
+    and returns (messages, items kept).
+    """
+    budget = node_budget(node) if budget is None else budget
+    items = list(items)
+    text = str(text)
+    # Each item also costs a separator
+    costs = [count_tokens(serialize(item)) + 1 for item in items]
+    base = message_tokens(render(serialize([]), ""))
+    text_tokens = count_tokens(text)
+    reserve = min(sum(costs), int(budget * CONTEXT_SHARE))
+    truncated = base + text_tokens + reserve > budget
+    if truncated:
+        text = truncate(text, budget - base - reserve)
+        text_tokens = count_tokens(text)
+
+    room = budget - base - text_tokens
+    kept = []
+    trimmed = 0
+    for item, cost in zip(items, costs):
+        if cost <= room:
+            kept.append(item)
+            room -= cost
+            continue
+        if trim_field and isinstance(item, dict) and isinstance(item.get(trim_field), str):
+            others = count_tokens(serialize(dict(item, **{trim_field: ""}))) + 1
+            if room - others >= MIN_TRIM_TOKENS:
+                kept.append(dict(item, **{trim_field: truncate(item[trim_field], room - others)}))
+                trimmed += 1
+        break
+
+    messages = render(serialize(kept), text)
+    used = message_tokens(messages)
+    # Items are counted one at a time; drop from the end if that undercounted
+    while used > budget and kept:
+        kept.pop()
+        messages = render(serialize(kept), text)
+        used = message_tokens(messages)
+
+    print(f"{node}: prompt {used} of {budget} tokens, {len(kept)} of {len(items)} context items"
+          + (f" ({trimmed} trimmed)" if trimmed else "")
+          + (f", user text cut to {text_tokens} tokens" if truncated else ""))
+    return messages, kept
@@ -1,16 +1,60 @@
 
+import asyncio
 from promptflow.core import tool
-from openai import AzureOpenAI
+from telemetry import instrument
+from clients import async_openai_client
 from promptflow.connections import CustomConnection
+from embedding_cache import get_default_cache
 
 @tool
-def my_python_tool(input: str, ally: CustomConnection,) -> object:
-    client = AzureOpenAI(  
-        azure_endpoint=ally.openai_endpoint,  
-        api_key=ally.openai_key,  
-        api_version=ally.openai_api_version,
-    )
-
-    response =  client.embeddings.create(input = input, model=ally.openai_embedding_deployment).data[0].embedding
-    
+@instrument("python_text_embedding")
+async def my_python_tool(input: str, ally: CustomConnection,) -> object:
+    return await embed_text(input, ally)
+
+
+async def embed_text(input, ally):
+    # The add-in re-sends the same selection every time "summarize selection"
+    # is clicked, so look the text up before calling the embeddings endpoint
+    cache = get_default_cache()
+    if cache is not None:
+        cached = cache.get(ally.openai_embedding_deployment, input)
+        if cached is not None:
+            print(cache.report())
+            return cached
+
+    client = async_openai_client(ally)
+
+    response =  (await client.embeddings.create(input = input, model=ally.openai_embedding_deployment)).data[0].embedding
+
+    if cache is not None:
+        cache.put(ally.openai_embedding_deployment, input, response)
+        print(cache.report())
     return response
+
+
+# Inputs per embeddings request when a tool embeds many texts at once
+EMBEDDING_BATCH = 16
+
+
+async def embed_texts(inputs, ally):
+    """embed_text for a list of texts: cached texts are not sent again and
+    the rest go out EMBEDDING_BATCH per request, all requests at once."""
+    cache = get_default_cache()
+    deployment = ally.openai_embedding_deployment
+    vectors = cache.get_many(deployment, inputs) if cache is not None else [None] * len(inputs)
+    missing = list(dict.fromkeys(text for text, vector in zip(inputs, vectors) if vector is None))
+    if missing:
+        client = async_openai_client(ally)
+        batches = [missing[i:i + EMBEDDING_BATCH] for i in range(0, len(missing), EMBEDDING_BATCH)]
+        responses = await asyncio.gather(*(
+            client.embeddings.create(input=batch, model=deployment) for batch in batches
+        ))
+        embedded = {}
+        for batch, response in zip(batches, responses):
+            for item in response.data:
+                embedded[batch[item.index]] = item.embedding
+        if cache is not None:
+            cache.put_many(deployment, missing, [embedded[text] for text in missing])
+            print(cache.report())
+        vectors = [vector if vector is not None else embedded[text] for text, vector in zip(inputs, vectors)]
+    return vectors
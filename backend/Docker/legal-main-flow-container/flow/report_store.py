@@ -0,0 +1,266 @@
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+
+import telemetry
+from search_backend import file_version, get_search_backend
+
+# -----------------------------
+# Configuration
+# -----------------------------
+# The full-document review (query_type 1) only changes when the document is
+# re-indexed or a policy it breaches is edited, so each report is built once
+# and kept with the fingerprint it was built from: the file's paragraph
+# count and latest `date` in the document index, and a hash of the
+# referenced policies. Reports are kept per worker and, when
+# ALLY_REPORT_PATH is set, in a SQLite file shared by the workers and the
+# indexing scripts, which build the reports of the files they index.
+ENABLED = os.environ.get("ALLY_REPORTS", "on").lower() not in ("0", "off", "false", "no")
+DEFAULT_PATH = os.environ.get("ALLY_REPORT_PATH") or None
+# How long a report is served before its fingerprint is read again, i.e. how
+# long a re-indexed file can keep serving its old report
+CHECK_INTERVAL = float(os.environ.get("ALLY_REPORT_CHECK_INTERVAL", "30"))
+
+PARAGRAPH_FIELDS = ["title", "summary", "keyphrases", "isCompliant", "CompliantCollection", "NonCompliantCollection"]
+POLICY_FIELDS = ["id", "title", "instruction", "tags", "severity"]
+
+
+class ReportStore:
+    """Full-document reports by filename, each stored as
+    {"document_version", "policy_ids", "policy_version", "report"}: in
+    memory, and in a SQLite file when `path` is given."""
+
+    def __init__(self, path=DEFAULT_PATH, check_interval=CHECK_INTERVAL):
+        self.path = path
+        self.check_interval = check_interval
+        self._lock = threading.Lock()
+        self._memory = {}     # filename -> entry
+        self._checked = {}    # filename -> when its fingerprint last matched
+        self._db = None
+        if path:
+            self._db = sqlite3.connect(path, timeout=30, check_same_thread=False, isolation_level=None)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS reports ("
+                " filename TEXT PRIMARY KEY, document_version TEXT NOT NULL, policy_ids TEXT NOT NULL,"
+                " policy_version TEXT NOT NULL, report TEXT NOT NULL, built_at REAL NOT NULL)"
+            )
+
+    def get(self, filename, shared=False):
+        """The stored entry for `filename`, or None. With `shared`, the
+        SQLite file is read even when this worker holds a copy, to pick up a
+        report another process rebuilt."""
+        with self._lock:
+            entry = self._memory.get(filename)
+            if self._db is None or (entry is not None and not shared):
+                return entry
+            row = self._db.execute(
+                "SELECT document_version, policy_ids, policy_version, report FROM reports WHERE filename = ?",
+                (filename,),
+            ).fetchone()
+            if row is None:
+                return entry
+            entry = {"document_version": row[0], "policy_ids": json.loads(row[1]), "policy_version": row[2],
+                     "report": json.loads(row[3])}
+            self._memory[filename] = entry
+            return entry
+
+    def put(self, filename, entry):
+        with self._lock:
+            self._memory[filename] = entry
+            self._checked[filename] = time.monotonic()
+            if self._db is not None:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO reports VALUES (?, ?, ?, ?, ?, ?)",
+                    (filename, entry["document_version"], json.dumps(entry["policy_ids"]), entry["policy_version"],
+                     json.dumps(entry["report"], ensure_ascii=False), time.time()),
+                )
+
+    def recently_checked(self, filename):
+        with self._lock:
+            return time.monotonic() - self._checked.get(filename, float("-inf")) <= self.check_interval
+
+    def mark_checked(self, filename):
+        with self._lock:
+            self._checked[filename] = time.monotonic()
+
+    def invalidate(self, filename=None):
+        """Drop the report of one file, or of every file."""
+        with self._lock:
+            if filename is None:
+                self._memory.clear()
+                self._checked.clear()
+                if self._db is not None:
+                    self._db.execute("DELETE FROM reports")
+                return
+            self._memory.pop(filename, None)
+            self._checked.pop(filename, None)
+            if self._db is not None:
+                self._db.execute("DELETE FROM reports WHERE filename = ?", (filename,))
+
+
+# -----------------------------
+# Serving
+# -----------------------------
+async def full_document_report(ally, filename, store=None):
+    """The full-document report of `filename`, built only when there is no
+    stored report or the file or a policy it breaches changed since."""
+    backend = get_search_backend(ally)
+    if not ENABLED:
+        report, _ = await build_report(backend, ally.search_document_index, ally.search_policy_index, filename)
+        return report
+
+    store = store or get_default_store()
+    entry = await asyncio.to_thread(store.get, filename)
+    if entry is not None and store.recently_checked(filename):
+        telemetry.record_cache("report", "summary_full_doc", "memory")
+        return entry["report"]
+
+    catalog = backend.policy_catalog()
+    try:
+        document_version = await file_version(backend, ally.search_document_index, filename)
+    except Exception as e:
+        # Without a version no stored report can be trusted; build it afresh
+        print(f"summary_full_doc: version check for '{filename}' failed, rebuilding the report. Error: {e}")
+        document_version = None
+    for shared in (False, True):
+        if shared:
+            # Another worker or the indexing script may have rebuilt it
+            entry = await asyncio.to_thread(store.get, filename, True)
+        if entry is not None and document_version is not None and entry["document_version"] == document_version \
+                and entry["policy_version"] == await policy_version(catalog, entry["policy_ids"]):
+            store.mark_checked(filename)
+            telemetry.record_cache("report", "summary_full_doc", "disk" if shared else "memory")
+            return entry["report"]
+        if store.path is None:
+            break
+
+    telemetry.record_cache("report", "summary_full_doc", "miss")
+    start = time.perf_counter()
+    report, policy_ids = await build_report(backend, ally.search_document_index, ally.search_policy_index, filename)
+    if document_version is not None:
+        await asyncio.to_thread(store.put, filename, {
+            "document_version": document_version, "policy_ids": policy_ids,
+            "policy_version": await policy_version(catalog, policy_ids), "report": report,
+        })
+    print(f"summary_full_doc: report for '{filename}' built ({len(report)} paragraphs, "
+          f"{len(policy_ids)} policies) in {(time.perf_counter() - start) * 1000:.0f} ms")
+    return report
+
+
+async def policy_version(catalog, policy_ids):
+    """Hash of the catalog's copy of the given policies."""
+    policies = await asyncio.to_thread(catalog.get_many, policy_ids)
+    payload = [[policy_id, {field: (policy or {}).get(field) for field in POLICY_FIELDS} if policy else None]
+               for policy_id, policy in sorted(policies.items())]
+    return hashlib.sha256(json.dumps(payload, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
+
+# -----------------------------
+# Building
+# -----------------------------
+async def build_report(backend, document_index, policy_index, filename):
+    """Every paragraph of `filename` in order, with the policies each
+    non-compliant paragraph breaches attached. Returns (report, the ids of
+    the referenced policies)."""
+    results = await backend.scan(
+        document_index,
+        filters={"filename": filename},
+        order_by="ParagraphId",
+        select=PARAGRAPH_FIELDS,  # the embedding is not needed here
+    )
+
+    # Unset fields come back as null
+    entries = [{
+        "title": result.get("title"),
+        "summary": result.get("summary"),
+        "keyphrases": result.get("keyphrases") or [],
+        "isCompliant": result.get("isCompliant") is not False,
+        "CompliantCollection": result.get("CompliantCollection") or [],
+        "NonCompliantCollection": result.get("NonCompliantCollection") or [],
+    } for result in results]
+
+    # Resolve every policy the document breaches in one lookup, then join
+    policyids = {
+        policyid
+        for entry in entries
+        if not entry["isCompliant"]
+        for policyid in entry["NonCompliantCollection"]
+    }
+    policies = await get_policyinfos(policyids, backend, policy_index)
+
+    # If not compliant attach the policies from the NonCompliantCollection list
+    for entry in entries:
+        if not entry["isCompliant"]:
+            policylist = []
+            for policyid in entry["NonCompliantCollection"]:
+                policy = policies.get(policyid)
+                if policy is None:
+                    # Kept as null, as the add-in has always received it
+                    logging.warning(f"No policy info found for ID {policyid}")
+                policylist.append(policy)
+            entry["NonCompliantPolicies"] = policylist
+    return entries, sorted(policyids, key=str)
+
+
+async def get_policyinfos(policyids, backend, policy_index):
+    """Map each policy id to its id,title,instruction,tags,severity (or None).
+
+    Ids are read from the per-worker policy catalog; any the catalog does not
+    know yet (a policy added since its last refresh) are fetched from the
+    index in a single search.in query.
+    """
+    catalog = backend.policy_catalog()
+    found = {}
+    for policyid, policy in (await asyncio.to_thread(catalog.get_many, policyids)).items():
+        found[policyid] = {field: policy[field] for field in POLICY_FIELDS} if policy else None
+
+    missing = [policyid for policyid, policy in found.items() if policy is None]
+    if missing:
+        results = await backend.scan(
+            policy_index,
+            filters={"PolicyId": [str(policyid) for policyid in missing]},
+            select=POLICY_FIELDS + ["PolicyId"],
+            top=len(missing),
+        )
+        by_id = {str(result["PolicyId"]): {field: result[field] for field in POLICY_FIELDS} for result in results}
+        for policyid in missing:
+            found[policyid] = by_id.get(str(policyid))
+    return found
+
+
+# -----------------------------
+# After indexing
+# -----------------------------
+async def rebuild_reports(ally, filenames, removed=(), store=None):
+    """Build the reports of files just indexed and drop those of removed
+    files, for the indexing scripts. Only worth it with a shared
+    ALLY_REPORT_PATH file, which the serving workers read."""
+    store = store or get_default_store()
+    if not ENABLED or store.path is None:
+        return
+    for filename in removed:
+        await asyncio.to_thread(store.invalidate, filename)
+    for filename in filenames:
+        try:
+            await full_document_report(ally, filename, store)
+        except Exception as e:
+            print(f"❌ Failed to build the report of {filename}: {e}")
+
+
+_default_store = None
+_default_lock = threading.Lock()
+
+
+def get_default_store():
+    """Process-wide store built from the ALLY_REPORT_* settings."""
+    global _default_store
+    with _default_lock:
+        if _default_store is None:
+            _default_store = ReportStore()
+        return _default_store
@@ -0,0 +1,206 @@
+import asyncio
+import os
+import threading
+import time
+
+from azure.core.exceptions import HttpResponseError
+from azure.search.documents.models import VectorizedQuery
+
+import telemetry
+from clients import get_async_search_client, get_search_client
+from local_index import DOCUMENT_TEXT_FIELDS, POLICY_TEXT_FIELDS, LocalIndex
+from policy_catalog import POLICY_FIELDS, PolicyCatalog, get_policy_catalog, index_version
+
+# -----------------------------
+# Configuration
+# -----------------------------
+# ALLY_SEARCH_BACKEND=local answers every query the flows make from JSON files
+# held in memory instead of Azure AI Search, so the flows and the retrieval
+# benchmarks run without the service. Both files use the data.json format: a
+# list of records, each with its vector under "embedding".
+BACKEND = os.environ.get("ALLY_SEARCH_BACKEND", "azure").lower()
+LOCAL_DOCUMENTS = os.environ.get("ALLY_LOCAL_DOCUMENTS", "data.json")
+LOCAL_POLICIES = os.environ.get("ALLY_LOCAL_POLICIES", "policies.json")
+
+
+def odata_filter(filters):
+    """{"filename": "a.docx", "PolicyId": ["1", "2"]} ->
+    "filename eq 'a.docx' and search.in(PolicyId, '1,2', ',')"."""
+    clauses = []
+    for field, value in (filters or {}).items():
+        if isinstance(value, (list, tuple, set, frozenset)):
+            values = ",".join(str(item).replace("'", "''") for item in value)
+            clauses.append(f"search.in({field}, '{values}', ',')")
+        else:
+            clauses.append("{} eq '{}'".format(field, str(value).replace("'", "''")))
+    return " and ".join(clauses) or None
+
+
+_local_indexes = {}
+_local_lock = threading.Lock()
+
+
+def _file_version(path):
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return stat.st_mtime_ns, stat.st_size
+
+
+def get_local_index(path, text_fields=DOCUMENT_TEXT_FIELDS):
+    """Per-process LocalIndex for a data file, reloaded when the file changes."""
+    version = _file_version(path)
+    with _local_lock:
+        cached = _local_indexes.get(path)
+        if cached is None or cached[0] != version:
+            cached = _local_indexes[path] = (version, LocalIndex.from_file(path, text_fields))
+        return cached[1]
+
+
+class LocalPolicyCatalog(PolicyCatalog):
+    """PolicyCatalog over a local policy file; the file's mtime and size stand
+    in for the index statistics."""
+
+    def __init__(self, path, **kwargs):
+        super().__init__(None, path, None, **kwargs)
+        self.path = path
+
+    def _load_policies(self):
+        index = get_local_index(self.path, POLICY_TEXT_FIELDS)
+        return index.scan(select=POLICY_FIELDS)
+
+    def _read_version(self):
+        return _file_version(self.path)
+
+
+_local_catalogs = {}
+
+
+# -----------------------------
+# Backends
+# -----------------------------
+# Both take the `ally` CustomConnection and the index names it configures.
+# Filters are {field: value} for `eq` or {field: [values]} for `search.in`.
+class AzureSearchBackend:
+    def __init__(self, ally):
+        self.ally = ally
+
+    async def search(self, index_name, text, vector=None, filters=None, top=50, k_nearest_neighbors=50,
+                     select=None):
+        client = get_async_search_client(self.ally.search_endpoint, index_name, self.ally.search_key)
+        vector_queries = None
+        if vector:
+            vector_queries = [VectorizedQuery(kind="vector", vector=vector, k_nearest_neighbors=k_nearest_neighbors,
+                                              fields="embedding", exhaustive=True)]
+        results = await client.search(search_text=text, filter=odata_filter(filters),
+                                      vector_queries=vector_queries, select=select, top=top)
+        return [result async for result in results]
+
+    async def scan(self, index_name, filters=None, select=None, order_by=None, top=None):
+        client = get_async_search_client(self.ally.search_endpoint, index_name, self.ally.search_key)
+        results = await client.search(search_text="*", filter=odata_filter(filters), select=select,
+                                      order_by=[order_by] if order_by else None, top=top)
+        return [result async for result in results]
+
+    def count(self, index_name, filters=None):
+        # top=0: only the count comes back, not a page of documents
+        client = get_search_client(self.ally.search_endpoint, index_name, self.ally.search_key)
+        results = client.search(search_text="*", filter=odata_filter(filters), include_total_count=True, top=0)
+        return results.get_count()
+
+    def index_version(self, index_name):
+        return index_version(self.ally.search_endpoint, index_name, self.ally.search_key)
+
+    def policy_catalog(self):
+        return get_policy_catalog(self.ally.search_endpoint, self.ally.search_policy_index, self.ally.search_key)
+
+
+class LocalSearchBackend:
+    """Serves the connection's document index from LOCAL_DOCUMENTS and its
+    policy index from LOCAL_POLICIES."""
+
+    def __init__(self, ally, documents_path=None, policies_path=None):
+        self.ally = ally
+        self.paths = {
+            ally.search_document_index: (documents_path or LOCAL_DOCUMENTS, DOCUMENT_TEXT_FIELDS),
+            ally.search_policy_index: (policies_path or LOCAL_POLICIES, POLICY_TEXT_FIELDS),
+        }
+
+    def index(self, index_name):
+        if index_name not in self.paths:
+            raise ValueError(f"No local data configured for index '{index_name}'")
+        return get_local_index(*self.paths[index_name])
+
+    async def search(self, index_name, text, vector=None, filters=None, top=50, k_nearest_neighbors=50,
+                     select=None):
+        return self._recorded(self.index(index_name).search, text, vector, filters, top, k_nearest_neighbors,
+                              select)
+
+    async def scan(self, index_name, filters=None, select=None, order_by=None, top=None):
+        return self._recorded(self.index(index_name).scan, filters, select, order_by, top)
+
+    def count(self, index_name, filters=None):
+        start = time.perf_counter()
+        count = self.index(index_name).count(filters)
+        telemetry.record_upstream("local.search", time.perf_counter() - start, hits=0)
+        return count
+
+    def index_version(self, index_name):
+        if index_name not in self.paths:
+            raise ValueError(f"No local data configured for index '{index_name}'")
+        return _file_version(self.paths[index_name][0])
+
+    def _recorded(self, query, *args):
+        start = time.perf_counter()
+        results = query(*args)
+        telemetry.record_upstream("local.search", time.perf_counter() - start, hits=len(results))
+        return results
+
+    def policy_catalog(self):
+        path = self.paths[self.ally.search_policy_index][0]
+        with _local_lock:
+            catalog = _local_catalogs.get(path)
+            if catalog is None:
+                catalog = _local_catalogs[path] = LocalPolicyCatalog(path)
+            return catalog
+
+
+def get_search_backend(ally):
+    """The backend selected by ALLY_SEARCH_BACKEND ('azure' or 'local')."""
+    if BACKEND == "local":
+        return LocalSearchBackend(ally)
+    if BACKEND == "azure":
+        return AzureSearchBackend(ally)
+    raise ValueError(f"Unknown ALLY_SEARCH_BACKEND '{BACKEND}', expected 'azure' or 'local'")
+
+
+# Indexes created before `date` was made sortable cannot sort on it; their
+# versions are read from every paragraph's date, in one request for files of
+# up to 1000 paragraphs and a page per further 1000 after that
+VERSION_SCAN_TOP = 100000
+_unsorted_dates = set()
+
+
+async def file_version(backend, index_name, filename):
+    """A token that changes whenever `filename` is re-indexed: its paragraph
+    count and latest `date` (the indexing scripts stamp every paragraph they
+    write or move), read with a count-only query and a one-result query
+    sorted on `date`."""
+    filters = {"filename": filename}
+    if index_name not in _unsorted_dates:
+        try:
+            count, latest = await asyncio.gather(
+                asyncio.to_thread(backend.count, index_name, filters),
+                backend.scan(index_name, filters, select=["date"], order_by="date desc", top=1),
+            )
+            return f"{count}:{(latest[0].get('date') or '') if latest else ''}"
+        except HttpResponseError as e:
+            if e.status_code != 400:
+                raise
+            print(f"file_version: '{index_name}' cannot sort on date, reading every paragraph's date instead "
+                  f"(re-create the index to make `date` sortable). Error: {e.message}")
+            _unsorted_dates.add(index_name)
+    results = await backend.scan(index_name, filters, select=["date"], top=VERSION_SCAN_TOP)
+    dates = [result.get("date") for result in results if result.get("date")]
+    return f"{len(results)}:{max(dates) if dates else ''}"
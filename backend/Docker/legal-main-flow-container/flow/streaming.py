@@ -0,0 +1,104 @@
+import asyncio
+import contextvars
+import queue
+import threading
+
+# -----------------------------
+# Streaming responses
+# -----------------------------
+# A /score request sent with `Accept: text/event-stream` is answered by
+# PromptFlow as server-sent events when the flow output is an iterator: one
+# `data: {"answer": <chunk>}` event per chunk. The summary tools return such
+# an iterator of PolicyItems for those requests, so the add-in can render
+# each item as soon as the model has finished writing it.
+EVENT_STREAM = "text/event-stream"
+
+# Set by the serving app (telemetry.create_app) for each /score request;
+# PromptFlow copies the context into the threads and tasks that run nodes.
+_requested = contextvars.ContextVar("ally_stream", default=False)
+
+
+def begin_request(accept):
+    return _requested.set(EVENT_STREAM in (accept or "").lower())
+
+
+def end_request(token):
+    _requested.reset(token)
+
+
+def requested():
+    """True when the current request asked for server-sent events."""
+    return _requested.get()
+
+
+def policy_item_events(client, field="PolicyItems", on_complete=None, **request):
+    """Run `client.beta.chat.completions.stream(**request)` and yield
+    {"PolicyItem": item, "index": i} for every item of the response's `field`
+    list as soon as the model has moved on to the next one.
+
+    A generator (iterated by the serving app once the flow has finished), so
+    `client` must be a synchronous client. `on_complete` gets the whole parsed
+    response, as the non-streaming tool would have returned it.
+    """
+    sent = 0
+    with client.beta.chat.completions.stream(**request) as stream:
+        for event in stream:
+            if event.type != "content.delta" or not isinstance(event.parsed, dict):
+                continue
+            items = event.parsed.get(field) or []
+            # The last item may still be half-written
+            while sent < len(items) - 1:
+                yield {"PolicyItem": items[sent], "index": sent}
+                sent += 1
+        parsed = stream.get_final_completion().choices[0].message.parsed
+    response = parsed.model_dump(mode="json")
+    for item in response.get(field, [])[sent:]:
+        yield {"PolicyItem": item, "index": sent}
+        sent += 1
+    if on_complete is not None:
+        on_complete(response)
+
+
+def background_item_events(run, key=None, on_complete=None, field="PolicyItems"):
+    """Run `run(emit)`, a coroutine function, on its own event loop in a
+    thread and yield {"PolicyItem": item, "index": i} for the items of every
+    partial response it passes to `emit`, skipping items whose `key(item)`
+    was already sent. `on_complete` gets the coroutine's result.
+
+    For tools that fan one request out to several model calls (see
+    summary_document's map-reduce) and cannot stream a single completion.
+    """
+    messages = queue.Queue()
+    finished = object()
+
+    def worker():
+        try:
+            messages.put((finished, asyncio.run(run(messages.put)), None))
+        except BaseException as e:
+            messages.put((finished, None, e))
+
+    threading.Thread(target=worker, name="ally-stream", daemon=True).start()
+    seen = set()
+    sent = 0
+    while True:
+        message = messages.get()
+        if isinstance(message, tuple) and message[0] is finished:
+            break
+        for item in message.get(field, []):
+            item_key = key(item) if key is not None else None
+            if item_key is not None and item_key in seen:
+                continue
+            seen.add(item_key)
+            yield {"PolicyItem": item, "index": sent}
+            sent += 1
+    _, response, error = message
+    if error is not None:
+        raise error
+    if on_complete is not None:
+        on_complete(response)
+
+
+def replay(response, field="PolicyItems"):
+    """The events policy_item_events would have sent for a stored response."""
+    for i, item in enumerate(response.get(field, [])):
+        yield {"PolicyItem": item, "index": i}
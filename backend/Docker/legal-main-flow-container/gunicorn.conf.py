@@ -0,0 +1,23 @@
+# Loaded by runit/promptflow-serve/run for both serving engines.
+import os
+import sys
+
+FLOW_DIR = os.environ.get("PROMPTFLOW_PROJECT_PATH", "/flow")
+CONNECTION_NAME = "ally"
+
+
+def post_worker_init(worker):
+    """Open pooled connections to Azure OpenAI and Azure AI Search before the
+    worker takes its first request. Set ALLY_PREWARM=off to skip."""
+    if os.environ.get("ALLY_PREWARM", "on").lower() in ("0", "off", "false", "no"):
+        return
+    try:
+        from promptflow.client import PFClient
+
+        sys.path.insert(0, FLOW_DIR)
+        import clients
+
+        ally = PFClient().connections.get(name=CONNECTION_NAME, with_secrets=True)
+        clients.prewarm(ally)
+    except Exception as e:
+        worker.log.warning(f"Connection pre-warm skipped: {e}")
@@ -0,0 +1,69 @@
+"""Keep the Docker image's flow/ folder in step with legal-main-flow.
+
+legal-main-flow-container/flow is a plain copy of the flow: its tools, and
+the shared modules the flow pulls in through `additional_includes`, which
+the image cannot resolve. This copies every one of those files whose
+content differs into flow/, or with --check only lists them and exits 1,
+so a build or CI step fails on a stale image instead of serving old code.
+flow.dag.yaml is not copied: the image's has no additional_includes and
+its own defaults.
+
+    python backend/Docker/sync_flow.py            # copy what changed
+    python backend/Docker/sync_flow.py --check    # exit 1 if anything would be copied
+"""
+import argparse
+import filecmp
+import os
+import shutil
+import sys
+
+import yaml
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+SOURCE = os.path.join(HERE, "..", "PromptFlow", "legal-main-flow")
+TARGET = os.path.join(HERE, "legal-main-flow-container", "flow")
+
+
+def flow_files(source=SOURCE):
+    """(path, name in flow/) for the flow's Python tools and requirements.txt
+    and every file of its additional_includes."""
+    with open(os.path.join(source, "flow.dag.yaml"), encoding="utf-8") as f:
+        dag = yaml.safe_load(f)
+    names = sorted(name for name in os.listdir(source) if name.endswith(".py") or name == "requirements.txt")
+    files = [(os.path.join(source, name), name) for name in names]
+    for include in dag.get("additional_includes") or []:
+        path = os.path.normpath(os.path.join(source, include))
+        files.append((path, os.path.basename(path)))
+    return files
+
+
+def stale(files, target=TARGET):
+    """The files whose copy in `target` is missing or different."""
+    return [(path, name) for path, name in files
+            if not os.path.exists(os.path.join(target, name))
+            or not filecmp.cmp(path, os.path.join(target, name), shallow=False)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--check", action="store_true", help="list stale files and exit 1 instead of copying")
+    args = parser.parse_args()
+
+    files = flow_files()
+    names = [name for _, name in files]
+    duplicates = sorted({name for name in names if names.count(name) > 1})
+    if duplicates:
+        sys.exit(f"flow/ would get several files named {', '.join(duplicates)}")
+
+    changed = stale(files)
+    for path, name in changed:
+        print(f"{'stale' if args.check else 'copied'}: flow/{name} <- {os.path.relpath(path, os.path.join(HERE, '..', '..'))}")
+        if not args.check:
+            shutil.copyfile(path, os.path.join(TARGET, name))
+    if args.check and changed:
+        sys.exit(f"{len(changed)} of {len(files)} files in flow/ are out of date; run backend/Docker/sync_flow.py")
+    print(f"flow/ matches legal-main-flow ({len(files)} files)")
+
+
+if __name__ == "__main__":
+    main()
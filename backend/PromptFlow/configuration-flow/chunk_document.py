@@ -1,5 +1,11 @@
 
 from promptflow import tool
+from docx_stream import is_docx, iter_clauses
+import os
+import time
+
+# Where uploaded documents are read from, unless user_config gives a "folder"
+DOCUMENT_FOLDER = os.environ.get("ALLY_DOCUMENT_FOLDER", "contract_documents")
 
 
 # The inputs section will change based on the arguments of the tool function, after you save the code
@@ -7,14 +13,25 @@ from promptflow import tool
 # Please update the function name/signature per need
 @tool
 def chunk_python_tool(filename: str, user_config: dict) -> dict:
+    user_config = user_config or {}
     # check file type
-    
-    # check number of tokens for doc
-
-    # Send to document inteligance
+    if not is_docx(filename):
+        print(f"{filename}: only .docx documents can be chunked")
+        return {"filename": filename, "status": "unsupported", "chunks": [], "tokens": 0}
+    path = os.path.join(user_config.get("folder", DOCUMENT_FOLDER), filename)
 
-    # go over full document
+    # go over full document: clauses come out of the parser while the rest of
+    # the file is still being read, each with the document's running token count
+    start = time.perf_counter()
+    first_chunk = None
+    chunks = []
+    for chunk in iter_clauses(path, user_config.get("max_chunk_tokens")):
+        if first_chunk is None:
+            first_chunk = time.perf_counter() - start
+        chunks.append(chunk)
+    tokens = chunks[-1]["total_tokens"] if chunks else 0
+    print(f"{filename}: {len(chunks)} chunks, {tokens} tokens in {time.perf_counter() - start:.2f}s "
+          f"(first after {first_chunk or 0:.3f}s)")
 
-    # update index
-    
-    return 'hello '
+    # update index: the doc-embedding flow embeds and uploads the chunks
+    return {"filename": filename, "status": "chunked", "chunks": chunks, "tokens": tokens}
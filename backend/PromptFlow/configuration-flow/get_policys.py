@@ -1,8 +1,7 @@
 
 from promptflow.core import tool
 from promptflow.connections import CustomConnection
-from azure.core.credentials import AzureKeyCredential
-from azure.search.documents import SearchClient
+from policy_catalog import get_policy_catalog
 
 # The inputs section will change based on the arguments of the tool function, after you save the code
 # Adding type to arguments and return value will help the system show the types properly
@@ -12,15 +11,10 @@ def list_policy_tool(searchconnection: CustomConnection) -> object:
     search_endpoint = searchconnection.endpoint
     search_index = "legal-instructions"
     search_key = searchconnection.key
-    # use ai azure search to query 
-
-    search_client = SearchClient(search_endpoint, search_index, AzureKeyCredential(search_key))
-    results = search_client.search(
-        search_text="*",  # Use '*' to match all documents
-        select="title,instruction"     # Specify the fields to include in the results
-    )
+    # Served from the per-worker policy catalog instead of scanning the index
+    catalog = get_policy_catalog(search_endpoint, search_index, search_key)
     policy_list = []
-    for result in results:
-        policy_list.append({"title": result["title"], "instruction": result["instruction"]})
+    for policy in catalog.policies():
+        policy_list.append({"title": policy["title"], "instruction": policy["instruction"]})
         
     return policy_list
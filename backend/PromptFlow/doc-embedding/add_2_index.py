@@ -1,51 +1,117 @@
-
 from promptflow.core import tool
 from promptflow.connections import CustomConnection, AzureOpenAIConnection
-from azure.core.credentials import AzureKeyCredential
-from azure.search.documents import SearchClient
-from openai import AzureOpenAI
+from batch_embedding import embed_texts_async
+from bulk_uploader import AsyncBulkUploader
+from clients import connection_setting, get_async_openai_client, get_async_search_client
+from embedding_cache import get_default_cache
+from index_manifest import content_hash, document_key
+from index_presence import mark_indexed
+import asyncio
 import datetime
+import time
+
+# Used when neither the connections (search_document_index,
+# openai_embedding_deployment, openai_api_version, as the `ally` connection
+# names them) nor the ALLY_* environment variables set them
+SEARCH_INDEX = "legal-documents"
+EMBEDDING_DEPLOYMENT = "ada002"
+API_VERSION = "2024-08-01-preview"
+# Chunks are embedded and uploaded a window at a time, and the next window is
+# embedded while the previous one uploads: at most two windows of embeddings
+# are held at once, however long the document
+WINDOW_CHUNKS = 256
+# Embeddings requests in flight at once
+EMBEDDING_CONCURRENCY = 4
 
 # The inputs section will change based on the arguments of the tool function, after you save the code
 # Adding type to arguments and return value will help the system show the types properly
 # Please update the function name/signature per need
 @tool
-def my_python_tool(filename: str, input: list, searchconnection: CustomConnection, openai:AzureOpenAIConnection) -> list:
-    search_endpoint = searchconnection.endpoint
-    search_index = "legal-documents"
-    search_key = searchconnection.key
-
-    # Create a client
-    credential = AzureKeyCredential(search_key)
-    client = SearchClient(endpoint=search_endpoint,
-                        index_name=search_index,
-                        credential=credential)
-
-    client = AzureOpenAI(  
-        azure_endpoint=openai.api_base,  
-        api_key=openai.api_key,  
-        api_version="2024-08-01-preview"
-    )
-
-    def text_embeding(text):
-        import json
-        response  = client.embeddings.create(
-                input = text,
-                model= "ada002"        
-        )
-        json_data = json.loads(response.model_dump_json())
-        return json_data['data'][0]['embedding']
-        
-    # for each item in input
-    for item in input['chunk']:
-        # add new field to item
-        item['id'] = filename + "-" + str(item['id'])
-        item['embedding'] = text_embeding(item['paragraph'])
-        item['filename'] = filename
-        # now in 2024-04-14T06:35:05Z format 
-        item['data'] = datetime.datetime.now().isoformat()
-    
-    # result = client.upload_documents(documents=
-    #                              [input['chunk']],)
-
-    return input['chunk']
+async def my_python_tool(filename: str, input: list, searchconnection: CustomConnection, openai:AzureOpenAIConnection) -> list:
+    search_index = connection_setting(searchconnection, "search_document_index", SEARCH_INDEX)
+    deployment = connection_setting(searchconnection, "openai_embedding_deployment", EMBEDDING_DEPLOYMENT)
+    api_version = getattr(openai, "api_version", None) or connection_setting(searchconnection, "openai_api_version",
+                                                                             API_VERSION)
+    client = get_async_openai_client(openai.api_base, openai.api_key, api_version)
+    search_client = get_async_search_client(searchconnection.endpoint, search_index, searchconnection.key)
+    cache = get_default_cache()
+    semaphore = asyncio.Semaphore(EMBEDDING_CONCURRENCY)
+    # now in 2024-04-14T06:35:05Z format; answer_cache reads it to notice re-indexing
+    date = datetime.datetime.now(datetime.timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
+
+    chunks = input['chunk']
+    all_keys = chunk_keys(filename, chunks)
+    start = time.perf_counter()
+    statuses = []
+    async with AsyncBulkUploader(search_client, search_index) as uploader:
+        upload = None
+        for first in range(0, len(chunks), WINDOW_CHUNKS):
+            window = chunks[first:first + WINDOW_CHUNKS]
+            keys = all_keys[first:first + WINDOW_CHUNKS]
+            embed_start = time.perf_counter()
+            try:
+                embeddings = await embed_texts_async(client, deployment, [item['paragraph'] for item in window],
+                                                     semaphore=semaphore, cache=cache)
+                error = None
+            except Exception as e:
+                embeddings, error = None, str(e)
+            embed_seconds = time.perf_counter() - embed_start
+
+            # The previous window has to be uploaded before this one is queued
+            if upload is not None:
+                statuses.extend(await upload)
+            if error is not None:
+                print(f"Failed to embed chunks {first + 1}-{first + len(window)} of {filename}: {error}")
+                statuses.extend(chunk_status(item, key, "failed", embed_seconds, 0.0, error)
+                                for item, key in zip(window, keys))
+                upload = None
+                continue
+            for position, (item, key, embedding) in enumerate(zip(window, keys, embeddings), start=first + 1):
+                await uploader.merge_or_upload(dict(item, id=key, ParagraphId=position, embedding=embedding,
+                                                    filename=filename, date=date))
+            del embeddings
+            upload = asyncio.create_task(upload_window(uploader, window, keys, embed_seconds))
+        if upload is not None:
+            statuses.extend(await upload)
+
+    indexed = sum(status['status'] == "indexed" for status in statuses)
+    print(f"{filename}: {indexed} of {len(chunks)} chunks indexed in {time.perf_counter() - start:.2f}s")
+    if cache is not None:
+        print(cache.report())
+    if indexed:
+        mark_indexed(search_index, filename)
+    return statuses
+
+
+def chunk_keys(filename, chunks):
+    """Index keys of the chunks: the indexing scripts' keys, so both write
+    the same document for the same paragraph."""
+    occurrences = {}
+    keys = []
+    for item in chunks:
+        paragraph_hash = content_hash(item['paragraph'])
+        occurrence = occurrences.get(paragraph_hash, 0)
+        occurrences[paragraph_hash] = occurrence + 1
+        keys.append(document_key(filename, paragraph_hash, occurrence))
+    return keys
+
+
+async def upload_window(uploader, window, keys, embed_seconds):
+    """Send the window's buffered documents; one status per chunk."""
+    already_failed = len(uploader.failed)
+    upload_start = time.perf_counter()
+    await uploader.flush()
+    upload_seconds = time.perf_counter() - upload_start
+    failed = {document['id']: reason for (_, document), reason in uploader.failed[already_failed:]}
+    return [chunk_status(item, key, "failed" if key in failed else "indexed", embed_seconds, upload_seconds,
+                         failed.get(key))
+            for item, key in zip(window, keys)]
+
+
+def chunk_status(item, key, status, embed_seconds, upload_seconds, error=None):
+    # Seconds are those of the chunk's window: its embedding calls, then its upload
+    result = {"id": item['id'], "key": key, "status": status,
+              "embed_seconds": round(embed_seconds, 3), "upload_seconds": round(upload_seconds, 3)}
+    if error:
+        result["error"] = error
+    return result
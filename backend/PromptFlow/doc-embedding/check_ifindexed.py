@@ -3,6 +3,12 @@ from promptflow.core import tool
 from promptflow.connections import CustomConnection
 from azure.core.credentials import AzureKeyCredential
 from azure.search.documents import SearchClient
+from clients import connection_setting
+from index_presence import file_indexed
+
+# Used when neither the connection nor ALLY_SEARCH_DOCUMENT_INDEX names the
+# index; add_2_index writes to the same one
+SEARCH_INDEX = "legal-documents"
 
 # The inputs section will change based on the arguments of the tool function, after you save the code
 # Adding type to arguments and return value will help the system show the types properly
@@ -10,22 +16,23 @@ from azure.search.documents import SearchClient
 @tool
 def list_policy_tool(filename:str, searchconnection: CustomConnection) -> object:
     search_endpoint = searchconnection.endpoint
-    search_index = "legal-documents"
+    search_index = connection_setting(searchconnection, "search_document_index", SEARCH_INDEX)
     search_key = searchconnection.key
     # use ai azure search to query 
 
     search_client = SearchClient(search_endpoint, search_index, AzureKeyCredential(search_key))
-    results = search_client.search(
-        search_text=filename,  # Use '*' to match all documents
-        select="filename"     # Specify the fields to include in the results
-    )
 
-    policy_list = []
-    for result in results:
-        policy_list.append({"filename": result["filename"]})
+    def count(index_name, filters):
+        # Exact match on the filename; top=0 returns only the count
+        results = search_client.search(
+            search_text="*",
+            filter="filename eq '{}'".format(filters["filename"].replace("'", "''")),
+            include_total_count=True,
+            top=0,
+        )
+        return results.get_count()
 
-    count = len(policy_list)
-    if count == 0:
+    if not file_indexed(count, search_index, filename, node="check_ifindexed"):
         return 0 # not indexed
     else:
         return 1 # indexed
\ No newline at end of file
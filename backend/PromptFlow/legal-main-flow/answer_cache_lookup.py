@@ -0,0 +1,27 @@
+from promptflow.core import tool
+from telemetry import instrument
+from promptflow.connections import CustomConnection
+from search_backend import get_search_backend
+from answer_cache import get_default_cache
+
+@tool
+@instrument("answer_cache_lookup")
+async def my_python_tool(embedinginput: list, filename: str, language: str, ally: CustomConnection) -> object:
+    # A close enough question about the same version of the file was already
+    # answered: search_doc and ask_result_format are skipped on a hit
+    miss = {"hit": False, "answer": None, "filename": filename, "language": language, "version": None}
+    cache = get_default_cache()
+    if cache is None:
+        return miss
+
+    backend = get_search_backend(ally)
+    try:
+        version = await cache.document_version(backend, ally.search_document_index, filename)
+    except Exception as e:
+        # Without a version nothing is looked up or stored; search_doc runs as usual
+        print(f"Answer cache version check failed, skipping the cache. Error: {e}")
+        return miss
+    answer, similarity = cache.lookup(filename, language, version, embedinginput)
+    print(f"{cache.report()}; closest question {similarity:.3f}")
+    return {"hit": answer is not None, "answer": answer, "filename": filename, "language": language,
+            "version": version}
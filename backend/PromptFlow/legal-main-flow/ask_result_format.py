@@ -1,7 +1,10 @@
 from promptflow.core import tool
+from telemetry import instrument
 from promptflow.connections import CustomConnection
 from pydantic import BaseModel 
-from openai import AzureOpenAI  
+from clients import async_openai_client
+from answer_cache import get_default_cache
+import prompt_budget
 from typing import List  
 import json
 
@@ -18,14 +21,19 @@ class AskResponse(BaseModel):
 class AskGAResponse(BaseModel):
     Answer: str
 
+def remember(response, embedinginput, answer_cache):
+    # answer_cache is answer_cache_lookup's output: which file, language and
+    # index version the answer belongs to
+    cache = get_default_cache()
+    if cache is None or not answer_cache or not answer_cache.get("version") or embedinginput is None:
+        return
+    cache.put(answer_cache["filename"], answer_cache["language"], answer_cache["version"], embedinginput, response)
+
 @tool
-def python_tool(query: str, search_result_list: list, ally: CustomConnection, language: str ) -> object:
+@instrument("ask_result_format")
+async def python_tool(query: str, search_result_list: list, ally: CustomConnection, language: str, embedinginput: list = None, answer_cache: dict = None) -> object:
     
-    client = AzureOpenAI(  
-        azure_endpoint=ally.openai_endpoint,  
-        api_key=ally.openai_key,  
-        api_version=ally.openai_api_version,
-    )
+    client = async_openai_client(ally)
     
     # check if the search result list is empty
     if not search_result_list:
@@ -36,20 +44,25 @@ def python_tool(query: str, search_result_list: list, ally: CustomConnection, la
         - Add a note in the end that the inforamtion provided is not grounded on any Internal Conpany inforamtion or policy.
         - Answer in ''' + str(language)
 
-        user_input = '''
-        user question: ''' + str(query)
+        messages, _ = prompt_budget.fit(
+            "ask_result_format",
+            lambda _, text: [
+                {"role": "system", "content": prompt},
+                {"role": "user", "content": '''
+        user question: ''' + text},
+            ],
+            text=query,
+        )
         
-        openai_response = client.beta.chat.completions.parse(  
+        openai_response = await client.beta.chat.completions.parse(  
         model=ally.openai_model_deployment,  
-        messages=[  
-            {"role": "system", "content": prompt},  
-            {"role": "user", "content": str(user_input)},  
-        ],  
+        messages=messages,  
         response_format=AskGAResponse,  
         )  
         try:  
             openai_sentiment_response_post_text = openai_response.choices[0].message.parsed  
             response = json.loads(openai_sentiment_response_post_text.model_dump_json(indent=2))
+            remember(response, embedinginput, answer_cache)
             return response
         except Exception as e:  
             print(f"Error converting to JSON sentiment from OpenAI: {e}")
@@ -94,21 +107,30 @@ def python_tool(query: str, search_result_list: list, ally: CustomConnection, la
             ]  
             }  '''
 
-        user_input = '''
-        user question: ''' + str(query) + '''
-        query result: ''' + str(search_result_list)
+        # search_doc returns the paragraphs best first, so the budget drops
+        # the least relevant ones and cuts long paragraphs
+        messages, _ = prompt_budget.fit(
+            "ask_result_format",
+            lambda results, text: [
+                {"role": "system", "content": prompt},
+                {"role": "user", "content": '''
+        user question: ''' + text + '''
+        query result: ''' + results},
+            ],
+            items=search_result_list,
+            text=query,
+            trim_field="paragraph",
+        )
 
-        openai_response = client.beta.chat.completions.parse(  
+        openai_response = await client.beta.chat.completions.parse(  
             model=ally.openai_model_deployment,  
-            messages=[  
-                {"role": "system", "content": prompt},  
-                {"role": "user", "content": user_input},  
-            ],  
+            messages=messages,  
             response_format=AskResponse,  
         )  
         try:  
             openai_sentiment_response_post_text = openai_response.choices[0].message.parsed  
             response = json.loads(openai_sentiment_response_post_text.model_dump_json(indent=2))
+            remember(response, embedinginput, answer_cache)
             return response
         except Exception as e:  
             print(f"Error converting to JSON sentiment from OpenAI: {e}")
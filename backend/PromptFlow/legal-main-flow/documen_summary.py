@@ -1,7 +1,11 @@
 from promptflow.core import tool
+from telemetry import instrument
+from memoize import memoize, policy_catalog_version
 from promptflow.connections import AzureOpenAIConnection, CustomConnection
 from pydantic import BaseModel 
-from openai import AzureOpenAI  
+from clients import async_openai_client, openai_client
+import prompt_budget
+import streaming
 from typing import List  
 import json
 
@@ -18,17 +22,49 @@ class SummaryResponse(BaseModel):
     PolicyItems: list[PolicyItem]
 
 @tool
-def python_tool(language:str, input_text: str, policy_list: object, ally: CustomConnection):
+@instrument("selection_summary")
+async def python_tool(language:str, input_text: str, policy_list: object, ally: CustomConnection):
     
     if len(policy_list) == 0:
         return {"warning": "No policy items found."}
 
+    if not streaming.requested():
+        return await summarize(language, input_text, policy_list, ally)
 
-    client = AzureOpenAI(  
-        azure_endpoint=ally.openai_endpoint,  
-        api_key=ally.openai_key,  
-        api_version=ally.openai_api_version,
+    # Accept: text/event-stream: send each PolicyItem as soon as it is written
+    key, cached = await summarize.recall(language, input_text, policy_list, ally)
+    if cached is not None:
+        return streaming.replay(cached)
+    return streaming.policy_item_events(
+        openai_client(ally),
+        model=ally.openai_model_deployment,
+        messages=build_messages(language, input_text, policy_list),
+        response_format=SummaryResponse,
+        on_complete=lambda response: summarize.remember(key, response),
     )
+
+
+@memoize("selection_summary", version=policy_catalog_version)
+async def summarize(language, input_text, policy_list, ally):
+    client = async_openai_client(ally)
+    openai_response = await client.beta.chat.completions.parse(  
+        model=ally.openai_model_deployment,  
+        messages=build_messages(language, input_text, policy_list),  
+        response_format=SummaryResponse,  
+    )  
+    try:  
+        openai_sentiment_response_post_text = openai_response.choices[0].message.parsed  
+        print(f"JSON string: {openai_sentiment_response_post_text}")
+        response = json.loads(openai_sentiment_response_post_text.model_dump_json(indent=2))
+        print(response)
+    except Exception as e:  
+        print(f"Error converting to JSON sentiment from OpenAI: {e}")
+        return  
+
+    return response
+
+
+def build_messages(language, input_text, policy_list):
     prompt = '''
      Task: Analyze the selected text from a document and compare it with relevant company policy items to assess compliance.
 
@@ -88,23 +124,17 @@ Make corrections and suggestions in the language of the original text.
  
 10. Policy Items:
 
-The policy items provided in the list are:''' + json.dumps(policy_list, indent=2)
-    
-    openai_response = client.beta.chat.completions.parse(  
-        model=ally.openai_model_deployment,  
-        messages=[  
-            {"role": "system", "content": prompt},  
-            {"role": "user", "content": str(input_text)},  
-        ],  
-        response_format=SummaryResponse,  
-    )  
-    try:  
-        openai_sentiment_response_post_text = openai_response.choices[0].message.parsed  
-        print(f"JSON string: {openai_sentiment_response_post_text}")
-        response = json.loads(openai_sentiment_response_post_text.model_dump_json(indent=2))
-        print(response)
-    except Exception as e:  
-        print(f"Error converting to JSON sentiment from OpenAI: {e}")
-        return  
+The policy items provided in the list are:'''
 
-    return response
\ No newline at end of file
+    # search_policy ranks the policies, so the budget drops the least relevant
+    messages, _ = prompt_budget.fit(
+        "selection_summary",
+        lambda policies, text: [
+            {"role": "system", "content": prompt + policies},
+            {"role": "user", "content": text},
+        ],
+        items=policy_list,
+        text=input_text,
+        trim_field="instruction",
+    )
+    return messages
@@ -1,29 +1,25 @@
 from promptflow.core import tool
+from telemetry import instrument
 from promptflow.connections import CustomConnection
-from azure.core.credentials import AzureKeyCredential
-from azure.search.documents import SearchClient
-from azure.search.documents.models import VectorizedQuery
+from search_backend import get_search_backend
 
 @tool
-def search_doc_tool(query: str, embedinginput: list, searchconnection: CustomConnection, filename: str, groups: str) -> object:
-    search_endpoint = searchconnection.search_endpoint
+@instrument("search_doc")
+async def search_doc_tool(query: str, embedinginput: list, searchconnection: CustomConnection, filename: str, groups: str) -> object:
     search_index = searchconnection.search_document_index
-    search_key = searchconnection.search_key
 
-    vector_query = VectorizedQuery(kind="vector", vector=embedinginput, k_nearest_neighbors=20, fields="embedding", exhaustive=True)
-
-    search_client = SearchClient(search_endpoint, search_index, AzureKeyCredential(search_key))
-    file_filter = "filename eq '{}'".format(filename)
+    # Azure AI Search, or the in-process index with ALLY_SEARCH_BACKEND=local
+    backend = get_search_backend(searchconnection)
     # Add the group filter only if SSO enabled
-    #group_filter = "group/any(t: search.in(t, '{}'))".format(groups)
-    # combine the filter
-    #filter = "({}) and ({})".format(file_filter, group_filter)
-    filter = "({})".format(file_filter)   # Note this filter does no take the group into account
+    #filters = {"filename": filename, "group": groups}
+    filters = {"filename": filename}   # Note this filter does no take the group into account
 
-    results = search_client.search(
-        search_text=query,  # Use the text query
-        filter=filter,
-        vector_queries=[vector_query],
+    results = await backend.search(
+        search_index,
+        query,  # Use the text query
+        vector=embedinginput,
+        k_nearest_neighbors=20,
+        filters=filters,
         select="*",  # Include the fields in the result
         top=3,  # Increase the number of results returned
     )
@@ -31,4 +27,4 @@ def search_doc_tool(query: str, embedinginput: list, searchconnection: CustomCon
     for result in results:
         policy_list.append({"title": result["title"], "paragraph": result["paragraph"], "keyphrases": result["keyphrases"], "summary": result["summary"]})
 
-    return policy_list
\ No newline at end of file
+    return policy_list
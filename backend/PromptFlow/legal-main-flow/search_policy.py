@@ -1,67 +1,92 @@
 from promptflow.core import tool
+from telemetry import instrument
 from promptflow.connections import CustomConnection
-from azure.core.credentials import AzureKeyCredential
-from azure.search.documents import SearchClient
-from azure.search.documents.models import VectorizedQuery
-from openai import AzureOpenAI
+from clients import async_openai_client
+import asyncio
 import json
+import time
+from language_id import detect_language_async
+from search_backend import get_search_backend
+import policy_selection
+import prompt_budget
+from python_text_embedding import embed_text
+
+# The start of the text is enough to tell its language, however long the selection
+LANGUAGE_SAMPLE_TOKENS = 500
+
+
+async def timed(stage, timings, coroutine):
+    start = time.perf_counter()
+    try:
+        return await coroutine
+    finally:
+        timings[stage] = time.perf_counter() - start
+
 
 @tool
-def list_policy_tool(query: str, embeding: list, searchconnection: CustomConnection, groups: list) -> object:
-    search_endpoint = searchconnection.search_endpoint
-    search_index = searchconnection.search_policy_index
-    search_key = searchconnection.search_key    
-
-    # 1. Call OpenAI to detect language
-    client = AzureOpenAI(
-        azure_endpoint=searchconnection.openai_endpoint,
-        api_key=searchconnection.openai_key,
-        api_version=searchconnection.openai_api_version
-    )
+@instrument("search_policy")
+async def list_policy_tool(query: str, searchconnection: CustomConnection, groups: list) -> object:
+    # 1. Detect language locally, asking OpenAI only when the text is ambiguous
+    async def detect_with_openai(text):
+        client = async_openai_client(searchconnection)
 
-    prompt = f"""
+        prompt = f"""
 You are a language detection assistant. Identify the language of the following text and respond with only the language name: 'English' or 'German'. No extra text.
 
 Text:
-\"{query}\"
+\"{prompt_budget.truncate(text, LANGUAGE_SAMPLE_TOKENS)}\"
     """
 
-    try:
-        openai_response = client.chat.completions.create(
-            model=searchconnection.openai_model_deployment,
-            messages=[
-                {"role": "system", "content": "You detect the language of the given user input."},
-                {"role": "user", "content": prompt},
-            ]
-        )
-
-        language = openai_response.choices[0].message.content.strip()
-        print(f"Detected language: {language}")
-    except Exception as e:
-        print(f"Language detection failed, defaulting to English. Error: {e}")
+        try:
+            openai_response = await client.chat.completions.create(
+                model=searchconnection.openai_model_deployment,
+                messages=[
+                    {"role": "system", "content": "You detect the language of the given user input."},
+                    {"role": "user", "content": prompt},
+                ]
+            )
+            return openai_response.choices[0].message.content.strip()
+        except Exception as e:
+            print(f"Language detection failed, defaulting to English. Error: {e}")
+            return "English"
+
+    # 2. Language detection, the query embedding and the catalog (re)load do
+    # not depend on each other, so they run at the same time
+    catalog = get_search_backend(searchconnection).policy_catalog()
+    timings = dict.fromkeys(("language", "embedding", "catalog", "ranking"), 0.0)
+    start = time.perf_counter()
+    language, embeding, _ = await asyncio.gather(
+        timed("language", timings, detect_language_async(query, fallback=detect_with_openai)),
+        timed("embedding", timings, embed_text(query, searchconnection)),
+        # The catalog only touches the network when it refreshes
+        timed("catalog", timings, asyncio.to_thread(catalog.policies)),
+    )
+    print(f"Detected language: {language}")
+
+    # Anything but German searches the English policies
+    if language != "German":
         language = "English"
 
-    # 2. Build language filter
-    if language == "German":
-        language_filter = "language eq 'German'"
-    else:
-        language_filter = "language eq 'English'"
+    # 3. Rank the cached policies of that language against the query
+    ranking_start = time.perf_counter()
+    results = catalog.search(query, embeding, language=language, k_nearest_neighbors=1)
+    # Up to 50 keyword and vector matches come back, so keep only the policies
+    # whose embeddings are close to the selection for selection_summary's prompt
+    selected = policy_selection.select_policies(catalog, results, [embeding], language)
+    timings["ranking"] = time.perf_counter() - ranking_start
+    print(policy_selection.report("search_policy", policy_list_of(results), [policy_list_of(selected)]))
 
-    # 3. Optional group filtering (you can extend this if needed)
-    # group_filter = "adgroup/any(t: search.in(t, '{}'))".format(','.join(groups))
-    # combined_filter = f"({language_filter}) and ({group_filter})"
+    wall = time.perf_counter() - start
+    print("search_policy timings: " + ", ".join(f"{stage} {seconds * 1000:.0f} ms" for stage, seconds in timings.items())
+          + f"; wall {wall * 1000:.0f} ms vs {sum(timings.values()) * 1000:.0f} ms sequential")
 
-    vector_query = VectorizedQuery(kind="vector", vector=embeding, k_nearest_neighbors=1, fields="embedding")     
+    # 4. Optional group filtering (you can extend this if needed)
+    # selected = [p for p in selected if set(p.get("groups") or []) & set(groups)]
 
-    search_client = SearchClient(search_endpoint, search_index, AzureKeyCredential(search_key))
+    return policy_list_of(selected)
 
-    results = search_client.search(
-        search_text=query,
-        filter=language_filter,
-        vector_queries=[vector_query],
-        select="title,instruction"
-    )
 
+def policy_list_of(results):
     policy_list = []
     for result in results:
         policy_list.append({
@@ -69,4 +94,4 @@ Text:
             "instruction": result["instruction"]
         })
 
-    return policy_list
\ No newline at end of file
+    return policy_list
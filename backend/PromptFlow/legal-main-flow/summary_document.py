@@ -1,9 +1,28 @@
 from promptflow.core import tool
+from telemetry import instrument
+from memoize import memoize, policy_catalog_version
 from promptflow.connections import CustomConnection
 from pydantic import BaseModel 
-from openai import AzureOpenAI  
+from clients import async_openai_client, openai_client
+from language_id import detect_language
+from python_text_embedding import embed_texts
+from search_backend import get_search_backend
+from token_count import count_tokens
+import clause_chunker
+import policy_selection
+import prompt_budget
+import streaming
 from typing import List  
+import asyncio
 import json
+import os
+import time
+
+# Documents longer than CHUNK_TOKENS are analyzed clause by clause (a clause
+# longer than that is split between its items), CONCURRENCY clauses at a
+# time, and the PolicyItems merged
+CHUNK_TOKENS = int(os.environ.get("ALLY_SUMMARY_CHUNK_TOKENS", "1024"))
+CONCURRENCY = int(os.environ.get("ALLY_SUMMARY_CONCURRENCY", "4"))
 
 class SummaryResponse(BaseModel):  
     class PolicyItem(BaseModel):  
@@ -17,14 +36,153 @@ class SummaryResponse(BaseModel):
     PolicyItems: list[PolicyItem]
 
 @tool
-def python_tool(input_text: str, policy_list: list, ally: CustomConnection ) -> object:
-    
-    client = AzureOpenAI(  
-        azure_endpoint=ally.openai_endpoint,  
-        api_key=ally.openai_key,  
-        api_version=ally.openai_api_version
+@instrument("summary_document")
+async def python_tool(input_text: str, policy_list: list, ally: CustomConnection ) -> object:
+    if not streaming.requested():
+        return await summarize(input_text, policy_list, ally)
+
+    # Accept: text/event-stream: send each PolicyItem as soon as it is written
+    key, cached = await summarize.recall(input_text, policy_list, ally)
+    if cached is not None:
+        return streaming.replay(cached)
+    on_complete = lambda response: summarize.remember(key, response)
+    chunks = split_clauses(input_text, CHUNK_TOKENS)
+    policy_lists = await relevant_policies(input_text, chunks, policy_list, ally)
+    if len(chunks) > 1:
+        return streaming.background_item_events(
+            lambda emit: map_reduce(chunks, policy_lists, ally, on_chunk=emit),
+            key=policy_key,
+            on_complete=on_complete,
+        )
+    return streaming.policy_item_events(
+        openai_client(ally),
+        model=ally.openai_model_deployment,
+        messages=build_messages(input_text, policy_lists[0]),
+        response_format=SummaryResponse,
+        on_complete=on_complete,
     )
-            # summarize the document provided by the user, the summary will be only on the policy items provided. Return the analysis in the following JSON format, the format is as follows: 
+
+
+@memoize("summary_document", version=policy_catalog_version)
+async def summarize(input_text, policy_list, ally):
+    chunks = split_clauses(input_text, CHUNK_TOKENS)
+    policy_lists = await relevant_policies(input_text, chunks, policy_list, ally)
+    if len(chunks) > 1:
+        return await map_reduce(chunks, policy_lists, ally)
+    return await analyze(input_text, policy_lists[0], ally)
+
+
+async def analyze(input_text, policy_list, ally, part=None):
+    client = async_openai_client(ally)
+    openai_response = await client.beta.chat.completions.parse(  
+        model=ally.openai_model_deployment,
+        messages=build_messages(input_text, policy_list, part),
+        response_format=SummaryResponse,  
+    )  
+    try:  
+        openai_sentiment_response_post_text = openai_response.choices[0].message.parsed  
+        response = json.loads(openai_sentiment_response_post_text.model_dump_json(indent=2))
+    except Exception as e:  
+        # Raise rather than return None: it would become the tool's output, or
+        # drop the chunk from the merge, and be memoized either way
+        where = f" (part {part[0]} of {part[1]})" if part else ""
+        raise ValueError(f"summary_document: error converting to JSON sentiment from OpenAI{where}: {e}") from e
+    return response
+
+
+# -----------------------------
+# Policy pre-selection
+# -----------------------------
+async def relevant_policies(input_text, chunks, policy_list, ally):
+    """The policies of `policy_list` to put in each chunk's prompt: those
+    whose embeddings are closest to the chunk's clauses, in the
+    document's language. Every chunk gets the whole list when that cannot
+    be worked out."""
+    if not policy_selection.ENABLED or not policy_list:
+        return [policy_list] * len(chunks)
+    try:
+        catalog = get_search_backend(ally).policy_catalog()
+        pieces = [[clause["paragraph"] for clause in clause_chunker.chunk_contract(chunk)] or [chunk]
+                  for chunk in chunks]
+        vectors, _ = await asyncio.gather(
+            embed_texts([piece for chunk in pieces for piece in chunk], ally),
+            # The catalog only touches the network when it refreshes
+            asyncio.to_thread(catalog.policies),
+        )
+    except Exception as e:
+        print(f"summary_document: policy pre-selection skipped. Error: {e}")
+        return [policy_list] * len(chunks)
+
+    language = detect_language(input_text)
+    policy_lists = []
+    start = 0
+    for chunk in pieces:
+        chunk_vectors = vectors[start:start + len(chunk)]
+        policy_lists.append(policy_selection.select_policies(catalog, policy_list, chunk_vectors, language))
+        start += len(chunk)
+    print(policy_selection.report("summary_document", policy_list, policy_lists))
+    return policy_lists
+
+
+# -----------------------------
+# Map-reduce over long documents
+# -----------------------------
+async def map_reduce(chunks, policy_lists, ally, on_chunk=None):
+    """Analyze every chunk against its policies (aligned with `chunks`), at
+    most CONCURRENCY at a time, and merge the PolicyItems into one response.
+    `on_chunk` gets each chunk's response as it completes."""
+    semaphore = asyncio.Semaphore(CONCURRENCY)
+
+    async def one(i, chunk):
+        async with semaphore:
+            response = await analyze(chunk, policy_lists[i], ally, part=(i + 1, len(chunks)))
+        if on_chunk is not None:
+            on_chunk(response)
+        return response
+
+    start = time.perf_counter()
+    responses = await asyncio.gather(*(one(i, chunk) for i, chunk in enumerate(chunks)))
+    merged = merge_policy_items(responses)
+    print(f"summary_document: {len(chunks)} chunks, {sum(len(r['PolicyItems']) for r in responses)} items "
+          f"merged into {len(merged['PolicyItems'])} in {(time.perf_counter() - start) * 1000:.0f} ms")
+    return merged
+
+
+def split_clauses(text, max_tokens):
+    """The document whole when it fits in `max_tokens`, otherwise one chunk
+    per clause, as clause_chunker splits contracts for the index."""
+    text = str(text)
+    if count_tokens(text) <= max_tokens:
+        return [text]
+    return [clause["paragraph"] for clause in clause_chunker.iter_chunks(text.splitlines(), max_tokens)] or [text]
+
+
+def policy_key(item):
+    # The same policy reported from several chunks
+    return " ".join(str(item.get("original_policy") or item.get("title") or "").lower().split())
+
+
+def merge_policy_items(responses):
+    """One PolicyItem per policy: non-compliant if any chunk breaches it, with
+    the document text and key items of every chunk that reported it."""
+    groups = {}
+    for response in responses:
+        for item in (response or {}).get("PolicyItems", []):
+            groups.setdefault(policy_key(item), []).append(item)
+
+    merged = []
+    for items in groups.values():
+        breaches = [item for item in items if str(item.get("iscompliant", "")).strip().lower() == "no"]
+        item = dict((breaches or items)[0])
+        item["iscompliant"] = "no" if breaches else item.get("iscompliant", "yes")
+        item["original_text"] = "\n".join(dict.fromkeys(i["original_text"] for i in items if i.get("original_text")))
+        item["keyItems"] = list(dict.fromkeys(k for i in items for k in i.get("keyItems", [])))
+        merged.append(item)
+    return {"PolicyItems": merged}
+
+
+def build_messages(input_text, policy_list, part=None):
+    # summarize the document provided by the user, the summary will be only on the policy items provided. Return the analysis in the following JSON format, the format is as follows: 
     prompt = '''
     This is the list of steps to follow to summarize the document provided by the user:
     1. Summarize the document provided by the user
@@ -44,22 +202,23 @@ def python_tool(input_text: str, policy_list: list, ally: CustomConnection ) ->
     7. Compare the document with the policy items provided in the list and if the policy is been breached note it under the iscompliant field
     8. original_policy field will be the original policy from the document with no changes or eddits
     9. The policy items provided in the list are:
-            ''' + str(policy_list)
-    openai_response = client.beta.chat.completions.parse(  
-        model=ally.openai_model_deployment,
-        messages=[  
-            {"role": "system", "content": prompt},  
-            {"role": "user", "content": str(input_text)},  
-        ],  
-        response_format=SummaryResponse,  
-    )  
-    try:  
-        openai_sentiment_response_post_text = openai_response.choices[0].message.parsed  
-        response = json.loads(openai_sentiment_response_post_text.model_dump_json(indent=2))
-        print(response)
-    except Exception as e:  
-        print(f"Error converting to JSON sentiment from OpenAI: {e}")
-        return  
-
+            '''
+    if part:
+        note = f"""
+    10. The text provided by the user is part {part[0]} of {part[1]} of the document; only report policy items for this part
+            """
+    else:
+        note = ""
 
-    return response
+    # The policies come most relevant first, so the budget drops the least relevant
+    messages, _ = prompt_budget.fit(
+        "summary_document",
+        lambda policies, text: [
+            {"role": "system", "content": prompt + policies + note},
+            {"role": "user", "content": text},
+        ],
+        items=policy_list,
+        text=input_text,
+        trim_field="instruction",
+    )
+    return messages
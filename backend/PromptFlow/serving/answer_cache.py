@@ -0,0 +1,172 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+from search_backend import file_version
+
+# -----------------------------
+# Configuration
+# -----------------------------
+# Legal teams ask the same few questions about the same contract all day, in
+# slightly different words. An answer is reused when the new question's
+# embedding has at least THRESHOLD cosine similarity with a cached one asked
+# about the same file, in the same language, against the same version of the
+# file in the index. ada-002 puts unrelated questions around 0.75-0.85, so
+# keep the threshold high.
+ENABLED = os.environ.get("ALLY_ANSWER_CACHE", "on").lower() not in ("0", "off", "false", "no")
+THRESHOLD = float(os.environ.get("ALLY_ANSWER_CACHE_THRESHOLD", "0.97"))
+MAX_ENTRIES = int(os.environ.get("ALLY_ANSWER_CACHE_MAX_ENTRIES", "2048"))
+TTL = float(os.environ.get("ALLY_ANSWER_CACHE_TTL", "86400"))
+# How long a file's index version is trusted before it is read again, i.e.
+# how long a re-indexed file can keep serving answers from its old text
+VERSION_CHECK_INTERVAL = float(os.environ.get("ALLY_ANSWER_CACHE_CHECK_INTERVAL", "30"))
+
+
+class _Entry:
+    __slots__ = ("key", "vector", "answer", "stored_at")
+
+    def __init__(self, key, vector, answer, stored_at):
+        self.key = key
+        self.vector = vector
+        self.answer = answer
+        self.stored_at = stored_at
+
+
+class AnswerCache:
+    """In-process cache of ask_result_format answers.
+
+    Entries are grouped by (filename, language, version), where the version
+    is the file's paragraph count and latest `date` in the document index, so
+    re-indexing the file moves it to a new group and the old answers are
+    dropped the next time the version is read. The cache holds at most
+    `max_entries` answers, evicting the least recently used, and an answer
+    older than `ttl` seconds is never returned.
+    """
+
+    def __init__(self, threshold=THRESHOLD, max_entries=MAX_ENTRIES, ttl=TTL,
+                 check_interval=VERSION_CHECK_INTERVAL):
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.check_interval = check_interval
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()   # entry id -> _Entry, least recently used first
+        self._groups = {}               # (filename, language, version) -> set of entry ids
+        self._versions = {}             # filename -> (version, read at)
+        self._next_id = 0
+
+    # -----------------------------
+    # Lookups
+    # -----------------------------
+    def lookup(self, filename, language, version, vector):
+        """Return (answer, similarity) of the closest cached question, or
+        (None, best similarity) when none reaches the threshold."""
+        query = _normalized(vector)
+        now = time.monotonic()
+        with self._lock:
+            ids = [i for i in self._groups.get((filename, language, version), ()) if self._fresh(i, now)]
+            if not ids:
+                self.misses += 1
+                return None, 0.0
+            similarities = np.stack([self._entries[i].vector for i in ids]) @ query
+            best = int(np.argmax(similarities))
+            similarity = float(similarities[best])
+            if similarity < self.threshold:
+                self.misses += 1
+                return None, similarity
+            self._entries.move_to_end(ids[best])
+            self.hits += 1
+            return self._entries[ids[best]].answer, similarity
+
+    def put(self, filename, language, version, vector, answer):
+        key = (filename, language, version)
+        with self._lock:
+            entry_id = self._next_id
+            self._next_id += 1
+            self._entries[entry_id] = _Entry(key, _normalized(vector), answer, time.monotonic())
+            self._groups.setdefault(key, set()).add(entry_id)
+            while len(self._entries) > self.max_entries:
+                self._remove(next(iter(self._entries)))
+
+    # -----------------------------
+    # Document versions
+    # -----------------------------
+    async def document_version(self, backend, index_name, filename):
+        """The file's current version, read from the index at most once per
+        check interval. A new version drops the file's cached answers."""
+        now = time.monotonic()
+        with self._lock:
+            known = self._versions.get(filename)
+            if known and now - known[1] <= self.check_interval:
+                return known[0]
+
+        version = await file_version(backend, index_name, filename)
+
+        with self._lock:
+            if known and known[0] != version:
+                self._invalidate(filename)
+            self._versions[filename] = (version, now)
+        return version
+
+    def invalidate(self, filename=None):
+        """Drop the cached answers for one file, or for every file."""
+        with self._lock:
+            self._invalidate(filename)
+
+    def report(self):
+        total = self.hits + self.misses
+        rate = self.hits / total * 100 if total else 0.0
+        return f"answer cache: {self.hits} hits, {self.misses} misses ({rate:.0f}% hit rate), {len(self._entries)} answers"
+
+    # -----------------------------
+    # Internals (caller holds the lock)
+    # -----------------------------
+    def _fresh(self, entry_id, now):
+        if now - self._entries[entry_id].stored_at <= self.ttl:
+            return True
+        self._remove(entry_id)
+        return False
+
+    def _remove(self, entry_id):
+        entry = self._entries.pop(entry_id)
+        group = self._groups.get(entry.key)
+        if group is not None:
+            group.discard(entry_id)
+            if not group:
+                del self._groups[entry.key]
+
+    def _invalidate(self, filename):
+        for key in [key for key in self._groups if filename is None or key[0] == filename]:
+            for entry_id in list(self._groups[key]):
+                self._remove(entry_id)
+        if filename is None:
+            self._versions.clear()
+        else:
+            self._versions.pop(filename, None)
+
+
+def _normalized(vector):
+    vector = np.asarray(vector, dtype=np.float32)
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm else vector
+
+
+_default_cache = None
+_default_lock = threading.Lock()
+
+
+def get_default_cache():
+    """Process-wide cache built from the ALLY_ANSWER_CACHE_* settings, or
+    None when the answer cache is turned off."""
+    global _default_cache
+    if not ENABLED:
+        return None
+    with _default_lock:
+        if _default_cache is None:
+            _default_cache = AnswerCache()
+        return _default_cache
@@ -0,0 +1,194 @@
+import asyncio
+import functools
+import hashlib
+import inspect
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+
+import telemetry
+from bounded_sqlite import BoundedTable, remember
+from search_backend import get_search_backend
+
+# -----------------------------
+# Configuration
+# -----------------------------
+# The add-in re-sends identical inputs when the pane is re-opened or the same
+# clause is clicked twice. Results are kept per worker in an LRU of
+# MEMORY_ITEMS, and also in a SQLite file at ALLY_MEMO_PATH when it is set,
+# so every gunicorn worker on the machine can reuse them.
+ENABLED = os.environ.get("ALLY_MEMO", "on").lower() not in ("0", "off", "false", "no")
+DEFAULT_PATH = os.environ.get("ALLY_MEMO_PATH") or None
+DEFAULT_MEMORY_ITEMS = int(os.environ.get("ALLY_MEMO_MEMORY_ITEMS", "256"))
+DEFAULT_MAX_BYTES = int(float(os.environ.get("ALLY_MEMO_MAX_MB", "256")) * 1024 * 1024)
+# Results also depend on the model deployment and its behaviour, which no
+# version token covers, so nothing is reused for longer than this
+DEFAULT_TTL = float(os.environ.get("ALLY_MEMO_TTL", "86400"))
+
+
+def _canonical(value):
+    # Connections are keyed by their configs (endpoints, deployments, index
+    # names); secrets never reach the key
+    if hasattr(value, "configs") and hasattr(value, "secrets"):
+        return {"connection": type(value).__name__, "configs": dict(value.configs)}
+    if hasattr(value, "model_dump"):
+        return value.model_dump()
+    if isinstance(value, (set, frozenset)):
+        return sorted(value, key=repr)
+    raise TypeError(f"{type(value).__name__} cannot be part of a memo key")
+
+
+def memo_key(node, code, arguments, version):
+    payload = json.dumps([node, code, arguments, version], sort_keys=True, default=_canonical,
+                         ensure_ascii=False, separators=(",", ":"))
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class MemoStore:
+    """Tool results by memo key: an in-process LRU, then an optional SQLite
+    file kept under `max_bytes` by evicting the least recently used rows.
+    Results are stored as JSON; an entry older than `ttl` seconds is a miss."""
+
+    def __init__(self, path=DEFAULT_PATH, memory_items=DEFAULT_MEMORY_ITEMS, max_bytes=DEFAULT_MAX_BYTES,
+                 ttl=DEFAULT_TTL):
+        self.path = path
+        self.memory_items = memory_items
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._memory = OrderedDict()    # key -> (stored_at, value)
+        self._lock = threading.Lock()
+        self._table = None
+        if path:
+            self._table = BoundedTable(
+                path, "memo",
+                "key TEXT PRIMARY KEY, node TEXT NOT NULL, value TEXT NOT NULL,"
+                " size INTEGER NOT NULL, stored_at REAL NOT NULL, last_used REAL NOT NULL",
+                max_bytes,
+            )
+
+    def get(self, key):
+        """Return (tier, value) with tier 'memory', 'disk' or 'miss'."""
+        now = time.time()
+        with self._lock:
+            found = self._memory.get(key)
+            if found is not None and now - found[0] <= self.ttl:
+                self._memory.move_to_end(key)
+                return "memory", json.loads(found[1])
+            if self._table is not None:
+                row = self._table.db.execute("SELECT value, stored_at FROM memo WHERE key = ?", (key,)).fetchone()
+                if row is not None and now - row[1] <= self.ttl:
+                    self._table.touch([key], now)
+                    self._remember(key, row[1], row[0])
+                    return "disk", json.loads(row[0])
+        return "miss", None
+
+    def put(self, key, node, value):
+        now = time.time()
+        encoded = json.dumps(value, ensure_ascii=False)
+        with self._lock:
+            self._remember(key, now, encoded)
+            if self._table is not None:
+                self._table.insert([(key, node, encoded, len(encoded), now, now)], [len(encoded)])
+
+    # -----------------------------
+    # Internals (called with the lock held)
+    # -----------------------------
+    def _remember(self, key, stored_at, encoded):
+        # Kept encoded so a caller mutating its result cannot change the memo
+        remember(self._memory, key, (stored_at, encoded), self.memory_items)
+
+
+def _code_version(fn):
+    # Editing the tool (its prompt, its response model) must not serve
+    # results of the old code from the shared file
+    try:
+        source = inspect.getsource(inspect.getmodule(fn))
+    except (OSError, TypeError):
+        source = fn.__code__.co_code.hex()
+    return hashlib.sha256(source.encode("utf-8")).hexdigest()[:16]
+
+
+def memoize(node, version=None):
+    """Decorator for an async tool function: returns the stored result when
+    it was called with the same arguments, under the same version token,
+    before. Goes below @instrument.
+
+    `version` receives the call's arguments by name and returns (or
+    awaits to) a JSON-serializable token for the data the result was built
+    from, e.g. the policy catalog version. Calls whose arguments cannot be
+    canonicalized, and results that are None, are not memoized.
+
+    For callers that produce the result some other way (a streamed
+    response), the decorated function also has `await fn.recall(*args,
+    **kwargs)`, returning (key, stored result or None), and
+    `fn.remember(key, result)`.
+    """
+    def decorator(fn):
+        signature = inspect.signature(fn)
+        code = _code_version(fn)
+
+        async def recall(*args, **kwargs):
+            if not ENABLED:
+                return None, None
+            arguments = signature.bind(*args, **kwargs)
+            arguments.apply_defaults()
+            try:
+                token = None
+                if version is not None:
+                    token = version(**arguments.arguments)
+                    if inspect.isawaitable(token):
+                        token = await token
+                key = memo_key(node, code, arguments.arguments, token)
+            except Exception as e:
+                # No key (unreadable version, unhashable argument): just run the tool
+                print(f"{node}: not memoized. Error: {e}")
+                return None, None
+            tier, value = await asyncio.to_thread(get_default_store().get, key)
+            telemetry.record_cache("memo", node, tier)
+            return key, value
+
+        def remember(key, result):
+            if key is None or result is None:
+                return
+            try:
+                get_default_store().put(key, node, result)
+            except (TypeError, ValueError) as e:
+                print(f"{node}: result not memoized. Error: {e}")
+
+        @functools.wraps(fn)
+        async def wrapper(*args, **kwargs):
+            key, value = await recall(*args, **kwargs)
+            if value is not None:
+                return value
+            result = await fn(*args, **kwargs)
+            await asyncio.to_thread(remember, key, result)
+            return result
+
+        wrapper.recall = recall
+        wrapper.remember = remember
+        return wrapper
+    return decorator
+
+
+# -----------------------------
+# Version tokens
+# -----------------------------
+# For tools taking the `ally` connection as `ally`
+async def policy_catalog_version(ally, **arguments):
+    """Changes whenever the policy catalog reloads a different index."""
+    return await asyncio.to_thread(get_search_backend(ally).policy_catalog().version)
+
+
+_default_store = None
+_default_lock = threading.Lock()
+
+
+def get_default_store():
+    """Process-wide store built from the ALLY_MEMO_* settings."""
+    global _default_store
+    with _default_lock:
+        if _default_store is None:
+            _default_store = MemoStore()
+        return _default_store
@@ -0,0 +1,84 @@
+import os
+
+import numpy as np
+
+from prompt_budget import compact, count_tokens
+
+# -----------------------------
+# Configuration
+# -----------------------------
+# The compliance prompts used to list every policy of the catalog. Before a
+# prompt is built, each policy is scored by the cosine similarity of its
+# stored embedding to the text (the best over the text's paragraphs), and
+# only the TOP_K best scoring at least THRESHOLD are sent. ada-002 scores
+# unrelated legal text around 0.70-0.75, so keep the threshold above that.
+# When fewer than MIN_POLICIES pass, the MIN_POLICIES best are sent anyway.
+ENABLED = os.environ.get("ALLY_POLICY_SELECTION", "on").lower() not in ("0", "off", "false", "no")
+TOP_K = int(os.environ.get("ALLY_POLICY_TOP_K", "20"))
+THRESHOLD = float(os.environ.get("ALLY_POLICY_THRESHOLD", "0.78"))
+MIN_POLICIES = int(os.environ.get("ALLY_POLICY_MIN", "3"))
+
+
+def policy_key(policy):
+    # The tools pass policies around as {"title", "instruction"} dicts
+    return policy.get("title"), policy.get("instruction")
+
+
+def policy_scores(catalog, vectors, language=None):
+    """{policy key: best cosine similarity of the policy's embedding to any
+    of `vectors`} for the catalog policies of `language` that have one."""
+    policies, matrix = catalog.embedding_matrix(language)
+    queries = np.asarray(vectors, dtype=np.float32)
+    if not policies or queries.ndim != 2 or not len(queries) or queries.shape[1] != matrix.shape[1]:
+        return {}
+    norms = np.linalg.norm(queries, axis=1, keepdims=True)
+    best = (matrix @ (queries / np.where(norms, norms, 1.0)).T).max(axis=1)
+    return {policy_key(policy): float(score) for policy, score in zip(policies, best)}
+
+
+def select_policies(catalog, policy_list, vectors, language=None, top_k=None, threshold=None, min_policies=None):
+    """The entries of `policy_list` relevant to the text embedded as
+    `vectors`, most relevant first.
+
+    Listed policies of another language than `language` are dropped; listed
+    policies the catalog has no embedding for are kept, since nothing says
+    they are irrelevant. Without any policy of `language` the language is
+    not filtered on. The limits default to the ALLY_POLICY_* settings.
+    """
+    top_k = TOP_K if top_k is None else top_k
+    threshold = THRESHOLD if threshold is None else threshold
+    min_policies = MIN_POLICIES if min_policies is None else min_policies
+    if not ENABLED or not policy_list:
+        return list(policy_list)
+    scores = policy_scores(catalog, vectors, language)
+    if language is not None and not scores:
+        language = None
+        scores = policy_scores(catalog, vectors)
+    if not scores:
+        return list(policy_list)
+
+    embedded = {policy_key(policy) for policy in catalog.embedding_matrix()[0]}
+    ranked = sorted((policy for policy in policy_list if policy_key(policy) in scores),
+                    key=lambda policy: scores[policy_key(policy)], reverse=True)
+    selected = [policy for policy in ranked[:top_k] if scores[policy_key(policy)] >= threshold]
+    if len(selected) < min_policies:
+        selected = ranked[:min(min_policies, top_k)]
+    return selected + [policy for policy in policy_list if policy_key(policy) not in embedded]
+
+
+def report(node, full, selections, serialize=compact):
+    """One line comparing the policy sections of the prompts built from
+    `selections` (the selected policies of each prompt) with the full list
+    in every prompt."""
+    before = count_tokens(serialize(full)) * len(selections)
+    after = sum(count_tokens(serialize(selected)) for selected in selections)
+    saved = (before - after) / before * 100 if before else 0.0
+    sent = sorted(len(selected) for selected in selections)
+    if not sent:
+        counts = "0"
+    elif sent[0] == sent[-1]:
+        counts = f"{sent[0]}"
+    else:
+        counts = f"{sent[0]}-{sent[-1]}"
+    return (f"{node}: {counts} of {len(full)} policies per prompt in {len(selections)} prompt(s) "
+            f"(top {TOP_K}, threshold {THRESHOLD}), {after} of {before} policy tokens ({saved:.0f}% saved)")
@@ -0,0 +1,74 @@
+"""query_type 3 answer cache: a repeated question against a schema-faithful index.
+
+Runs legal-main-flow in-process against the local Azure stubs, whose
+legal-documents index only sorts on the fields the real schema makes
+sortable, and asks the same question --repeat times, then once more after
+the file is re-indexed (every paragraph gets a new `date`). The file's
+version is read on every request (ALLY_ANSWER_CACHE_CHECK_INTERVAL=0), so
+each one pays the version check. Reports the latency and stub requests of
+each call and checks that the repeats were served from the cache with the
+first answer, and that re-indexing made the next call miss. With
+--unsortable-date the index cannot sort on `date`, as indexes created before
+it was made sortable, and the version is read from every paragraph.
+
+    python benchmarks/bench_answer_cache.py --repeat 3 --latency 0.05 [--unsortable-date]
+"""
+import argparse
+import os
+import sys
+import time
+
+os.environ["ALLY_ANSWER_CACHE"] = "on"
+os.environ["ALLY_ANSWER_CACHE_CHECK_INTERVAL"] = "0"
+sys.path.insert(0, os.path.dirname(__file__))
+import bench_serving_engines as serving  # noqa: E402
+from stub_servers import SORTABLE_FIELDS, StubServer  # noqa: E402
+
+
+def ask(invoker, server, body):
+    before = server.request_count
+    start = time.perf_counter()
+    output = invoker.invoke(body)
+    return output, time.perf_counter() - start, server.request_count - before
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=3, help="times the question is asked again")
+    parser.add_argument("--latency", type=float, default=0.05, help="seconds per request")
+    parser.add_argument("--unsortable-date", action="store_true", help="legal-documents cannot sort on date")
+    args = parser.parse_args()
+
+    from promptflow._utils.logger_utils import LoggerFactory
+    from promptflow.core import Flow
+    from promptflow.core._serving.flow_invoker import FlowInvoker
+
+    sortable = dict(SORTABLE_FIELDS)
+    if args.unsortable_date:
+        sortable["legal-documents"] = sortable["legal-documents"] - {"date"}
+    with StubServer(latency=args.latency, sortable=sortable) as server, LoggerFactory.disable_all_loggers():
+        serving.seed(server)
+        invoker = FlowInvoker(Flow.load(serving.FLOW_DIR),
+                              connections={"ally": serving.ally_connection(server)._to_execution_connection_dict()})
+        body = serving.request_body(3, 0)
+
+        print(f"{'call':<14} {'ms':>7} {'requests':>9}")
+        first, elapsed, requests = ask(invoker, server, body)
+        print(f"{'first':<14} {elapsed * 1000:>7.0f} {requests:>9}")
+        for i in range(args.repeat):
+            output, elapsed, repeated = ask(invoker, server, body)
+            print(f"{f'repeat {i + 1}':<14} {elapsed * 1000:>7.0f} {repeated:>9}")
+            # A hit only reads the file's version: no search_doc, no chat completion
+            assert output == first and repeated < requests, "the repeated question was not served from the cache"
+
+        for document in server.indexes["legal-documents"].values():
+            document["date"] = "2030-01-01T00:00:00Z"
+        _, elapsed, reindexed = ask(invoker, server, body)
+        print(f"{'re-indexed':<14} {elapsed * 1000:>7.0f} {reindexed:>9}")
+        # A miss makes the search_doc and chat requests again (the first call
+        # also found out whether the index sorts on date)
+        assert reindexed > repeated, "re-indexing the file did not drop its cached answers"
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+"""doc-embedding chunk_data: throughput and clause-boundary agreement of clause_chunker.
+
+Reads files/contract-for-the-purchase-of-goods-and-services.docx and renders
+its body text two ways: as Word gives it to the add-in, with the list
+numbering written out ("4.\\t" before a Heading 1 clause, "(a)\\t"/"(i)\\t"
+before list items), and as python-docx reads it, without any numbering. The
+reference boundaries come from the document's styles, not from its text: a
+clause starts at the first line after each Heading 1, an item at each
+numbered list paragraph. For every --max-tokens limit, reports chunks/s and
+characters/s over --repeat runs, whether every run gave the same chunks, the
+chunk sizes, clause recall (clauses a chunk starts at) and boundary
+precision (chunks that start at a clause or an item). Token counts use
+tiktoken when its encoding can be loaded, the ~4 characters per token
+estimate otherwise.
+
+    python benchmarks/bench_clause_chunker.py --max-tokens 256 512 1024 --repeat 20
+"""
+import argparse
+import os
+import sys
+import time
+
+from docx import Document
+
+ROOT = os.path.join(os.path.dirname(__file__), "..")
+sys.path.insert(0, os.path.join(ROOT, "indexing"))  # the flow's additional_includes
+import clause_chunker  # noqa: E402
+
+DOCUMENT = os.path.join(ROOT, "files", "contract-for-the-purchase-of-goods-and-services.docx")
+ROMAN = [(10, "x"), (9, "ix"), (5, "v"), (4, "iv"), (1, "i")]
+
+
+def roman(number):
+    text = ""
+    for value, numeral in ROMAN:
+        while number >= value:
+            text, number = text + numeral, number - value
+    return text
+
+
+def numbering(paragraph):
+    """(numId, ilvl) of a list paragraph, None otherwise."""
+    properties = paragraph._p.pPr
+    if properties is None or properties.numPr is None or properties.numPr.numId is None:
+        return None
+    level = properties.numPr.ilvl
+    return properties.numPr.numId.val, level.val if level is not None else 0
+
+
+def render(path, numbered):
+    """(text, clause starts, item starts); the starts are the lines' text."""
+    lines, clause_starts, item_starts = [], [], []
+    clause, counters = 0, {}
+    after_heading = True
+    for paragraph in Document(path).paragraphs:
+        text = paragraph.text
+        number = numbering(paragraph)
+        if paragraph.style.name == "Heading 1":
+            # Heading 1 is numbered by its style, unless numbering is switched off (numId 0)
+            if number is None or number[0] != 0:
+                clause += 1
+                text = f"{clause}.\t{text}" if numbered else text
+            after_heading = True
+        elif text.strip():
+            if after_heading:
+                clause_starts.append(text)
+                after_heading = False
+            if number is not None:
+                item_starts.append(text)
+                levels = counters.setdefault(number[0], [0, 0])
+                levels[number[1]] += 1
+                if number[1] == 0:
+                    levels[1] = 0
+                marker = chr(ord("a") + levels[0] - 1) if number[1] == 0 else roman(levels[1])
+                text = f"({marker})\t{text}" if numbered else text
+        lines.append(text)
+    return "\n".join(lines), clause_starts, item_starts
+
+
+def key(text):
+    # The first words of a chunk's first line, without an item marker
+    words = " ".join(text.strip().splitlines()[0].replace("\t", " ").split())
+    marker = clause_chunker.ENUMERATED.match(words)
+    return words[marker.end():][:60] if marker else words[:60]
+
+
+def agreement(chunks, clause_starts, item_starts):
+    starts = {key(chunk["paragraph"]) for chunk in chunks}
+    boundaries = {key(text) for text in clause_starts + item_starts}
+    recall = sum(key(text) in starts for text in clause_starts) / len(clause_starts)
+    precision = sum(start in boundaries for start in starts) / len(starts)
+    return recall, precision
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--max-tokens", type=int, nargs="+", default=[256, 512, 1024])
+    parser.add_argument("--repeat", type=int, default=20, help="chunking runs per limit")
+    args = parser.parse_args()
+
+    print(f"{'text':<9} {'max':>5} {'chunks':>6} {'chunks/s':>9} {'chars/s':>10} {'same':>5} "
+          f"{'min':>5} {'mean':>5} {'max tok':>7} {'over':>5} {'recall':>7} {'precision':>9}")
+    for label, numbered in [("numbered", True), ("plain", False)]:
+        text, clause_starts, item_starts = render(DOCUMENT, numbered)
+        for max_tokens in args.max_tokens:
+            runs = []
+            start = time.perf_counter()
+            for _ in range(args.repeat):
+                runs.append(clause_chunker.chunk_contract(text, max_tokens=max_tokens))
+            elapsed = time.perf_counter() - start
+            chunks = runs[0]
+            tokens = [clause_chunker.count_tokens(chunk["paragraph"]) for chunk in chunks]
+            recall, precision = agreement(chunks, clause_starts, item_starts)
+            print(f"{label:<9} {max_tokens:>5} {len(chunks):>6} {len(chunks) * args.repeat / elapsed:>9.0f} "
+                  f"{len(text) * args.repeat / elapsed:>10.0f} {str(all(run == chunks for run in runs)):>5} "
+                  f"{min(tokens):>5} {sum(tokens) / len(tokens):>5.0f} {max(tokens):>7} "
+                  f"{sum(count > max_tokens for count in tokens):>5} {recall:>7.0%} {precision:>9.0%}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+"""Fresh clients per call vs the shared pooled clients in `indexing/clients.py`.
+
+Each thread stands in for a flow node: one embeddings call and one search
+call per request, with clients built per call (as the tools used to do) or
+taken from the shared registry. Runs against the local stubs over plain HTTP,
+so the saving excludes TLS handshakes and understates the real one.
+
+    python benchmarks/bench_client_pool.py --threads 1 8 --requests 20
+"""
+import argparse
+import os
+import sys
+import threading
+import time
+from types import SimpleNamespace
+
+from azure.core.credentials import AzureKeyCredential
+from azure.search.documents import SearchClient
+from openai import AzureOpenAI
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "indexing"))
+import clients  # noqa: E402
+from stub_servers import StubServer  # noqa: E402
+
+API_VERSION = "2024-08-01-preview"
+INDEX_NAME = "legal-documents"
+
+
+def fresh(ally):
+    return (AzureOpenAI(azure_endpoint=ally.openai_endpoint, api_key=ally.openai_key, api_version=API_VERSION),
+            SearchClient(ally.search_endpoint, INDEX_NAME, AzureKeyCredential(ally.search_key)))
+
+
+def pooled(ally):
+    return clients.openai_client(ally), clients.search_client(ally, INDEX_NAME)
+
+
+def run(make_clients, ally, threads, requests):
+    def worker():
+        for _ in range(requests):
+            openai, search = make_clients(ally)
+            openai.embeddings.create(model="ada002", input="clause")
+            list(search.search(search_text="*", top=1))
+
+    workers = [threading.Thread(target=worker) for _ in range(threads)]
+    start = time.perf_counter()
+    for thread in workers:
+        thread.start()
+    for thread in workers:
+        thread.join()
+    return (time.perf_counter() - start) / requests * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--threads", type=int, nargs="+", default=[1, 8])
+    parser.add_argument("--requests", type=int, default=20, help="requests per thread")
+    parser.add_argument("--latency", type=float, default=0.01)
+    args = parser.parse_args()
+
+    with StubServer(latency=args.latency) as server:
+        server.indexes[INDEX_NAME] = {"1": {"id": "1"}}
+        ally = SimpleNamespace(openai_endpoint=server.url, openai_key="stub", openai_api_version=API_VERSION,
+                               search_endpoint=server.url, search_key="stub")
+        print(f"{'threads':>8} {'fresh':>12} {'pooled':>12}")
+        for threads in args.threads:
+            fresh_ms = run(fresh, ally, threads, args.requests)
+            pooled_ms = run(pooled, ally, threads, args.requests)
+            print(f"{threads:>8} {fresh_ms:>9.1f} ms {pooled_ms:>9.1f} ms   (per request, wall)")
+
+
+if __name__ == "__main__":
+    main()
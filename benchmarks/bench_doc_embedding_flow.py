@@ -0,0 +1,94 @@
+"""doc-embedding add_2_index: serial embedding vs windowed batches with bulk upload.
+
+Indexes --chunks chunks of one document against local stubs of Azure OpenAI
+and Azure AI Search two ways: as the tool used to, one embeddings call per
+chunk with every document then sent in one upload request, and with the
+tool as it is now (concurrent embedding batches per window of
+WINDOW_CHUNKS, bulk upload of one window while the next is embedded). Reports
+wall time, requests and the peak Python memory of each run, and checks that
+the tool indexed every chunk. Memory tracing slows both runs several times
+over (most of it is the SDKs parsing vectors), so compare the times with
+each other only.
+
+    python benchmarks/bench_doc_embedding_flow.py --chunks 100 1000 --latency 0.05
+"""
+import argparse
+import asyncio
+import contextlib
+import io
+import os
+import sys
+import time
+import tracemalloc
+from types import SimpleNamespace
+
+from azure.core.credentials import AzureKeyCredential
+from azure.search.documents import SearchClient
+from openai import AzureOpenAI
+
+ROOT = os.path.join(os.path.dirname(__file__), "..")
+sys.path.insert(0, os.path.join(ROOT, "indexing"))  # the flow's additional_includes
+sys.path.insert(0, os.path.join(ROOT, "backend", "PromptFlow", "doc-embedding"))
+os.environ["ALLY_EMBEDDING_CACHE"] = "off"  # every run must reach the stub
+
+import add_2_index  # noqa: E402
+from stub_servers import StubServer  # noqa: E402
+
+
+def chunks(count):
+    return {"chunk": [{"id": str(i), "title": f"Clause {i}", "paragraph": f"Clause {i}. The Seller shall deliver "
+                       f"the Goods within {i} days of the Purchase Order.", "keyphrases": [], "summary": "..."}
+                      for i in range(1, count + 1)]}
+
+
+def serial(server, filename, document):
+    # Mirrors the original tool, with its commented-out upload call restored
+    client = AzureOpenAI(azure_endpoint=server.url, api_key="stub", api_version="2024-08-01-preview")
+    for item in document['chunk']:
+        item['id'] = filename + "-" + str(item['id'])
+        item['embedding'] = client.embeddings.create(input=item['paragraph'], model="ada002").data[0].embedding
+        item['filename'] = filename
+    search_client = SearchClient(server.url, add_2_index.SEARCH_INDEX, AzureKeyCredential("stub"))
+    search_client.upload_documents(documents=document['chunk'])
+    return document['chunk']
+
+
+def windowed(server, filename, document):
+    openai = SimpleNamespace(api_base=server.url, api_key="stub")
+    search = SimpleNamespace(endpoint=server.url, key="stub")
+    with contextlib.redirect_stdout(io.StringIO()):  # the uploader prints every batch
+        return asyncio.run(add_2_index.my_python_tool(filename, document, search, openai))
+
+
+def measure(server, run, count):
+    server.indexes[add_2_index.SEARCH_INDEX] = {}
+    document = chunks(count)
+    before = server.request_count
+    tracemalloc.start()
+    start = time.perf_counter()
+    output = run(server, "contract.docx", document)
+    elapsed = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return elapsed, server.request_count - before, peak / 1024 / 1024, output
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--chunks", type=int, nargs="+", default=[100, 1000])
+    parser.add_argument("--latency", type=float, default=0.05, help="seconds per request")
+    args = parser.parse_args()
+
+    with StubServer(latency=args.latency) as server:
+        print(f"{'chunks':>7} {'mode':<10} {'seconds':>8} {'requests':>9} {'peak MB':>8}")
+        for count in args.chunks:
+            for label, run in [("serial", serial), ("windowed", windowed)]:
+                elapsed, requests, peak, output = measure(server, run, count)
+                if run is windowed:
+                    indexed = sum(status["status"] == "indexed" for status in output)
+                    assert indexed == count == len(server.indexes[add_2_index.SEARCH_INDEX]), "chunks were not indexed"
+                print(f"{count:>7} {label:<10} {elapsed:>8.2f} {requests:>9} {peak:>8.1f}")
+
+
+if __name__ == "__main__":
+    main()
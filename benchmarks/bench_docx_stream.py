@@ -0,0 +1,115 @@
+"""Reading .docx agreements: python-docx vs the streaming reader (docx_stream).
+
+Builds agreements --copies times the length of
+files/contract-for-the-purchase-of-goods-and-services.docx (its body
+repeated) and reads each one three ways: with python-docx, joining the
+paragraphs as extract_text_from_docx used to; with docx_stream's paragraphs
+joined the same way; and as clauses from docx_stream.iter_clauses, handed on
+one at a time as a later stage would take them. Reports the seconds until
+the first paragraph or clause is available, the total seconds, and how far
+each raised the peak resident memory of a fresh process (python-docx's tree
+is built by lxml, outside what tracemalloc sees); the streaming clause
+reader's should not grow with the document.
+
+    python benchmarks/bench_docx_stream.py --copies 1 10 50
+"""
+import argparse
+import concurrent.futures
+import os
+import re
+import resource
+import sys
+import tempfile
+import time
+import zipfile
+
+from docx import Document
+
+ROOT = os.path.join(os.path.dirname(__file__), "..")
+sys.path.insert(0, os.path.join(ROOT, "indexing"))
+import docx_stream  # noqa: E402
+
+SAMPLE = os.path.join(ROOT, "files", "contract-for-the-purchase-of-goods-and-services.docx")
+
+
+def build(copies, folder):
+    """The sample with its body (everything before the section properties)
+    repeated `copies` times."""
+    path = os.path.join(folder, f"agreement-x{copies}.docx")
+    with zipfile.ZipFile(SAMPLE) as source, zipfile.ZipFile(path, "w", zipfile.ZIP_DEFLATED) as target:
+        for item in source.infolist():
+            data = source.read(item.filename)
+            if item.filename == docx_stream.DOCUMENT_PART:
+                xml = data.decode("utf-8")
+                start = xml.index(">", xml.index("<w:body")) + 1
+                end = re.search(r"<w:sectPr(?=[ >])", xml[start:]).start() + start
+                data = (xml[:start] + xml[start:end] * copies + xml[end:]).encode("utf-8")
+            target.writestr(item, data)
+    return path
+
+
+def python_docx(path, started):
+    document = Document(path)
+    first = time.perf_counter() - started  # the whole tree is built before any paragraph
+    text = "\n".join([p.text.strip() for p in document.paragraphs if p.text.strip()])
+    return first, len(text)
+
+
+def stream_text(path, started):
+    first = None
+    texts = []
+    for paragraph in docx_stream.iter_paragraphs(path):
+        first = first or time.perf_counter() - started
+        if paragraph.text.strip():
+            texts.append(paragraph.text.strip())
+    return first, len("\n".join(texts))
+
+
+def stream_clauses(path, started):
+    first = None
+    tokens = 0
+    for chunk in docx_stream.iter_clauses(path):
+        first = first or time.perf_counter() - started
+        tokens = chunk["total_tokens"]
+    return first, tokens
+
+
+def peak_rss():
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024  # MB; ru_maxrss is in KB on Linux
+
+
+def run(read, path):
+    # In a process of its own, so one reader's peak does not hide the next one's
+    docx_stream.count_tokens("warm up")  # load the tokenizer outside the measurement
+    before = peak_rss()
+    started = time.perf_counter()
+    first, size = read(path, started)
+    elapsed = time.perf_counter() - started
+    return first, elapsed, peak_rss() - before, size
+
+
+def measure(read, path):
+    with concurrent.futures.ProcessPoolExecutor(max_workers=1) as executor:
+        return executor.submit(run, read, path).result()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--copies", type=int, nargs="+", default=[1, 10, 50])
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as folder:
+        print(f"{'copies':>6} {'file KB':>8} {'reader':<16} {'first s':>8} {'seconds':>8} {'peak MB':>8}")
+        for copies in args.copies:
+            path = build(copies, folder)
+            sizes = {}
+            for label, read in [("python-docx", python_docx), ("stream, text", stream_text),
+                                ("stream, clauses", stream_clauses)]:
+                first, elapsed, peak, sizes[label] = measure(read, path)
+                print(f"{copies:>6} {os.path.getsize(path) / 1024:>8.0f} {label:<16} {first:>8.3f} "
+                      f"{elapsed:>8.2f} {peak:>8.1f}")
+            assert sizes["python-docx"] == sizes["stream, text"], "the readers read different text"
+
+
+if __name__ == "__main__":
+    main()
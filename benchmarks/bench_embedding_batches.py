@@ -0,0 +1,75 @@
+"""Throughput of per-paragraph vs batched embedding calls.
+
+Runs both code paths from `indexing/` against a local stub of the Azure
+OpenAI embeddings endpoint and reports paragraphs/sec for each.
+
+    python benchmarks/bench_embedding_batches.py --paragraphs 400 --latency 0.05
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+from openai import AzureOpenAI
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "indexing"))
+from batch_embedding import embed_texts  # noqa: E402
+from stub_servers import StubServer  # noqa: E402
+
+DATA_FILE = os.path.join(os.path.dirname(__file__), "..", "data.json")
+DEPLOYMENT = "ada002"
+
+
+def load_paragraphs(count):
+    with open(DATA_FILE, encoding="utf-8") as f:
+        source = [item["paragraph"] for item in json.load(f)]
+    # Repeat the sample contract until we have enough paragraphs
+    return [f"{source[i % len(source)]} [{i}]" for i in range(count)]
+
+
+def per_paragraph(client, paragraphs):
+    # Mirrors the original get_embedding: one request per paragraph
+    return [
+        client.embeddings.create(model=DEPLOYMENT, input=[text]).data[0].embedding
+        for text in paragraphs
+    ]
+
+
+def batched(client, paragraphs):
+    return embed_texts(client, DEPLOYMENT, paragraphs)
+
+
+def run(name, fn, client, paragraphs, server):
+    start_requests = server.request_count
+    start = time.perf_counter()
+    vectors = fn(client, paragraphs)
+    elapsed = time.perf_counter() - start
+    assert len(vectors) == len(paragraphs)
+    requests = server.request_count - start_requests
+    print(f"{name:<14} {len(paragraphs) / elapsed:>10.1f} paragraphs/sec  "
+          f"{elapsed:>7.2f}s  {requests:>5} requests")
+    return vectors
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--paragraphs", type=int, default=400)
+    parser.add_argument("--latency", type=float, default=0.05, help="fixed seconds per request")
+    parser.add_argument("--per-item-latency", type=float, default=0.001, help="extra seconds per input")
+    args = parser.parse_args()
+
+    paragraphs = load_paragraphs(args.paragraphs)
+    with StubServer(latency=args.latency, per_item_latency=args.per_item_latency) as server:
+        client = AzureOpenAI(azure_endpoint=server.url, api_key="stub", api_version="2023-05-15")
+        print(f"{len(paragraphs)} paragraphs, {args.latency * 1000:.0f} ms per request")
+        single = run("per-paragraph", per_paragraph, client, paragraphs, server)
+        multi = run("batched", batched, client, paragraphs, server)
+
+    # Batching must not reorder vectors relative to their paragraphs
+    assert single == multi, "batched vectors do not line up with their paragraphs"
+    print("vectors identical across both paths")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+"""Index-existence checks (query_type 99): latency and search calls per check.
+
+Seeds the search stub with --paragraphs paragraphs (with embeddings) of one
+file and checks for it, and for a file that is not indexed, four ways: the
+old doc-embedding check (full-text search on the filename, reading every
+match), the old check_index query (filtered, with the total count but also
+a page of documents), the count-only query on the exact filename (top=0),
+and `index_presence.file_indexed` answering repeated checks from its cache.
+The stub ignores search text, so the full-text check reads the whole index
+for either file, as a filename made of common words ("contract") does.
+
+    python benchmarks/bench_index_check.py --paragraphs 50 500 --latency 0.02
+"""
+import argparse
+import os
+import sys
+import time
+
+from azure.core.credentials import AzureKeyCredential
+from azure.search.documents import SearchClient
+
+ROOT = os.path.join(os.path.dirname(__file__), "..")
+sys.path.insert(0, os.path.join(ROOT, "indexing"))
+import index_presence  # noqa: E402
+from stub_servers import StubServer, fake_embedding  # noqa: E402
+
+INDEX_NAME = "legal-documents"
+FILENAME = "contract.docx"
+MISSING = "draft.docx"
+
+
+def seed(server, paragraphs):
+    server.indexes[INDEX_NAME] = {
+        str(i): {"id": str(i), "ParagraphId": i, "filename": FILENAME, "title": f"Clause {i}",
+                 "paragraph": f"Clause {i} of the contract.", "embedding": fake_embedding(f"Clause {i}")}
+        for i in range(1, paragraphs + 1)
+    }
+
+
+def full_text(client, filename):
+    # The old doc-embedding check_ifindexed
+    return len([result["filename"] for result in client.search(search_text=filename, select="filename")]) > 0
+
+
+def total_count(client, filename):
+    # The old check_index query
+    return client.search(search_text="*", filter=f"filename eq '{filename}'", include_total_count=True).get_count() > 0
+
+
+def count_only(client, filename):
+    return client.search(search_text="*", filter=f"filename eq '{filename}'", include_total_count=True,
+                         top=0).get_count() > 0
+
+
+def timed(server, check, repeat):
+    before = server.request_count
+    start = time.perf_counter()
+    for _ in range(repeat):
+        check()
+    return (time.perf_counter() - start) / repeat, (server.request_count - before) / repeat
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--paragraphs", type=int, nargs="+", default=[50, 500])
+    parser.add_argument("--latency", type=float, default=0.02, help="seconds per search request")
+    parser.add_argument("--repeat", type=int, default=10, help="checks per file, as taskpane opens")
+    args = parser.parse_args()
+
+    with StubServer(latency=args.latency) as server:
+        client = SearchClient(server.url, INDEX_NAME, AzureKeyCredential("stub"))
+
+        def count(index_name, filters):
+            return count_only(client, filters["filename"])
+
+        print(f"{'paragraphs':>10} {'check':<22} {'indexed ms':>11} {'calls':>6} {'missing ms':>11} {'calls':>6}")
+        for paragraphs in args.paragraphs:
+            seed(server, paragraphs)
+            cache = index_presence.PresenceCache()
+            checks = [
+                ("full-text, read all", lambda filename: full_text(client, filename)),
+                ("filtered + documents", lambda filename: total_count(client, filename)),
+                ("count only (top=0)", lambda filename: count_only(client, filename)),
+                ("count only, cached", lambda filename: index_presence.file_indexed(count, INDEX_NAME, filename,
+                                                                                    cache=cache)),
+            ]
+            for label, check in checks:
+                row = []
+                for filename in (FILENAME, MISSING):
+                    row += timed(server, lambda: check(filename), args.repeat)
+                print(f"{paragraphs:>10} {label:<22} {row[0] * 1000:>9.1f}ms {row[1]:>6.1f} "
+                      f"{row[2] * 1000:>9.1f}ms {row[3]:>6.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+"""Sequential vs concurrent ingestion of a folder of contracts.
+
+Indexes the same folder twice against local stubs of Azure OpenAI and Azure
+AI Search, once per `azure_doc_processing` mode, reports wall time for each
+and checks that both runs leave identical contents in the index.
+
+    python benchmarks/bench_ingest_modes.py --copies 4 --latency 0.05
+"""
+import argparse
+import asyncio
+import hashlib
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+# Both modes must actually call the (stub) embeddings endpoint
+os.environ["ALLY_EMBEDDING_CACHE"] = "off"
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "indexing"))
+import azure_doc_processing  # noqa: E402
+from async_ingest import ConcurrencyLimits, process_all_documents_async  # noqa: E402
+from stub_servers import StubServer  # noqa: E402
+
+SAMPLE = os.path.join(os.path.dirname(__file__), "..", "files", "contract-for-the-purchase-of-goods-and-services.docx")
+
+# Upload time legitimately differs between two runs over the same input
+VOLATILE_FIELDS = {"date"}
+
+
+def metadata_responder(deployment, body):
+    # Deterministic stand-in for the GPT metadata extraction
+    text = body["messages"][-1]["content"]
+    digest = hashlib.sha256(text.encode("utf-8")).hexdigest()
+    words = text.split()
+    return json.dumps({
+        "title": " ".join(words[:6]),
+        "keyphrases": words[:3],
+        "summary": " ".join(words[:20]),
+        "isCompliant": int(digest, 16) % 5 != 0,
+        "CompliantCollection": [],
+        "NonCompliantCollection": [] if int(digest, 16) % 5 else [digest[:8]],
+    })
+
+
+def snapshot(server):
+    documents = server.indexes.get(azure_doc_processing.INDEX_NAME, {}).values()
+    rows = [
+        {k: v for k, v in doc.items() if k not in VOLATILE_FIELDS}
+        for doc in documents
+    ]
+    return sorted(rows, key=lambda row: (row["filename"], row["ParagraphId"]))
+
+
+def timed(label, fn):
+    start = time.perf_counter()
+    fn()
+    elapsed = time.perf_counter() - start
+    print(f"{label:<12} {elapsed:>7.2f}s")
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--copies", type=int, default=4, help="number of copies of the sample contract")
+    parser.add_argument("--latency", type=float, default=0.05, help="seconds per upstream request")
+    parser.add_argument("--chat-concurrency", type=int, default=16)
+    parser.add_argument("--embedding-concurrency", type=int, default=4)
+    parser.add_argument("--search-concurrency", type=int, default=4)
+    parser.add_argument("--file-concurrency", type=int, default=4)
+    args = parser.parse_args()
+
+    folder = tempfile.mkdtemp(prefix="ally-ingest-")
+    for i in range(args.copies):
+        shutil.copy(SAMPLE, os.path.join(folder, f"contract-{i}.docx"))
+
+    with StubServer(latency=args.latency, chat_responder=metadata_responder) as server:
+        for name in ("AZURE_OPENAI_ENDPOINT", "AZURE_SEARCH_ENDPOINT"):
+            setattr(azure_doc_processing, name, server.url)
+        azure_doc_processing.AZURE_OPENAI_API_KEY = "stub"
+        azure_doc_processing.AZURE_SEARCH_KEY = "stub"
+
+        manifest = os.path.join(folder, "sequential-manifest.json")
+        sequential_time = timed("sequential", lambda: azure_doc_processing.process_all_documents(folder, manifest))
+        sequential = snapshot(server)
+        server.indexes.clear()
+
+        limits = ConcurrencyLimits(chat=args.chat_concurrency, embeddings=args.embedding_concurrency,
+                                   search=args.search_concurrency, files=args.file_concurrency)
+        manifest = os.path.join(folder, "concurrent-manifest.json")
+        concurrent_time = timed("concurrent", lambda: asyncio.run(process_all_documents_async(folder, manifest, limits)))
+        concurrent = snapshot(server)
+
+    shutil.rmtree(folder)
+    print(f"{len(sequential)} paragraphs indexed, speedup {sequential_time / concurrent_time:.1f}x")
+    assert sequential == concurrent, "sequential and concurrent runs produced different index contents"
+    print("index contents identical across both modes")
+
+
+if __name__ == "__main__":
+    main()
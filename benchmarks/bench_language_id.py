@@ -0,0 +1,85 @@
+"""Accuracy and speed of the offline language identifier.
+
+Labels every paragraph of the policies in `policy_document/` (files ending in
+`_German` are German) and the contract clauses in `data.json` (English), plus
+a few German contract clauses, and reports accuracy, how often the LLM
+fallback would have been called and the time per call.
+
+    python benchmarks/bench_language_id.py
+"""
+import argparse
+import glob
+import json
+import os
+import sys
+import time
+
+from docx import Document
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "indexing"))
+from language_id import ENGLISH, GERMAN, is_ambiguous, score_language  # noqa: E402
+
+ROOT = os.path.join(os.path.dirname(__file__), "..")
+POLICY_FOLDER = os.path.join(ROOT, "policy_document")
+DATA_FILE = os.path.join(ROOT, "data.json")
+
+# German counterparts of typical clauses from the sample contract
+GERMAN_CLAUSES = [
+    "Der Vertrag unterliegt dem Recht von Singapur unter Ausschluss der Kollisionsnormen.",
+    "Für Bestellungen an Verkäufer mit Sitz in Singapur sind die Gerichte von Singapur zuständig.",
+    "Der Verkäufer liefert die Waren zu dem in der Bestellung angegebenen Termin.",
+    "Die Zahlung erfolgt innerhalb von 30 Tagen nach Eingang einer ordnungsgemäßen Rechnung.",
+    "Jede Partei kann den Vertrag mit einer Frist von drei Monaten schriftlich kündigen.",
+    "Der Käufer ist berechtigt, mangelhafte Waren auf Kosten des Verkäufers zurückzusenden.",
+    "Vertrauliche Informationen dürfen ohne vorherige Zustimmung nicht an Dritte weitergegeben werden.",
+    "Höhere Gewalt befreit die Parteien für die Dauer der Störung von ihren Leistungspflichten.",
+]
+
+
+def load_samples():
+    samples = []
+    for path in sorted(glob.glob(os.path.join(POLICY_FOLDER, "*.docx"))):
+        language = GERMAN if "German" in os.path.basename(path) else ENGLISH
+        paragraphs = [p.text.strip() for p in Document(path).paragraphs if p.text.strip()]
+        samples.append(("policy document", "\n".join(paragraphs), language))
+        samples.extend(("policy paragraph", text, language) for text in paragraphs)
+    with open(DATA_FILE, encoding="utf-8") as f:
+        samples.extend(("contract clause", item["paragraph"], ENGLISH) for item in json.load(f))
+    samples.extend(("contract clause", text, GERMAN) for text in GERMAN_CLAUSES)
+    return samples
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=200, help="timing repetitions per sample")
+    parser.add_argument("--verbose", action="store_true", help="print every misclassified or deferred sample")
+    args = parser.parse_args()
+
+    samples = load_samples()
+    results = {}
+    for kind, text, expected in samples:
+        language, confidence, evidence = score_language(text)
+        deferred = is_ambiguous(confidence, evidence)
+        counts = results.setdefault(kind, {"total": 0, "correct": 0, "deferred": 0})
+        counts["total"] += 1
+        counts["correct"] += language == expected
+        counts["deferred"] += deferred
+        if args.verbose and (deferred or language != expected):
+            print(f"  [{expected} -> {language}, confidence {confidence:.2f}, evidence {evidence}] {text[:70]!r}")
+
+    print(f"{'samples':<18} {'total':>6} {'accuracy':>9} {'LLM fallback':>13}")
+    for kind, counts in results.items():
+        print(f"{kind:<18} {counts['total']:>6} {counts['correct'] / counts['total']:>9.1%} "
+              f"{counts['deferred'] / counts['total']:>13.1%}")
+
+    texts = [text for _, text, _ in samples]
+    start = time.perf_counter()
+    for _ in range(args.repeat):
+        for text in texts:
+            score_language(text)
+    elapsed = time.perf_counter() - start
+    print(f"{elapsed / (args.repeat * len(texts)) * 1e6:.1f} µs per call")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+"""summary_document on a long synthetic contract: one prompt vs map-reduce.
+
+Generates a contract of --clauses numbered clauses, each touching one of
+--policies policies, and runs `summary_document.summarize` against the chat
+stub. The stub answers with one PolicyItem per policy, quoting every clause
+it was sent that touches the policy, written at --tokens-per-second. One
+prompt over the whole contract generates all of that in sequence; the
+map-reduce mode sends each clause (split when longer than --chunk-tokens)
+in its own call, --concurrency at a time. Reports wall time, model calls and
+merged PolicyItems for the single prompt and for each
+--chunk-tokens/--concurrency combination.
+
+    python benchmarks/bench_map_reduce.py --clauses 120 --chunk-tokens 1024 --concurrency 1 4 8
+"""
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import os
+import re
+import sys
+import time
+
+ROOT = os.path.join(os.path.dirname(__file__), "..")
+FLOW_DIR = os.path.join(ROOT, "backend", "PromptFlow", "legal-main-flow")
+sys.path.insert(0, os.path.join(ROOT, "indexing"))  # the flow's additional_includes
+sys.path.insert(0, FLOW_DIR)
+sys.path.insert(0, os.path.join(ROOT, "backend", "PromptFlow", "serving"))  # the serving-only includes
+os.environ["ALLY_MEMO"] = "off"  # every run must reach the stub
+os.environ["ALLY_POLICY_SELECTION"] = "off"  # every chunk gets the same policies
+
+import summary_document  # noqa: E402
+from bench_serving_engines import ally_connection  # noqa: E402
+from stub_servers import StubServer  # noqa: E402
+
+CLAUSE = re.compile(r"^(\d+)\.? (.+?) \(policy (\d+)\)", re.MULTILINE)
+
+
+def contract(clauses, policies):
+    body = ("The Seller shall perform its obligations with due care and in accordance with applicable law, "
+            "and shall notify the Buyer in writing of any circumstance likely to delay performance. ") * 3
+    return "\n\n".join(f"{i}. Clause {i} (policy {i % policies}) {body}" for i in range(1, clauses + 1))
+
+
+def clause_responder(deployment, body):
+    # One PolicyItem per policy, quoting every clause of the text that touches it
+    clauses = {}
+    for number, title, policy in CLAUSE.findall(body["messages"][-1]["content"]):
+        clauses.setdefault(policy, []).append((number, title))
+    items = [{"title": f"Policy {policy}", "summary": f"{len(found)} clauses against policy {policy}",
+              "compare": "; ".join(title for _, title in found),
+              "original_text": " ".join(f"Clause {number}." for number, _ in found),
+              "original_policy": f"Policy {policy}", "keyItems": [f"clause {number}" for number, _ in found],
+              "iscompliant": "no" if any(int(number) % 5 == 0 for number, _ in found) else "yes"}
+             for policy, found in clauses.items()]
+    return json.dumps({"PolicyItems": items})
+
+
+def run(text, policy_list, ally, server, chunk_tokens, concurrency):
+    summary_document.CHUNK_TOKENS = chunk_tokens
+    summary_document.CONCURRENCY = concurrency
+    calls = server.request_count
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):  # the tool prints per-call budget and merge lines
+        response = asyncio.run(summary_document.summarize(text, policy_list, ally))
+    return time.perf_counter() - start, server.request_count - calls, len(response["PolicyItems"])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--clauses", type=int, default=120)
+    parser.add_argument("--policies", type=int, default=12)
+    parser.add_argument("--chunk-tokens", type=int, nargs="+", default=[1024])
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 8])
+    parser.add_argument("--latency", type=float, default=0.5, help="seconds per chat request before generation")
+    parser.add_argument("--tokens-per-second", type=float, default=100, help="chat generation rate")
+    args = parser.parse_args()
+
+    text = contract(args.clauses, args.policies)
+    policy_list = [{"title": f"Policy {i}", "instruction": f"Policy {i} instruction"} for i in range(args.policies)]
+    print(f"{args.clauses} clauses, {len(text)} characters, {args.tokens_per_second:.0f} tokens/s")
+    print(f"{'mode':<34} {'wall':>8} {'calls':>6} {'items':>6}")
+    with StubServer(latency=args.latency, tokens_per_second=args.tokens_per_second,
+                    chat_responder=clause_responder) as server:
+        ally = ally_connection(server)
+        wall, calls, items = run(text, policy_list, ally, server, len(text), 1)
+        print(f"{'single prompt':<34} {wall:>7.1f}s {calls:>6} {items:>6}")
+        for chunk_tokens in args.chunk_tokens:
+            for concurrency in args.concurrency:
+                wall, calls, items = run(text, policy_list, ally, server, chunk_tokens, concurrency)
+                label = f"clauses up to {chunk_tokens} tokens, {concurrency} at once"
+                print(f"{label:<34} {wall:>7.1f}s {calls:>6} {items:>6}")
+
+
+if __name__ == "__main__":
+    main()
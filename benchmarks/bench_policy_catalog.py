@@ -0,0 +1,92 @@
+"""Policy lookups per request: full index scan vs the per-worker catalog.
+
+Seeds a local Azure AI Search stub with policies, then serves the same
+sequence of requests (list all policies, rank policies for a clause, look up
+the policies a paragraph breaches) both ways and reports wall time and the
+number of search requests. Finally adds a policy to check that the catalog
+notices the change on its next version check.
+
+    python benchmarks/bench_policy_catalog.py --policies 200 --requests 50
+"""
+import argparse
+import os
+import sys
+import time
+
+from azure.core.credentials import AzureKeyCredential
+from azure.search.documents import SearchClient
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "indexing"))
+from policy_catalog import PolicyCatalog  # noqa: E402
+from stub_servers import StubServer, fake_embedding  # noqa: E402
+
+INDEX_NAME = "legal-instructions"
+CLAUSE = ("The Contract shall be governed by and construed in accordance with the laws of Singapore, "
+          "without reference to its conflict of laws rules.")
+
+
+def make_policy(i):
+    language = "German" if i % 2 else "English"
+    instruction = f"Policy {i}: contracts must follow rule {i} on liability, payment and governing law."
+    return {
+        "id": str(i), "PolicyId": str(i), "title": f"Policy {i}", "instruction": instruction,
+        "tags": ["liability"], "severity": 1 + i % 2, "language": language, "groups": [],
+        "embedding": fake_embedding(instruction, 64),
+    }
+
+
+def scan(search_client, breached):
+    # What list_policys, search_policy and get_policyinfo did on every request
+    listed = [r["title"] for r in search_client.search(search_text="*", select="title,instruction")]
+    ranked = [r["title"] for r in search_client.search(search_text=CLAUSE, filter="language eq 'English'",
+                                                        select="title,instruction")]
+    looked_up = [list(search_client.search(filter=f"PolicyId eq '{p}'", select="id,title,instruction"))
+                 for p in breached]
+    return listed, ranked, looked_up
+
+
+def cached(catalog, breached):
+    listed = [p["title"] for p in catalog.policies()]
+    ranked = [p["title"] for p in catalog.search(CLAUSE, fake_embedding(CLAUSE, 64), language="English")]
+    looked_up = [catalog.get(p) for p in breached]
+    return listed, ranked, looked_up
+
+
+def run(label, server, requests, fn):
+    before = server.request_count
+    start = time.perf_counter()
+    for _ in range(requests):
+        fn()
+    elapsed = time.perf_counter() - start
+    calls = server.request_count - before
+    print(f"{label:<8} {elapsed:>7.2f}s {elapsed / requests * 1000:>8.1f} ms/request {calls:>6} search calls")
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--policies", type=int, default=200)
+    parser.add_argument("--requests", type=int, default=50)
+    parser.add_argument("--breached", type=int, default=5, help="policy lookups per request")
+    parser.add_argument("--latency", type=float, default=0.02, help="seconds per search request")
+    args = parser.parse_args()
+
+    with StubServer(latency=args.latency) as server:
+        server.indexes[INDEX_NAME] = {str(i): make_policy(i) for i in range(args.policies)}
+        credential = AzureKeyCredential("stub")
+        search_client = SearchClient(server.url, INDEX_NAME, credential)
+        catalog = PolicyCatalog(server.url, INDEX_NAME, "stub", ttl=3600, check_interval=0.5)
+        breached = [str(i) for i in range(args.breached)]
+
+        scan_time = run("scan", server, args.requests, lambda: scan(search_client, breached))
+        catalog_time = run("catalog", server, args.requests, lambda: cached(catalog, breached))
+        print(f"speedup {scan_time / catalog_time:.1f}x")
+
+        server.indexes[INDEX_NAME]["new"] = dict(make_policy(args.policies), id="new", PolicyId="new")
+        time.sleep(0.6)
+        assert catalog.get("new") is not None, "catalog did not pick up the new policy"
+        print("new policy picked up on the next version check")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+"""summary_full_doc latency as the number of non-compliant paragraphs grows.
+
+Compares the original per-policy lookups (a new SearchClient and one search
+request for every id in every NonCompliantCollection) with the batched
+lookup `report_store.build_report` does, and with serving the stored report
+(`report_store.full_document_report` once built, with its fingerprint read
+again on every call), against a local Azure AI Search stub. All must return
+the same paragraphs and policies.
+
+    python benchmarks/bench_policy_lookups.py --flagged 0 10 30 60 120
+"""
+import argparse
+import asyncio
+import contextlib
+import io
+import os
+import sys
+import time
+from types import SimpleNamespace
+
+from azure.core.credentials import AzureKeyCredential
+from azure.search.documents import SearchClient
+
+ROOT = os.path.join(os.path.dirname(__file__), "..")
+sys.path.insert(0, os.path.join(ROOT, "indexing"))
+sys.path.insert(0, os.path.join(ROOT, "backend", "PromptFlow", "legal-main-flow"))
+sys.path.insert(0, os.path.join(ROOT, "backend", "PromptFlow", "serving"))  # the serving-only includes
+import report_store  # noqa: E402
+from stub_servers import StubServer  # noqa: E402
+
+DOCUMENT_INDEX = "legal-documents"
+POLICY_INDEX = "legal-instructions"
+FILENAME = "contract.docx"
+PARAGRAPHS = 200
+POLICIES = 40
+POLICIES_PER_PARAGRAPH = 3
+
+
+def seed(server, flagged):
+    server.indexes[POLICY_INDEX] = {
+        str(i): {"id": str(i), "PolicyId": str(i), "title": f"Policy {i}", "instruction": f"Rule {i}",
+                 "tags": [], "severity": 1, "language": "English", "groups": []}
+        for i in range(POLICIES)
+    }
+    server.indexes[DOCUMENT_INDEX] = {}
+    for paragraph_id in range(1, PARAGRAPHS + 1):
+        breached = [str((paragraph_id + j) % POLICIES) for j in range(POLICIES_PER_PARAGRAPH)] \
+            if paragraph_id <= flagged else []
+        server.indexes[DOCUMENT_INDEX][str(paragraph_id)] = {
+            "id": str(paragraph_id), "ParagraphId": paragraph_id, "filename": FILENAME,
+            "date": "2024-01-01T00:00:00Z", "title": f"Clause {paragraph_id}", "summary": "...", "keyphrases": [], "isCompliant": not breached,
+            "CompliantCollection": [], "NonCompliantCollection": breached,
+        }
+
+
+def per_policy(ally):
+    # Mirrors the original python_tool/get_policyinfo
+    def get_policyinfo(policyid):
+        client = SearchClient(ally.search_endpoint, ally.search_policy_index, AzureKeyCredential(ally.search_key))
+        results = client.search(filter=f"PolicyId eq '{policyid}'", select="id,title,instruction,tags,severity")
+        results_list = [result for result in results]
+        if not results_list:
+            return None
+        return {k: v for k, v in results_list[0].items() if not k.startswith("@search.")}
+
+    client = SearchClient(ally.search_endpoint, ally.search_document_index, AzureKeyCredential(ally.search_key))
+    paragraphs = []
+    for result in client.search(search_text="*", order_by=["ParagraphId"]):
+        entry = {k: result[k] for k in report_store.PARAGRAPH_FIELDS}
+        if result["isCompliant"] == False:
+            entry["NonCompliantPolicies"] = [get_policyinfo(p) for p in result["NonCompliantCollection"]]
+        paragraphs.append(entry)
+    return paragraphs
+
+
+def timed(server, fn, repeat):
+    before = server.request_count
+    start = time.perf_counter()
+    for _ in range(repeat):
+        output = fn()
+    return (time.perf_counter() - start) / repeat, (server.request_count - before) // repeat, output
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--flagged", type=int, nargs="+", default=[0, 10, 30, 60, 120],
+                        help="numbers of non-compliant paragraphs to measure")
+    parser.add_argument("--latency", type=float, default=0.02, help="seconds per search request")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    with StubServer(latency=args.latency) as server:
+        ally = SimpleNamespace(search_endpoint=server.url, search_key="stub",
+                               search_document_index=DOCUMENT_INDEX, search_policy_index=POLICY_INDEX)
+        backend = report_store.get_search_backend(ally)
+        print(f"{'flagged':>8} {'per-policy':>12} {'calls':>6} {'batched':>10} {'calls':>6} {'stored':>10} {'calls':>6}")
+        for flagged in args.flagged:
+            seed(server, flagged)
+            # Every call checks the fingerprint, as after the check interval
+            store = report_store.ReportStore(path=None, check_interval=0)
+            naive_time, naive_calls, expected = timed(server, lambda: per_policy(ally), args.repeat)
+            batched_time, batched_calls, (actual, _) = timed(
+                server, lambda: asyncio.run(report_store.build_report(backend, DOCUMENT_INDEX, POLICY_INDEX, FILENAME)),
+                args.repeat)
+            assert expected == actual, "batched lookup returned different results"
+            with contextlib.redirect_stdout(io.StringIO()):
+                asyncio.run(report_store.full_document_report(ally, FILENAME, store))
+            stored_time, stored_calls, stored = timed(
+                server, lambda: asyncio.run(report_store.full_document_report(ally, FILENAME, store)), args.repeat)
+            assert expected == stored, "stored report differs"
+            print(f"{flagged:>8} {naive_time * 1000:>10.0f}ms {naive_calls:>6} "
+                  f"{batched_time * 1000:>8.0f}ms {batched_calls:>6} {stored_time * 1000:>8.0f}ms {stored_calls:>6}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,175 @@
+"""Policy pre-selection: prompt size and recall against the full policy list.
+
+Seeds the search stub with a catalog of --policies policies (every fourth
+one German) and generates contracts whose clauses each touch one of
+--touched English policies. Embeddings are synthetic: every policy has a
+topic, policies and clauses share a common "legal text" direction, and a
+clause's vector is its policy's plus --noise, so related texts score about
+0.9 and unrelated ones about 0.6, roughly where ada-002 puts them.
+
+summary_document is run with every policy in its prompts and with the
+pre-selected ones for each --top-k/--threshold. The chat stub reports one
+PolicyItem per policy that the prompt lists and the text touches, so recall
+is the share of the full-list run's PolicyItems the pre-selected run still
+reports. search_policy (query_type 2) is checked the same way: for each
+clause sent as the selection, is its policy still in the list?
+
+    python benchmarks/bench_policy_preselection.py --policies 200 --clauses 15 120 --top-k 5 10 20
+"""
+import argparse
+import asyncio
+import contextlib
+import hashlib
+import io
+import json
+import os
+import re
+import sys
+
+import numpy as np
+
+ROOT = os.path.join(os.path.dirname(__file__), "..")
+FLOW_DIR = os.path.join(ROOT, "backend", "PromptFlow", "legal-main-flow")
+sys.path.insert(0, os.path.join(ROOT, "indexing"))  # the flow's additional_includes
+sys.path.insert(0, FLOW_DIR)
+sys.path.insert(0, os.path.join(ROOT, "backend", "PromptFlow", "serving"))  # the serving-only includes
+os.environ["ALLY_MEMO"] = "off"  # every run must reach the stub
+os.environ["ALLY_EMBEDDING_CACHE"] = "off"
+
+import policy_selection  # noqa: E402
+import prompt_budget  # noqa: E402
+import search_policy  # noqa: E402
+import summary_document  # noqa: E402
+from bench_map_reduce import contract  # noqa: E402
+from bench_serving_engines import ally_connection  # noqa: E402
+from stub_servers import EMBEDDING_DIMENSIONS, StubServer, fake_embedding  # noqa: E402
+
+INDEX_NAME = "legal-instructions"
+CLAUSE = re.compile(r"^(\d+)\. Clause \d+ \(policy (\d+)\)", re.MULTILINE)
+LISTED = re.compile(r'"title":"Policy (\d+)"')
+MENTION = re.compile(r"\(policy (\d+)\)|^Policy (\d+):")
+
+
+def unit(seed):
+    rng = np.random.default_rng(seed)
+    vector = rng.standard_normal(EMBEDDING_DIMENSIONS)
+    return vector / np.linalg.norm(vector)
+
+
+COMMON = unit(0)
+
+
+def topic(policy):
+    return 0.8 * COMMON + 0.6 * unit(policy + 1)
+
+
+def embedder(noise):
+    def embed(text, dimensions):
+        mention = MENTION.search(text)
+        if mention is None:
+            return fake_embedding(text, dimensions)
+        policy = int(mention.group(1) or mention.group(2))
+        seed = int.from_bytes(hashlib.sha256(text.encode("utf-8")).digest()[:8], "big")
+        return (topic(policy) + noise * unit(seed)).tolist()
+    return embed
+
+
+def make_policy(i):
+    instruction = f"Policy {i}: contracts must follow rule {i} on liability, payment and governing law."
+    return {
+        "id": str(i), "PolicyId": str(i), "title": f"Policy {i}", "instruction": instruction, "tags": [],
+        "severity": 1, "language": "German" if i % 4 == 3 else "English", "groups": [],
+        "embedding": topic(i).tolist(),
+    }
+
+
+class Recorder:
+    """Chat responder: one PolicyItem per policy both listed in the system
+    prompt and touched by a clause of the user message; counts the policy
+    section of every prompt."""
+
+    def __init__(self):
+        self.policy_tokens = 0
+        self.prompts = 0
+
+    def __call__(self, deployment, body):
+        system, user = body["messages"][0]["content"], body["messages"][-1]["content"]
+        self.policy_tokens += prompt_budget.count_tokens(system.split("The policy items provided in the list are:", 1)[-1])
+        self.prompts += 1
+        listed = set(LISTED.findall(system))
+        touched = {policy for _, policy in CLAUSE.findall(user)}
+        items = [{"title": f"Policy {policy}", "summary": "stub", "compare": "stub", "original_text": "stub",
+                  "original_policy": f"Policy {policy}", "keyItems": [], "iscompliant": "yes"}
+                 for policy in sorted(touched & listed)]
+        return json.dumps({"PolicyItems": items})
+
+
+def summarize(text, policy_list, ally, recorder):
+    recorder.policy_tokens = recorder.prompts = 0
+    with contextlib.redirect_stdout(io.StringIO()):  # the tool prints every response
+        response = asyncio.run(summary_document.summarize(text, policy_list, ally))
+    reported = {summary_document.policy_key(item) for item in response["PolicyItems"]}
+    return recorder.policy_tokens, reported
+
+
+def selection_lists(clauses, ally):
+    with contextlib.redirect_stdout(io.StringIO()):
+        return [asyncio.run(search_policy.list_policy_tool(clause, ally, [])) for clause in clauses]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--policies", type=int, default=200)
+    parser.add_argument("--touched", type=int, default=12, help="policies the contract's clauses touch")
+    parser.add_argument("--clauses", type=int, nargs="+", default=[15, 120])
+    parser.add_argument("--top-k", type=int, nargs="+", default=[5, 10, 20])
+    parser.add_argument("--threshold", type=float, nargs="+", default=[policy_selection.THRESHOLD])
+    parser.add_argument("--noise", type=float, default=0.5, help="clause distance from its policy's topic")
+    args = parser.parse_args()
+
+    english = [i for i in range(args.policies) if i % 4 != 3]
+    touched = english[:args.touched]
+    recorder = Recorder()
+    settings = [(top_k, threshold) for top_k in args.top_k for threshold in args.threshold]
+    with StubServer(latency=0.0, chat_responder=recorder, embedder=embedder(args.noise)) as server:
+        server.indexes[INDEX_NAME] = {str(i): make_policy(i) for i in range(args.policies)}
+        ally = ally_connection(server)
+        policy_list = [{"title": p["title"], "instruction": p["instruction"]}
+                       for p in server.indexes[INDEX_NAME].values()]
+
+        print(f"summary_document, {args.policies} policies, clauses touch {len(touched)} of them")
+        print(f"{'mode':<34} {'prompts':>8} {'policy tokens':>14} {'items':>6} {'recall':>7}")
+        for clauses in args.clauses:
+            # Renumber the contract's policies onto the touched English ones
+            text = re.sub(r"\(policy (\d+)\)", lambda m: f"(policy {touched[int(m.group(1))]})",
+                          contract(clauses, len(touched)))
+            policy_selection.ENABLED = False
+            tokens, full = summarize(text, policy_list, ally, recorder)
+            label = f"{clauses} clauses, every policy"
+            print(f"{label:<34} {recorder.prompts:>8} {tokens:>14} {len(full):>6}")
+            policy_selection.ENABLED = True
+            for top_k, threshold in settings:
+                policy_selection.TOP_K, policy_selection.THRESHOLD = top_k, threshold
+                tokens, reported = summarize(text, policy_list, ally, recorder)
+                recall = len(reported & full) / len(full) if full else 1.0
+                label = f"{clauses} clauses, top {top_k} >= {threshold}"
+                print(f"{label:<34} {recorder.prompts:>8} {tokens:>14} {len(reported):>6} {recall:>7.0%}")
+
+        print("\nsearch_policy, one clause per selection")
+        print(f"{'mode':<34} {'policies':>8} {'policy tokens':>14} {'recall':>7}")
+        clauses = [f"1. Clause 1 (policy {policy}) The Seller shall notify the Buyer in writing of any delay."
+                   for policy in touched]
+        for label, enabled, top_k, threshold in [("hybrid search only", False, None, None)] + [
+                (f"top {top_k} >= {threshold}", True, top_k, threshold) for top_k, threshold in settings]:
+            policy_selection.ENABLED = enabled
+            if enabled:
+                policy_selection.TOP_K, policy_selection.THRESHOLD = top_k, threshold
+            lists = selection_lists(clauses, ally)
+            found = sum(f"Policy {policy}" in {p["title"] for p in listed} for policy, listed in zip(touched, lists))
+            tokens = sum(prompt_budget.count_tokens(prompt_budget.compact(listed)) for listed in lists)
+            print(f"{label:<34} {sum(map(len, lists)) / len(lists):>8.1f} {tokens // len(lists):>14} "
+                  f"{found / len(clauses):>7.0%}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,135 @@
+"""search_policy ranking: PolicyCatalog.search against the hybrid index query.
+
+For every query, compares the policies PolicyCatalog.search returns (BM25
+over title/instruction/tags without stop words and the nearest embedding,
+fused by reciprocal rank, top 50) with what the index query search_policy
+used to send returns for the same policies and inputs: search_text, the
+language filter, one nearest vector and the service's default top of 50.
+Reports how many policies each returns, how many the pre-BM25 catalog
+search returned (every policy sharing any word with the query), and the
+share of the reference's top --top-n that is also in the catalog's top
+--top-n.
+
+With --endpoint/--key/--index the reference is that Azure AI Search index
+and the catalog is loaded from it, so both rank the same data; every
+policy's title and stored embedding make one query. Without them the
+policies are data.json's paragraphs (contract text with ada-002
+embeddings) repeated --copies times, each paragraph's summary and embedding
+make one query, and the reference is local_index.LocalIndex with the
+standard analyzer's tokenisation (stop words kept), as
+ALLY_SEARCH_BACKEND=local serves it.
+
+    python benchmarks/bench_policy_search.py --copies 4 --top-n 1 3 5 10
+    python benchmarks/bench_policy_search.py --endpoint https://<service>.search.windows.net --key <key> \\
+        --index legal-instructions
+"""
+import argparse
+import json
+import os
+import re
+import sys
+
+ROOT = os.path.join(os.path.dirname(__file__), "..")
+sys.path.insert(0, os.path.join(ROOT, "indexing"))  # the flow's additional_includes
+from local_index import POLICY_TEXT_FIELDS, LocalIndex  # noqa: E402
+from policy_catalog import PolicyCatalog  # noqa: E402
+
+DATA_FILE = os.path.join(ROOT, "data.json")
+LANGUAGE = "English"
+_WORD = re.compile(r"\w+", re.UNICODE)
+
+
+class FileCatalog(PolicyCatalog):
+    def __init__(self, policies):
+        super().__init__(None, "data.json", None)
+        self._records = policies
+
+    def _load_policies(self):
+        return self._records
+
+    def _read_version(self):
+        return len(self._records)
+
+
+def local_setup(copies):
+    with open(DATA_FILE, encoding="utf-8") as f:
+        records = json.load(f)
+    policies = [{"id": f"{copy}-{record['id']}", "PolicyId": f"{copy}-{record['id']}", "title": record["title"],
+                 "instruction": record["paragraph"], "tags": record.get("keyphrases") or [], "severity": 1,
+                 "language": LANGUAGE, "groups": [], "embedding": record["embedding"]}
+                for copy in range(copies) for record in records]
+    reference = LocalIndex(policies, POLICY_TEXT_FIELDS)
+
+    def query_index(text, vector):
+        return reference.search(text, vector, {"language": LANGUAGE}, top=50, k_nearest_neighbors=1,
+                                select=["PolicyId"])
+
+    queries = [(record["summary"], record["embedding"]) for record in records if record.get("summary")]
+    return FileCatalog(policies), query_index, queries
+
+
+def azure_setup(endpoint, key, index_name):
+    from azure.core.credentials import AzureKeyCredential
+    from azure.search.documents import SearchClient
+    from azure.search.documents.models import VectorizedQuery
+
+    client = SearchClient(endpoint, index_name, AzureKeyCredential(key))
+
+    def query_index(text, vector):
+        # search_policy's query before the catalog
+        vector_query = VectorizedQuery(kind="vector", vector=vector, k_nearest_neighbors=1, fields="embedding")
+        return list(client.search(search_text=text, filter=f"language eq '{LANGUAGE}'",
+                                  vector_queries=[vector_query], select="PolicyId"))
+
+    catalog = PolicyCatalog(endpoint, index_name, key)
+    queries = [(policy["title"], policy["embedding"]) for policy in catalog.policies(LANGUAGE)
+               if policy.get("title") and policy.get("embedding")]
+    return catalog, query_index, queries
+
+
+def overlap_search(catalog, text, vector):
+    """How many policies the catalog search returned before it used BM25."""
+    terms = set(_WORD.findall(text.lower()))
+    candidates = catalog.policies(LANGUAGE)
+    matched = sum(bool(terms & set(_WORD.findall(f"{p.get('title')} {p.get('instruction')}".lower())))
+                  for p in candidates)
+    return max(matched, 1 if vector else 0)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--top-n", type=int, nargs="+", default=[1, 3, 5, 10])
+    parser.add_argument("--copies", type=int, default=4, help="times data.json's paragraphs are repeated")
+    parser.add_argument("--endpoint")
+    parser.add_argument("--key")
+    parser.add_argument("--index", default="legal-instructions")
+    args = parser.parse_args()
+
+    if args.endpoint:
+        catalog, query_index, queries = azure_setup(args.endpoint, args.key, args.index)
+    else:
+        catalog, query_index, queries = local_setup(args.copies)
+
+    agreement = {n: [] for n in args.top_n}
+    returned, expected, before = [], [], []
+    for text, vector in queries:
+        ours = [str(policy["PolicyId"]) for policy in catalog.search(text, vector, language=LANGUAGE)]
+        theirs = [str(result["PolicyId"]) for result in query_index(text, vector)]
+        returned.append(len(ours))
+        expected.append(len(theirs))
+        before.append(overlap_search(catalog, text, vector))
+        for n in args.top_n:
+            if theirs:
+                agreement[n].append(len(set(ours[:n]) & set(theirs[:n])) / len(theirs[:n]))
+
+    print(f"{len(queries)} queries over {len(catalog.policies(LANGUAGE))} {LANGUAGE} policies "
+          f"({'Azure index ' + args.index if args.endpoint else 'data.json, LocalIndex reference'})")
+    print(f"policies returned: catalog {sum(returned) / len(returned):.1f} (max {max(returned)}), "
+          f"index query {sum(expected) / len(expected):.1f}, catalog before BM25 {sum(before) / len(before):.1f}")
+    for n in args.top_n:
+        print(f"top {n:<3} agreement with the index query {sum(agreement[n]) / len(agreement[n]):>6.0%}")
+    assert max(returned) <= 50, "the catalog search returned more than the index query's page"
+
+
+if __name__ == "__main__":
+    main()
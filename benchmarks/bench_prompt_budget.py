@@ -0,0 +1,88 @@
+"""Prompt tokens of the summary tools: before, compact context, and budgeted.
+
+Builds the messages summary_document and selection_summary send (no model
+calls) for growing policy lists and selections, and counts their tokens
+three ways: with the context serialized as before (a Python repr for
+summary_document, indented JSON for selection_summary) and no limit; as
+compact JSON with no limit; and as compact JSON within the node's budget
+(ALLY_PROMPT_BUDGET, or --budget). Counts use tiktoken when its encoding
+can be loaded, the ~4 characters per token estimate otherwise.
+
+    python benchmarks/bench_prompt_budget.py --policies 20 200 1000 --selection-words 500 20000
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import sys
+
+ROOT = os.path.join(os.path.dirname(__file__), "..")
+FLOW_DIR = os.path.join(ROOT, "backend", "PromptFlow", "legal-main-flow")
+sys.path.insert(0, os.path.join(ROOT, "indexing"))  # the flow's additional_includes
+sys.path.insert(0, FLOW_DIR)
+sys.path.insert(0, os.path.join(ROOT, "backend", "PromptFlow", "serving"))  # the serving-only includes
+
+import documen_summary  # noqa: E402
+import prompt_budget  # noqa: E402
+import summary_document  # noqa: E402
+from bench_map_reduce import contract  # noqa: E402
+
+WORDS = ("the seller shall indemnify the buyer against all claims arising from late delivery of goods "
+         "under this agreement and pay liquidated damages of one percent per week").split()
+
+
+def policy(i):
+    instruction = " ".join(WORDS[(i + j) % len(WORDS)] for j in range(60))
+    return {"title": f"Policy {i}: liability and delivery", "instruction": f"Policy {i}. {instruction}."}
+
+
+def selection(words):
+    return " ".join(WORDS[i % len(WORDS)] for i in range(words))
+
+
+def context_items(messages):
+    # Both prompts end with the policy list, after this line
+    return messages[0]["content"].split("The policy items provided in the list are:")[-1].count('"title":')
+
+
+def measure(build, old_serialize, policies, budget):
+    """(tokens as before, compact without a limit, budgeted, policies kept)."""
+    prompt_budget.DEFAULT_BUDGET = 10 ** 9
+    with contextlib.redirect_stdout(io.StringIO()):
+        compact = prompt_budget.message_tokens(build(policies))
+    before = (compact - prompt_budget.count_tokens(prompt_budget.compact(policies))
+              + prompt_budget.count_tokens(old_serialize(policies)))
+    prompt_budget.DEFAULT_BUDGET = budget
+    with contextlib.redirect_stdout(io.StringIO()):
+        messages = build(policies)
+    return before, compact, prompt_budget.message_tokens(messages), context_items(messages)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--policies", type=int, nargs="+", default=[20, 200, 1000])
+    parser.add_argument("--selection-words", type=int, nargs="+", default=[500, 20000])
+    parser.add_argument("--budget", type=int, default=prompt_budget.DEFAULT_BUDGET)
+    args = parser.parse_args()
+    for variable in [name for name in os.environ if name.startswith("ALLY_PROMPT_BUDGET_")]:
+        del os.environ[variable]
+
+    text = contract(20, 12)
+    print(f"budget {args.budget} tokens per prompt")
+    print(f"{'prompt':<44} {'before':>8} {'compact':>8} {'budgeted':>9} {'kept':>6}")
+    for count in args.policies:
+        policies = [policy(i) for i in range(count)]
+        row = measure(lambda p: summary_document.build_messages(text, p), str, policies, args.budget)
+        print(f"{f'summary_document, {count} policies':<44} {row[0]:>8} {row[1]:>8} {row[2]:>9} {row[3]:>6}")
+    for words in args.selection_words:
+        for count in args.policies:
+            policies = [policy(i) for i in range(count)]
+            row = measure(lambda p: documen_summary.build_messages("English", selection(words), p),
+                          lambda p: json.dumps(p, indent=2), policies, args.budget)
+            label = f"selection_summary, {words} words, {count} policies"
+            print(f"{label:<44} {row[0]:>8} {row[1]:>8} {row[2]:>9} {row[3]:>6}")
+
+
+if __name__ == "__main__":
+    main()
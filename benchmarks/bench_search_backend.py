@@ -0,0 +1,75 @@
+"""Query latency of the in-process search backend as the index grows.
+
+Builds `search_backend.LocalIndex`es from `data.json`, repeated (with
+perturbed embeddings, spread over several filenames) up to each size, and
+times the query search_doc sends: BM25 plus brute-force cosine top-20 fused
+by reciprocal rank, filtered to one filename, top 3. Also times vector-only
+and text-only queries and the filtered count check_index makes. No network.
+The grown records keep their embeddings as lists, as data.json does, so
+building much more than 50000 takes minutes and several GB.
+
+    python benchmarks/bench_search_backend.py --sizes 37 1000 10000 50000
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+import numpy as np
+
+ROOT = os.path.join(os.path.dirname(__file__), "..")
+sys.path.insert(0, os.path.join(ROOT, "indexing"))
+from search_backend import LocalIndex  # noqa: E402
+
+DATA_FILE = os.path.join(ROOT, "data.json")
+QUERY = "Which law governs the contract and which courts have jurisdiction?"
+FILES_PER_1000 = 25
+
+
+def build(records, size, rng):
+    files = max(1, size * FILES_PER_1000 // 1000)
+    grown = []
+    for i in range(size):
+        record = dict(records[i % len(records)], id=str(i), filename=f"contract-{i % files}.docx")
+        if i >= len(records):
+            vector = np.asarray(record["embedding"], dtype=np.float32)
+            record["embedding"] = (vector + rng.normal(0, 0.01, vector.shape).astype(np.float32)).tolist()
+        grown.append(record)
+    return grown
+
+
+def timed(fn, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - start) / repeat * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[37, 1000, 10000, 50000])
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    with open(DATA_FILE, encoding="utf-8") as f:
+        records = json.load(f)
+    rng = np.random.default_rng(0)
+    vector = records[5]["embedding"]
+    filters = {"filename": "contract-0.docx"}
+
+    print(f"{'records':>8} {'build':>9} {'hybrid':>9} {'vector':>9} {'text':>9} {'count':>9}   (ms)")
+    for size in args.sizes:
+        grown = build(records, size, rng)
+        start = time.perf_counter()
+        index = LocalIndex(grown)
+        build_ms = (time.perf_counter() - start) * 1000
+        hybrid = timed(lambda: index.search(QUERY, vector, filters, top=3, k_nearest_neighbors=20), args.repeat)
+        vector_only = timed(lambda: index.search(None, vector, filters, top=3, k_nearest_neighbors=20), args.repeat)
+        text_only = timed(lambda: index.search(QUERY, None, filters, top=3), args.repeat)
+        count = timed(lambda: index.count(filters), args.repeat)
+        print(f"{size:>8} {build_ms:>9.0f} {hybrid:>9.2f} {vector_only:>9.2f} {text_only:>9.2f} {count:>9.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,157 @@
+"""Requests per second one serving worker handles, flask vs fastapi.
+
+The flask engine runs `FlowInvoker.invoke` for one request per worker thread
+(PROMPTFLOW_WORKER_THREADS, 1 by default), while the fastapi engine awaits
+`AsyncFlowInvoker.invoke_async` for every open request on the worker's event
+loop, which only overlaps requests if the tools are async.
+
+By default both invokers run legal-main-flow in-process against the local
+Azure stubs. With --url, the same load is sent over HTTP to a running
+container instead (start it once per PROMPTFLOW_SERVING_ENGINE and compare).
+
+    python benchmarks/bench_serving_engines.py --requests 40 --concurrency 8 --latency 0.1
+    python benchmarks/bench_serving_engines.py --url http://localhost:8080/score --concurrency 8
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import sys
+import time
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+ROOT = os.path.join(os.path.dirname(__file__), "..")
+FLOW_DIR = os.path.join(ROOT, "backend", "PromptFlow", "legal-main-flow")
+sys.path.insert(0, os.path.join(ROOT, "indexing"))  # the flow's additional_includes
+sys.path.insert(0, FLOW_DIR)
+sys.path.insert(0, os.path.join(ROOT, "backend", "PromptFlow", "serving"))  # the serving-only includes
+os.environ.setdefault("ALLY_EMBEDDING_CACHE", "off")  # every request must reach the stub
+os.environ.setdefault("ALLY_ANSWER_CACHE", "off")
+os.environ.setdefault("ALLY_MEMO", "off")
+
+from stub_servers import StubServer  # noqa: E402
+
+DOCUMENT = "contract-for-the-purchase-of-goods-and-services.docx"
+QUESTION = "Which law governs the contract and which courts have jurisdiction?"
+
+
+def request_body(query_type, i):
+    # A distinct question per request so no cache can short-circuit it
+    return {"question": f"{QUESTION} ({i})", "query_type": query_type, "filename": DOCUMENT,
+            "language": "English", "group": [], "chat_history": []}
+
+
+def seed(server):
+    with open(os.path.join(ROOT, "data.json"), encoding="utf-8") as f:
+        paragraphs = json.load(f)
+    server.indexes["legal-documents"] = {
+        str(i): dict(item, id=str(i), filename=DOCUMENT, ParagraphId=i) for i, item in enumerate(paragraphs)
+    }
+
+
+def ally_connection(server):
+    from promptflow.connections import CustomConnection
+
+    return CustomConnection(
+        name="ally",
+        configs={"openai_endpoint": server.url, "openai_api_version": "2024-08-01-preview",
+                 "openai_model_deployment": "gpt4o", "openai_embedding_deployment": "ada002",
+                 "search_endpoint": server.url, "search_document_index": "legal-documents",
+                 "search_policy_index": "legal-instructions"},
+        secrets={"openai_key": "stub", "search_key": "stub"},
+    )
+
+
+def report(label, latencies, elapsed):
+    latencies = sorted(latencies)
+    p95 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))]
+    print(f"{label:<28} {len(latencies) / elapsed:>7.1f} req/s   p50 {statistics.median(latencies) * 1000:>6.0f} ms"
+          f"   p95 {p95 * 1000:>6.0f} ms")
+
+
+# -----------------------------
+# In-process invokers
+# -----------------------------
+def run_flask(invoker, bodies, threads):
+    def one(body):
+        start = time.perf_counter()
+        invoker.invoke(body)
+        return time.perf_counter() - start
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        latencies = list(pool.map(one, bodies))
+    return latencies, time.perf_counter() - start
+
+
+async def run_fastapi(invoker, bodies, concurrency):
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one(body):
+        async with semaphore:
+            start = time.perf_counter()
+            await invoker.invoke_async(body)
+            return time.perf_counter() - start
+
+    start = time.perf_counter()
+    latencies = await asyncio.gather(*(one(body) for body in bodies))
+    return latencies, time.perf_counter() - start
+
+
+def in_process(args):
+    from promptflow._utils.logger_utils import LoggerFactory
+    from promptflow.core import Flow
+    from promptflow.core._serving.flow_invoker import AsyncFlowInvoker, FlowInvoker
+
+    with StubServer(latency=args.latency) as server, LoggerFactory.disable_all_loggers():
+        seed(server)
+        flow = Flow.load(FLOW_DIR)
+        connections = {"ally": ally_connection(server)._to_execution_connection_dict()}
+        sync_invoker = FlowInvoker(flow, connections=dict(connections))
+        async_invoker = AsyncFlowInvoker(flow, connections=dict(connections))
+
+        for query_type in args.query_types:
+            bodies = [request_body(query_type, i) for i in range(args.requests)]
+            print(f"query_type {query_type}, {args.requests} requests, {args.latency * 1000:.0f} ms upstream latency")
+            for threads in sorted({1, args.threads}):
+                report(f"  flask, {threads} thread(s)", *run_flask(sync_invoker, bodies, threads))
+            report(f"  fastapi, {args.concurrency} concurrent",
+                   *asyncio.run(run_fastapi(async_invoker, bodies, args.concurrency)))
+
+
+# -----------------------------
+# Running container
+# -----------------------------
+def over_http(args):
+    def one(body):
+        request = urllib.request.Request(args.url, data=json.dumps(body).encode("utf-8"),
+                                         headers={"Content-Type": "application/json"})
+        start = time.perf_counter()
+        with urllib.request.urlopen(request, timeout=300) as response:
+            response.read()
+        return time.perf_counter() - start
+
+    for query_type in args.query_types:
+        bodies = [request_body(query_type, i) for i in range(args.requests)]
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+            latencies = list(pool.map(one, bodies))
+        report(f"query_type {query_type}, {args.concurrency} concurrent", latencies, time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--url", help="score endpoint of a running container; default runs in-process")
+    parser.add_argument("--query-types", type=int, nargs="+", default=[3, 2])
+    parser.add_argument("--requests", type=int, default=40)
+    parser.add_argument("--concurrency", type=int, default=8, help="open requests at once")
+    parser.add_argument("--threads", type=int, default=1, help="flask worker threads to compare as well")
+    parser.add_argument("--latency", type=float, default=0.1, help="seconds per stub request (in-process only)")
+    args = parser.parse_args()
+    over_http(args) if args.url else in_process(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+"""Time to the first PolicyItem, streamed vs plain JSON, for the summaries.
+
+Serves the Docker flow snapshot with gunicorn against the stubs (as
+loadtest.py does), with the chat stub writing --items PolicyItems at
+--tokens-per-second. Each query type is requested --repeat times with
+`Accept: application/json`, where the add-in sees nothing until the whole
+response has been generated, and with `Accept: text/event-stream`, where
+every PolicyItem arrives as its own server-sent event.
+
+    python benchmarks/bench_streaming.py --items 10 --tokens-per-second 50
+    python benchmarks/bench_streaming.py --engine fastapi --query-types 2
+"""
+import argparse
+import json
+import os
+import shutil
+import statistics
+import tempfile
+import time
+
+import requests
+
+from loadtest import prepare_environment, request_body, serve, stubs
+
+
+def plain(url, body):
+    start = time.perf_counter()
+    response = requests.post(url, json=body, headers={"Accept": "application/json"}, timeout=300)
+    response.raise_for_status()
+    elapsed = time.perf_counter() - start
+    return elapsed, elapsed, len(response.json()["answer"].get("PolicyItems", []))
+
+
+def streamed(url, body):
+    start = time.perf_counter()
+    first = None
+    items = 0
+    with requests.post(url, json=body, headers={"Accept": "text/event-stream"}, stream=True, timeout=300) as response:
+        response.raise_for_status()
+        for line in response.iter_lines():
+            if not line.startswith(b"data:"):
+                continue
+            event = json.loads(line[5:])["answer"]
+            if "PolicyItem" in event:
+                items += 1
+                first = first or time.perf_counter() - start
+    return first, time.perf_counter() - start, items
+
+
+def report(label, samples):
+    firsts = [first for first, _, _ in samples if first is not None]
+    totals = [total for _, total, _ in samples]
+    print(f"  {label:<14} first item {statistics.median(firsts) * 1000 if firsts else float('nan'):>7.0f} ms"
+          f"   complete {statistics.median(totals) * 1000:>7.0f} ms   {samples[-1][2]} items")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--engine", default="flask", choices=["flask", "fastapi"])
+    parser.add_argument("--query-types", type=int, nargs="+", default=[0, 2])
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--items", dest="array_items", type=int, default=10, help="PolicyItems per response")
+    parser.add_argument("--openai-latency", type=float, default=0.2, help="seconds per Azure OpenAI request")
+    parser.add_argument("--search-latency", type=float, default=0.05, help="seconds per search request")
+    parser.add_argument("--tokens-per-second", type=float, default=50, help="chat generation rate")
+    parser.add_argument("--completion-tokens", type=int, default=0, help="minimum tokens per chat completion")
+    parser.add_argument("--port", type=int, default=8089)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="ally-streaming-")
+    try:
+        with stubs(args) as stub_url:
+            env = prepare_environment(stub_url, workdir)
+            with open(os.path.join(workdir, "gunicorn.log"), "w") as log, \
+                    serve(env, args.engine, 1, 4, args.port, log) as url:
+                for query_type in args.query_types:
+                    print(f"query_type {query_type}, {args.engine}")
+                    bodies = [request_body(query_type, i) for i in range(args.repeat)]
+                    report("json", [plain(url, body) for body in bodies])
+                    report("event-stream", [streamed(url, body) for body in bodies])
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,377 @@
+"""Load test the served legal-main-flow with a mix of Word add-in requests.
+
+Starts the Azure OpenAI / AI Search stubs in a child process and seeds their
+indexes. For every --engine/--workers/--threads combination it serves the
+Docker flow snapshot with gunicorn the way runit/promptflow-serve/run does.
+It then replays a weighted mix of query types from --concurrency simulated
+users and reports throughput and p50/p95/p99 latency per query type. Use the
+table to pick PROMPTFLOW_WORKER_NUM / PROMPTFLOW_WORKER_THREADS, and
+--json/--baseline to catch regressions between runs.
+
+    python benchmarks/loadtest.py --workers 1 2 4 --threads 1 4 --concurrency 16 --duration 30
+    python benchmarks/loadtest.py --engine fastapi --workers 2 --json run.json --baseline last.json
+    python benchmarks/loadtest.py --url http://localhost:8080/score --concurrency 16
+
+With --url the load goes to an already running server, and the stubs are
+still started and printed so its `ally` connection can point at them.
+
+Serving locally needs gunicorn (and uvicorn for --engine fastapi). The `ally`
+connection is created in a throwaway PromptFlow home; on machines without a
+system keyring install keyrings.alt for it.
+"""
+import argparse
+import json
+import os
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+
+import requests
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+DOCKER_DIR = os.path.join(ROOT, "backend", "Docker", "legal-main-flow-container")
+FLOW_DIR = os.path.join(DOCKER_DIR, "flow")
+GUNICORN_CONF = os.path.join(DOCKER_DIR, "gunicorn.conf.py")
+STUB_SERVER = os.path.join(os.path.dirname(os.path.abspath(__file__)), "stub_servers.py")
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from stub_servers import fake_embedding  # noqa: E402
+
+DOCUMENT_INDEX = "legal-documents"
+POLICY_INDEX = "legal-instructions"
+DOCUMENT = "contract-for-the-purchase-of-goods-and-services.docx"
+QUESTION = "Which law governs the contract and which courts have jurisdiction?"
+SELECTION = ("The Contract shall be governed by and construed in accordance with the laws of Singapore, "
+             "without reference to its conflict of laws rules.")
+POLICIES = 20
+
+# query_type -> what the add-in does with it
+QUERY_TYPES = {
+    0: "full document review",
+    1: "compliance report",
+    2: "selection summary",
+    3: "ask",
+    99: "index check",
+}
+# Every taskpane open checks the index; questions and selections dominate
+DEFAULT_MIX = "99=2,3=4,2=3,1=1,0=1"
+
+
+def parse_mix(text):
+    mix = {}
+    for part in text.split(","):
+        query_type, _, weight = part.partition("=")
+        if int(query_type) not in QUERY_TYPES:
+            raise argparse.ArgumentTypeError(f"unknown query_type {query_type}")
+        mix[int(query_type)] = float(weight or 1)
+    return mix
+
+
+def request_body(query_type, i):
+    # A distinct question per request so no cache can short-circuit it
+    question = SELECTION if query_type == 2 else QUESTION
+    return {"question": f"{question} ({i})", "query_type": query_type, "filename": DOCUMENT,
+            "language": "English", "group": [], "chat_history": []}
+
+
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return float("nan")
+    return sorted_values[min(len(sorted_values) - 1, int(len(sorted_values) * fraction))]
+
+
+# -----------------------------
+# Upstream stand-ins
+# -----------------------------
+@contextmanager
+def stubs(args):
+    command = [sys.executable, STUB_SERVER, "--latency", str(args.openai_latency),
+               "--search-latency", str(args.search_latency), "--completion-tokens", str(args.completion_tokens),
+               "--array-items", str(args.array_items)]
+    if args.tokens_per_second:
+        command += ["--tokens-per-second", str(args.tokens_per_second)]
+    process = subprocess.Popen(command, stdout=subprocess.PIPE, text=True)
+    try:
+        url = process.stdout.readline().strip()
+        if not url:
+            raise RuntimeError("stub server did not start")
+        seed(url)
+        yield url
+    finally:
+        process.terminate()
+        process.wait()
+
+
+def seed(url):
+    from azure.core.credentials import AzureKeyCredential
+    from azure.search.documents import SearchClient
+
+    policies = []
+    for i in range(POLICIES):
+        language = "German" if i % 2 else "English"
+        instruction = f"Policy {i}: the contract must be governed by the laws of the buyer's country."
+        policies.append({"id": str(i), "PolicyId": str(i), "title": f"Policy {i}", "instruction": instruction,
+                         "tags": [], "severity": 1 + i % 3, "language": language, "groups": [],
+                         "embedding": fake_embedding(instruction)})
+
+    with open(os.path.join(ROOT, "data.json"), encoding="utf-8") as f:
+        paragraphs = json.load(f)
+    documents = []
+    for i, paragraph in enumerate(paragraphs):
+        breached = [str((i + j) % POLICIES) for j in range(2)] if i % 4 == 0 else []
+        documents.append(dict(paragraph, id=str(i), filename=DOCUMENT, ParagraphId=i, isCompliant=not breached,
+                              CompliantCollection=[], NonCompliantCollection=breached))
+
+    credential = AzureKeyCredential("stub")
+    SearchClient(url, POLICY_INDEX, credential).upload_documents(policies)
+    SearchClient(url, DOCUMENT_INDEX, credential).upload_documents(documents)
+
+
+# -----------------------------
+# Served flow
+# -----------------------------
+def prepare_environment(stub_url, workdir):
+    """Environment for gunicorn: a PromptFlow home holding an `ally`
+    connection to the stubs, and a copy of the flow to serve."""
+    env = dict(os.environ)
+    home = os.path.join(workdir, "promptflow")
+    os.makedirs(home)
+    with open(os.path.join(home, "pf.yaml"), "w") as f:
+        f.write("telemetry:\n  enabled: false\n")
+    env.update(
+        PF_HOME_DIRECTORY=home,
+        XDG_DATA_HOME=os.path.join(workdir, "data"),  # where keyrings.alt keeps the store's key
+        PROMPTFLOW_PROJECT_PATH=os.path.join(workdir, "flow"),
+        ALLY_EMBEDDING_CACHE="off",
+        ALLY_ANSWER_CACHE="off",
+        ALLY_MEMO="off",
+    )
+    if "keyrings.alt" in sys.modules or _has_module("keyrings.alt"):
+        env.setdefault("PYTHON_KEYRING_BACKEND", "keyrings.alt.file.PlaintextKeyring")
+    shutil.copytree(FLOW_DIR, env["PROMPTFLOW_PROJECT_PATH"], ignore=shutil.ignore_patterns("__pycache__", ".promptflow"))
+
+    connection = {
+        "openai_endpoint": stub_url, "openai_api_version": "2024-08-01-preview", "openai_model_deployment": "gpt4o",
+        "openai_embedding_deployment": "ada002", "search_endpoint": stub_url,
+        "search_document_index": DOCUMENT_INDEX, "search_policy_index": POLICY_INDEX,
+    }
+    create = (
+        "import json, sys\n"
+        "from promptflow.client import PFClient\n"
+        "from promptflow.connections import CustomConnection\n"
+        "PFClient().connections.create_or_update(CustomConnection(\n"
+        "    name='ally', configs=json.loads(sys.argv[1]), secrets={'openai_key': 'stub', 'search_key': 'stub'}))\n"
+    )
+    subprocess.run([sys.executable, "-c", create, json.dumps(connection)], env=env, check=True,
+                   stdout=subprocess.DEVNULL)
+    return env
+
+
+def _has_module(name):
+    import importlib.util
+
+    try:
+        return importlib.util.find_spec(name) is not None
+    except ModuleNotFoundError:
+        return False
+
+
+@contextmanager
+def serve(env, engine, workers, threads, port, log):
+    app = f"telemetry:create_app(engine='{engine}')"
+    command = [sys.executable, "-m", "gunicorn", "-c", GUNICORN_CONF, "-w", str(workers),
+               "-b", f"127.0.0.1:{port}", "--timeout", "300"]
+    if engine == "flask":
+        command += ["--threads", str(threads)]
+    else:
+        command += ["--worker-class", "uvicorn.workers.UvicornWorker"]
+    process = subprocess.Popen(command + [app], env=env, cwd=env["PROMPTFLOW_PROJECT_PATH"],
+                               stdout=log, stderr=subprocess.STDOUT)
+    base = f"http://127.0.0.1:{port}"
+    try:
+        deadline = time.monotonic() + 180
+        while True:
+            if process.poll() is not None:
+                raise RuntimeError(f"gunicorn exited with {process.returncode}, see {log.name}")
+            try:
+                if requests.get(f"{base}/health", timeout=2).status_code == 200:
+                    break
+            except requests.RequestException:
+                pass
+            if time.monotonic() > deadline:
+                raise RuntimeError(f"gunicorn did not become healthy, see {log.name}")
+            time.sleep(0.5)
+        yield f"{base}/score"
+    finally:
+        process.terminate()
+        try:
+            process.wait(timeout=30)
+        except subprocess.TimeoutExpired:
+            process.kill()
+            process.wait()
+
+
+# -----------------------------
+# Load
+# -----------------------------
+def run_load(score_url, mix, concurrency, duration, warmup, seed_value=0):
+    """Closed loop: `concurrency` users each send one request after another.
+    Returns {query_type: [(latency, ok)]} for the requests that started after
+    the warmup, and the measured wall time."""
+    results = defaultdict(list)
+    lock = threading.Lock()
+    query_types, weights = zip(*mix.items())
+    start = time.monotonic()
+    measure_from = start + warmup
+    stop_at = measure_from + duration
+    counter = iter(range(10 ** 9))
+
+    def user(n):
+        rng = random.Random(seed_value + n)
+        session = requests.Session()
+        while True:
+            sent = time.monotonic()
+            if sent >= stop_at:
+                return
+            query_type = rng.choices(query_types, weights)[0]
+            with lock:
+                i = next(counter)
+            try:
+                response = session.post(score_url, json=request_body(query_type, i), timeout=300)
+                ok = response.status_code == 200 and "error" not in response.json()
+            except (requests.RequestException, ValueError):
+                ok = False
+            latency = time.monotonic() - sent
+            if sent >= measure_from:
+                with lock:
+                    results[query_type].append((latency, ok))
+
+    users = [threading.Thread(target=user, args=(n,), daemon=True) for n in range(concurrency)]
+    for thread in users:
+        thread.start()
+    for thread in users:
+        thread.join()
+    # In-flight requests at stop_at count, so measure until the last finished
+    return results, time.monotonic() - measure_from
+
+
+def summarize(results, elapsed):
+    summary = {}
+    everything = []
+    for query_type in sorted(results):
+        samples = results[query_type]
+        everything += samples
+        summary[str(query_type)] = _stats(samples, elapsed)
+    summary["all"] = _stats(everything, elapsed)
+    return summary
+
+
+def _stats(samples, elapsed):
+    latencies = sorted(latency for latency, ok in samples if ok)
+    return {
+        "requests": len(samples),
+        "errors": sum(1 for _, ok in samples if not ok),
+        "rps": len(latencies) / elapsed if elapsed else 0.0,
+        "p50_ms": percentile(latencies, 0.50) * 1000,
+        "p95_ms": percentile(latencies, 0.95) * 1000,
+        "p99_ms": percentile(latencies, 0.99) * 1000,
+    }
+
+
+def print_summary(label, summary):
+    print(f"\n{label}")
+    print(f"  {'query_type':<26} {'requests':>8} {'errors':>6} {'req/s':>7} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}")
+    for key, stats in summary.items():
+        name = f"{key} {QUERY_TYPES[int(key)]}" if key != "all" else "all"
+        print(f"  {name:<26} {stats['requests']:>8} {stats['errors']:>6} {stats['rps']:>7.2f} "
+              f"{stats['p50_ms']:>8.0f} {stats['p95_ms']:>8.0f} {stats['p99_ms']:>8.0f}")
+
+
+def compare(runs, baseline, tolerance):
+    """Regressions of p95 latency or throughput beyond `tolerance` against a
+    previous --json output, for the configurations and query types both have."""
+    regressions = []
+    for label, summary in runs.items():
+        for key, stats in summary.items():
+            before = baseline.get(label, {}).get(key)
+            if not before or not stats["requests"]:
+                continue
+            if stats["p95_ms"] > before["p95_ms"] * (1 + tolerance):
+                regressions.append(f"{label} / {key}: p95 {before['p95_ms']:.0f} -> {stats['p95_ms']:.0f} ms")
+            if stats["rps"] < before["rps"] * (1 - tolerance):
+                regressions.append(f"{label} / {key}: {before['rps']:.2f} -> {stats['rps']:.2f} req/s")
+            if stats["errors"] > before["errors"]:
+                regressions.append(f"{label} / {key}: errors {before['errors']} -> {stats['errors']}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--url", help="score endpoint of a running server instead of starting gunicorn")
+    parser.add_argument("--engine", nargs="+", default=["flask"], choices=["flask", "fastapi"])
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2], help="PROMPTFLOW_WORKER_NUM values")
+    parser.add_argument("--threads", type=int, nargs="+", default=[1],
+                        help="PROMPTFLOW_WORKER_THREADS values (flask only)")
+    parser.add_argument("--concurrency", type=int, default=8, help="simulated add-in users")
+    parser.add_argument("--duration", type=float, default=30, help="measured seconds per configuration")
+    parser.add_argument("--warmup", type=float, default=5, help="unmeasured seconds before that")
+    parser.add_argument("--mix", type=parse_mix, default=parse_mix(DEFAULT_MIX),
+                        help=f"query_type=weight pairs (default {DEFAULT_MIX})")
+    parser.add_argument("--openai-latency", type=float, default=0.2, help="seconds per Azure OpenAI request")
+    parser.add_argument("--search-latency", type=float, default=0.05, help="seconds per search request")
+    parser.add_argument("--tokens-per-second", type=float, default=100, help="chat generation rate, 0 for none")
+    parser.add_argument("--completion-tokens", type=int, default=50, help="tokens generated per chat completion")
+    parser.add_argument("--array-items", type=int, default=1, help="PolicyItems etc. per structured response")
+    parser.add_argument("--port", type=int, default=8089)
+    parser.add_argument("--json", help="write the results to this file")
+    parser.add_argument("--baseline", help="earlier --json output to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed relative regression")
+    args = parser.parse_args()
+
+    runs = {}
+    with stubs(args) as stub_url:
+        print(f"Stubs at {stub_url}: {args.openai_latency * 1000:.0f} ms OpenAI, "
+              f"{args.search_latency * 1000:.0f} ms search, {args.completion_tokens} tokens at "
+              f"{args.tokens_per_second or 'unlimited'} tokens/s")
+        if args.url:
+            label = args.url
+            results, elapsed = run_load(args.url, args.mix, args.concurrency, args.duration, args.warmup)
+            runs[label] = summarize(results, elapsed)
+            print_summary(f"{label}, {args.concurrency} users", runs[label])
+        else:
+            workdir = tempfile.mkdtemp(prefix="ally-loadtest-")
+            try:
+                env = prepare_environment(stub_url, workdir)
+                for engine in args.engine:
+                    for workers in args.workers:
+                        for threads in (args.threads if engine == "flask" else [1]):
+                            label = f"{engine} workers={workers}" + (f" threads={threads}" if engine == "flask" else "")
+                            log_path = os.path.join(workdir, label.replace(" ", "_").replace("=", "") + ".log")
+                            with open(log_path, "w") as log, serve(env, engine, workers, threads, args.port, log) as url:
+                                results, elapsed = run_load(url, args.mix, args.concurrency, args.duration,
+                                                            args.warmup)
+                            runs[label] = summarize(results, elapsed)
+                            print_summary(f"{label}, {args.concurrency} users", runs[label])
+            finally:
+                shutil.rmtree(workdir, ignore_errors=True)
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(runs, f, indent=2)
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(runs, json.load(f), args.tolerance)
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
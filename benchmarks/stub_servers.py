@@ -0,0 +1,404 @@
+"""Local stand-ins for the Azure endpoints used by Ally.
+
+The stubs speak just enough of the Azure OpenAI and Azure AI Search REST
+APIs for the official SDK clients to talk to them, with a configurable
+latency so benchmarks can measure round-trip overhead without touching the
+real services.
+
+    server = StubServer(latency=0.05).start()
+    client = AzureOpenAI(azure_endpoint=server.url, api_key="stub", api_version="2023-05-15")
+    search = SearchClient(server.url, "legal-documents", AzureKeyCredential("stub"))
+
+Run standalone (e.g. for benchmarks/loadtest.py) it prints its URL and
+serves until interrupted:
+
+    python benchmarks/stub_servers.py --latency 0.2 --search-latency 0.05 --tokens-per-second 100
+"""
+import argparse
+import hashlib
+import itertools
+import json
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+EMBEDDING_DIMENSIONS = 1536
+# Sortable fields of the indexes the indexing scripts create
+# (azure_doc_processing.py, azure_policy_processing.py). Like the service, the
+# stub rejects an orderby on any other field; indexes created through the
+# stub take theirs from the definition, and any other index sorts on its key.
+SORTABLE_FIELDS = {"legal-documents": {"id", "ParagraphId", "date"}, "legal-instructions": {"id"}}
+
+
+def fake_embedding(text, dimensions=EMBEDDING_DIMENSIONS):
+    # Deterministic per text so repeated runs produce identical vectors
+    seed = int.from_bytes(hashlib.sha256(text.encode("utf-8")).digest()[:8], "big")
+    rng = random.Random(seed)
+    return [rng.uniform(-1.0, 1.0) for _ in range(dimensions)]
+
+
+def schema_instance(schema, defs=None, name="value", array_items=1):
+    """Smallest JSON value matching a structured-output schema, with
+    `array_items` elements per array, so
+    `beta.chat.completions.parse(response_format=Model)` gets something it
+    can parse."""
+    defs = defs if defs is not None else schema.get("$defs", {})
+    if "$ref" in schema:
+        return schema_instance(defs[schema["$ref"].rsplit("/", 1)[-1]], defs, name, array_items)
+    for combinator in ("anyOf", "oneOf", "allOf"):
+        if combinator in schema:
+            return schema_instance(schema[combinator][0], defs, name, array_items)
+    kind = schema.get("type", "object")
+    if isinstance(kind, list):
+        kind = kind[0]
+    if kind == "object":
+        return {key: schema_instance(value, defs, key, array_items)
+                for key, value in schema.get("properties", {}).items()}
+    if kind == "array":
+        return [schema_instance(schema.get("items", {}), defs, name, array_items) for _ in range(array_items)]
+    if kind in ("integer", "number"):
+        return 1
+    if kind == "boolean":
+        return True
+    if kind == "null":
+        return None
+    return f"stub {name}"
+
+
+class StubServer:
+    """Threaded HTTP server emulating Azure OpenAI and Azure AI Search.
+
+    `latency` is the fixed cost of every request in seconds (search requests
+    use `search_latency` instead when it is given) and `per_item_latency` is
+    added for every input of an embeddings call or document of an indexing
+    call. Chat completions also take `completion_tokens` (at least) divided
+    by `tokens_per_second` to generate, when a token rate is set; with
+    `"stream": true` they are sent as server-sent events, one word per chunk.
+    `failure_rate` makes that fraction of indexed documents fail with a
+    transient 503 status.
+
+    `chat_responder(deployment, body)` returns the assistant message content
+    for a chat completion request. By default, requests with a JSON schema
+    `response_format` get a matching instance with `array_items` elements per
+    array and the rest get 'English'. `embedder(text, dimensions)` returns
+    the vector of an embeddings input (fake_embedding by default).
+    `sortable` maps index names to the fields an orderby may use
+    (SORTABLE_FIELDS by default).
+    """
+
+    def __init__(self, host="127.0.0.1", port=0, latency=0.05, per_item_latency=0.0,
+                 dimensions=EMBEDDING_DIMENSIONS, failure_rate=0.0, chat_responder=None,
+                 search_latency=None, tokens_per_second=None, completion_tokens=0, array_items=1, embedder=None,
+                 sortable=None):
+        self.latency = latency
+        self.search_latency = latency if search_latency is None else search_latency
+        self.per_item_latency = per_item_latency
+        self.tokens_per_second = tokens_per_second
+        self.completion_tokens = completion_tokens
+        self.dimensions = dimensions
+        self.embedder = embedder or fake_embedding
+        self.failure_rate = failure_rate
+        self.chat_responder = chat_responder or (
+            lambda deployment, body: _default_chat_responder(deployment, body, array_items))
+        self.request_count = 0
+        self.indexes = {}
+        self.sortable = {name: set(fields) for name, fields in (sortable or SORTABLE_FIELDS).items()}
+        self._random = random.Random(0)
+        self._lock = threading.Lock()
+        self._httpd = ThreadingHTTPServer((host, port), _make_handler(self))
+        self._httpd.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def count_request(self):
+        with self._lock:
+            self.request_count += 1
+
+    # -----------------------------
+    # Azure OpenAI
+    # -----------------------------
+    def embeddings(self, deployment, body):
+        inputs = body["input"]
+        if isinstance(inputs, str):
+            inputs = [inputs]
+        time.sleep(self.latency + self.per_item_latency * len(inputs))
+        tokens = sum(len(text.split()) for text in inputs)
+        return 200, {
+            "object": "list",
+            "model": deployment,
+            "data": [
+                {"object": "embedding", "index": i, "embedding": self.embedder(text, self.dimensions)}
+                for i, text in enumerate(inputs)
+            ],
+            "usage": {"prompt_tokens": tokens, "total_tokens": tokens},
+        }
+
+    def chat_completions(self, deployment, body):
+        content = self.chat_responder(deployment, body)
+        prompt_tokens = sum(len(str(m.get("content", "")).split()) for m in body["messages"])
+        completion_tokens = max(len(content.split()), self.completion_tokens)
+        generation = completion_tokens / self.tokens_per_second if self.tokens_per_second else 0.0
+        if body.get("stream"):
+            return 200, _EventStream(self._chat_chunks(deployment, content, generation))
+        time.sleep(self.latency + generation)
+        return 200, {
+            "id": "chatcmpl-stub",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": deployment,
+            "choices": [{
+                "index": 0,
+                "finish_reason": "stop",
+                "message": {"role": "assistant", "content": content},
+            }],
+            "usage": {
+                "prompt_tokens": prompt_tokens,
+                "completion_tokens": completion_tokens,
+                "total_tokens": prompt_tokens + completion_tokens,
+            },
+        }
+
+    def _chat_chunks(self, deployment, content, generation):
+        # One word per chunk, generated at the same overall rate
+        pieces = re.findall(r"\s*\S+\s*", content) or [content]
+        time.sleep(self.latency)
+        for i, piece in enumerate(pieces):
+            time.sleep(generation / len(pieces))
+            delta = {"content": piece, **({"role": "assistant"} if i == 0 else {})}
+            yield _chat_chunk(deployment, delta, None)
+        yield _chat_chunk(deployment, {}, "stop")
+
+    # -----------------------------
+    # Azure AI Search
+    # -----------------------------
+    def list_indexes(self, body):
+        with self._lock:
+            return 200, {"value": [_index_definition(name) for name in self.indexes]}
+
+    def create_index(self, body):
+        with self._lock:
+            self.indexes.setdefault(body["name"], {})
+            self.sortable[body["name"]] = {field["name"] for field in body.get("fields", []) if field.get("sortable")}
+        return 201, _index_definition(body["name"])
+
+    def index_documents(self, index_name, body):
+        actions = body["value"]
+        time.sleep(self.search_latency + self.per_item_latency * len(actions))
+        results = []
+        with self._lock:
+            documents = self.indexes.setdefault(index_name, {})
+            for action in actions:
+                kind = action.pop("@search.action", "upload")
+                key = action["id"]
+                if self._random.random() < self.failure_rate:
+                    results.append({"key": key, "status": False, "errorMessage": "Service unavailable", "statusCode": 503})
+                    continue
+                if kind == "delete":
+                    documents.pop(key, None)
+                elif kind in ("merge", "mergeOrUpload") and key in documents:
+                    documents[key].update(action)
+                else:
+                    documents[key] = action
+                results.append({"key": key, "status": True, "errorMessage": None, "statusCode": 200})
+        status = 200 if all(r["status"] for r in results) else 207
+        return status, {"value": results}
+
+    def search_documents(self, index_name, body):
+        """`search=*` with optional `eq`/`search.in` filters joined by 'and', select,
+        orderby on one sortable field (asc or desc), skip, top and count. Without
+        `top`, results are paged 50 at a time like the real service."""
+        time.sleep(self.search_latency)
+        if body.get("orderby"):
+            field = body["orderby"].split()[0]
+            if field not in self.sortable.get(index_name, {"id"}):
+                return 400, {"error": {"code": "InvalidRequestParameter",
+                                       "message": f"Invalid expression: The field '{field}' in $orderby "
+                                                  f"is not sortable."}}
+        with self._lock:
+            documents = list(self.indexes.get(index_name, {}).values())
+        for field, values in _parse_filter(body.get("filter")):
+            documents = [doc for doc in documents if str(doc.get(field)) in values]
+        if body.get("orderby"):
+            field, *direction = body["orderby"].split()
+            documents.sort(key=lambda doc: doc.get(field), reverse=direction == ["desc"])
+        count = len(documents)
+        skip = body.get("skip") or 0
+        top = body.get("top")
+        page = documents[skip:skip + (top if top is not None else 50)]
+        next_page = top is None and skip + 50 < count
+        documents = page
+        if body.get("select") and body["select"].strip() != "*":
+            fields = [f.strip() for f in body["select"].split(",")]
+            documents = [{f: doc.get(f) for f in fields} for doc in documents]
+        payload = {"value": [dict(doc, **{"@search.score": 1.0}) for doc in documents]}
+        if body.get("count"):
+            payload["@odata.count"] = count
+        if next_page:
+            payload["@search.nextPageParameters"] = dict(body, skip=skip + 50)
+        return 200, payload
+
+    def index_statistics(self, index_name, body):
+        time.sleep(self.search_latency)
+        with self._lock:
+            documents = self.indexes.get(index_name, {})
+            size = sum(len(json.dumps(doc)) for doc in documents.values())
+            return 200, {"documentCount": len(documents), "storageSize": size, "vectorIndexSize": 0}
+
+
+_SEARCH_IN = re.compile(r"^search\.in\((?P<field>\w+),\s*'(?P<values>[^']*)'(?:,\s*'(?P<sep>[^']*)')?\)$")
+
+
+def _default_chat_responder(deployment, body, array_items=1):
+    response_format = body.get("response_format") or {}
+    if response_format.get("type") == "json_schema":
+        return json.dumps(schema_instance(response_format["json_schema"]["schema"], array_items=array_items))
+    return "English"
+
+
+class _EventStream:
+    """A response body sent as server-sent events, one `data:` line per item."""
+
+    def __init__(self, events):
+        self.events = events
+
+
+def _chat_chunk(deployment, delta, finish_reason):
+    return {
+        "id": "chatcmpl-stub",
+        "object": "chat.completion.chunk",
+        "created": int(time.time()),
+        "model": deployment,
+        "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}],
+    }
+
+
+def _parse_filter(expression):
+    # "a eq 'x' and search.in(b, '1,2', ',')" -> [("a", {"x"}), ("b", {"1", "2"})]
+    if not expression:
+        return []
+    clauses = []
+    for clause in expression.split(" and "):
+        clause = clause.strip()
+        match = _SEARCH_IN.match(clause)
+        if match:
+            separator = match.group("sep") or ","
+            clauses.append((match.group("field"), set(match.group("values").split(separator))))
+            continue
+        field, _, value = clause.strip(" ()").partition(" eq ")
+        clauses.append((field.strip(), {value.strip().strip("'")}))
+    return clauses
+
+
+def _index_definition(name):
+    return {"name": name, "fields": [{"name": "id", "type": "Edm.String", "key": True}]}
+
+
+_ROUTES = [
+    ("POST", re.compile(r"^/openai/deployments/(?P<deployment>[^/]+)/embeddings$"), "embeddings"),
+    ("POST", re.compile(r"^/openai/deployments/(?P<deployment>[^/]+)/chat/completions$"), "chat_completions"),
+    ("GET", re.compile(r"^/indexes$"), "list_indexes"),
+    ("POST", re.compile(r"^/indexes$"), "create_index"),
+    ("POST", re.compile(r"^/indexes\('(?P<index>[^']+)'\)/docs/search\.index$"), "index_documents"),
+    ("POST", re.compile(r"^/indexes\('(?P<index>[^']+)'\)/docs/search\.post\.search$"), "search_documents"),
+    ("GET", re.compile(r"^/indexes\('(?P<index>[^']+)'\)/search\.stats$"), "index_statistics"),
+]
+
+
+def _make_handler(server):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+        # Headers and body are written separately; without this Nagle's
+        # algorithm adds ~40 ms to every keep-alive response
+        disable_nagle_algorithm = True
+
+        def log_message(self, format, *args):
+            pass
+
+        def _dispatch(self, method):
+            path = self.path.split("?", 1)[0]
+            length = int(self.headers.get("Content-Length") or 0)
+            raw = self.rfile.read(length) if length else b""
+            body = json.loads(raw) if raw else {}
+            server.count_request()
+            for route_method, pattern, name in _ROUTES:
+                match = pattern.match(path)
+                if route_method == method and match:
+                    status, payload = getattr(server, name)(*match.groups(), body)
+                    break
+            else:
+                status, payload = 404, {"error": {"code": "NotFound", "message": path}}
+            if isinstance(payload, _EventStream):
+                self._send_events(status, payload.events)
+                return
+            data = json.dumps(payload).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def _send_events(self, status, events):
+            self.send_response(status)
+            self.send_header("Content-Type", "text/event-stream")
+            self.send_header("Transfer-Encoding", "chunked")
+            self.end_headers()
+            for event in itertools.chain((json.dumps(event) for event in events), ["[DONE]"]):
+                data = f"data: {event}\n\n".encode("utf-8")
+                self.wfile.write(f"{len(data):x}\r\n".encode("ascii") + data + b"\r\n")
+                self.wfile.flush()
+            self.wfile.write(b"0\r\n\r\n")
+
+        def do_GET(self):
+            self._dispatch("GET")
+
+        def do_POST(self):
+            self._dispatch("POST")
+
+    return Handler
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve the Azure OpenAI and Azure AI Search stubs.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=0, help="0 picks a free port")
+    parser.add_argument("--latency", type=float, default=0.05, help="seconds per Azure OpenAI request")
+    parser.add_argument("--search-latency", type=float, help="seconds per search request (default: --latency)")
+    parser.add_argument("--tokens-per-second", type=float, help="chat completion generation rate")
+    parser.add_argument("--completion-tokens", type=int, default=0, help="minimum tokens per chat completion")
+    parser.add_argument("--array-items", type=int, default=1, help="elements per array in structured outputs")
+    args = parser.parse_args()
+
+    server = StubServer(args.host, args.port, latency=args.latency, search_latency=args.search_latency,
+                        tokens_per_second=args.tokens_per_second, completion_tokens=args.completion_tokens,
+                        array_items=args.array_items)
+    server.start()
+    print(server.url, flush=True)
+    try:
+        server._thread.join()
+    except KeyboardInterrupt:
+        server.stop()
+
+
+if __name__ == "__main__":
+    main()
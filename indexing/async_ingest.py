@@ -0,0 +1,122 @@
+import asyncio
+import json
+import os
+from collections import namedtuple
+
+from azure.core.credentials import AzureKeyCredential
+from azure.search.documents.aio import SearchClient
+from openai import AsyncAzureOpenAI
+
+import azure_doc_processing as settings
+from azure_doc_processing import (
+    build_document, build_reports, create_index_if_not_exists, describe_plan, indexed_at,
+    list_documents, metadata_messages, plan_changes, read_paragraphs, report_embedding_cache
+)
+from batch_embedding import embed_texts_async
+from bulk_uploader import AsyncBulkUploader
+from embedding_cache import get_default_cache
+from index_manifest import IndexManifest
+
+# -----------------------------
+# Concurrency limits
+# -----------------------------
+# One limit per upstream service so a slow or rate-limited service cannot be
+# flooded by the others finishing early. `files` bounds how many documents
+# are held in memory at once.
+ConcurrencyLimits = namedtuple("ConcurrencyLimits", ["chat", "embeddings", "search", "files"])
+
+
+# -----------------------------
+# GPT metadata
+# -----------------------------
+async def extract_metadata_with_gpt_async(client, semaphore, text):
+    async with semaphore:
+        response = await client.chat.completions.create(
+            model=settings.AZURE_OPENAI_DEPLOYMENT,
+            messages=metadata_messages(text),
+            temperature=0.2
+        )
+    return json.loads(response.choices[0].message.content)
+
+
+# -----------------------------
+# One document
+# -----------------------------
+async def process_document_async(folder, filename, client, uploader, manifest, semaphores):
+    async with semaphores["files"]:
+        path = os.path.join(folder, filename)
+        print(f"✅ Processing: {filename}")
+        try:
+            paragraphs = await asyncio.to_thread(read_paragraphs, path)
+        except Exception as e:
+            print(f"❌ Failed to load Word document: {filename} | Error: {e}")
+            return False
+
+        plan = manifest.plan(filename, paragraphs)
+        describe_plan(filename, plan)
+        texts = [text for _, _, text in plan.new]
+
+        # GPT metadata for every paragraph runs alongside the embedding batches
+        metadata_task = asyncio.gather(
+            *(extract_metadata_with_gpt_async(client, semaphores["chat"], text) for text in texts),
+            return_exceptions=True,
+        )
+        try:
+            embeddings = await embed_texts_async(client, settings.AZURE_EMBEDDING_DEPLOYMENT, texts,
+                                                 semaphore=semaphores["embeddings"], cache=get_default_cache())
+        except Exception as e:
+            print(f"❌ Failed to embed paragraphs in {filename}: {e}")
+            metadata_task.cancel()
+            return False
+        metadata_results = await metadata_task
+
+        for key, paragraph_id in plan.moved:
+            await uploader.merge({"id": key, "ParagraphId": paragraph_id, "date": indexed_at()})
+        for key in plan.removed:
+            await uploader.delete(key)
+        indexed_keys = []
+        for (key, paragraph_id, paragraph_text), embedding, metadata in zip(plan.new, embeddings, metadata_results):
+            try:
+                if isinstance(metadata, Exception):
+                    raise metadata
+                await uploader.merge_or_upload(build_document(key, filename, paragraph_text, metadata, embedding, paragraph_id))
+                indexed_keys.append(key)
+            except Exception as e:
+                print(f"❌ Error processing paragraph {paragraph_id} in {filename}: {e}")
+        manifest.commit(filename, plan, indexed_keys)
+        return plan_changes(plan)
+
+
+# -----------------------------
+# Main
+# -----------------------------
+async def process_all_documents_async(folder, manifest_path, limits, full=False):
+    print("📁 Current working directory:", os.getcwd())
+    print(f"⚡ Concurrent mode: chat={limits.chat}, embeddings={limits.embeddings}, "
+          f"search={limits.search}, files={limits.files}")
+    await asyncio.to_thread(create_index_if_not_exists)
+
+    manifest = IndexManifest(manifest_path, settings.INDEX_NAME, full=full)
+    semaphores = {name: asyncio.Semaphore(value) for name, value in limits._asdict().items()}
+    client = AsyncAzureOpenAI(api_key=settings.AZURE_OPENAI_API_KEY, api_version="2023-05-15",
+                              azure_endpoint=settings.AZURE_OPENAI_ENDPOINT)
+    search_client = SearchClient(endpoint=settings.AZURE_SEARCH_ENDPOINT, index_name=settings.INDEX_NAME,
+                                 credential=AzureKeyCredential(settings.AZURE_SEARCH_KEY))
+    async with client, search_client:
+        async with AsyncBulkUploader(search_client, settings.INDEX_NAME, semaphore=semaphores["search"]) as uploader:
+            filenames = list_documents(folder)
+            results = await asyncio.gather(*(
+                process_document_async(folder, filename, client, uploader, manifest, semaphores)
+                for filename in filenames
+            ))
+            removed = []
+            for filename, keys in manifest.removed_files(list_documents(folder)).items():
+                print(f"🗑️ {filename} is gone, removing {len(keys)} paragraphs")
+                for key in keys:
+                    await uploader.delete(key)
+                manifest.drop_file(filename)
+                removed.append(filename)
+    manifest.discard_failed(uploader.failed)
+    manifest.save()
+    report_embedding_cache()
+    await build_reports([filename for filename, changed in zip(filenames, results) if changed], removed)
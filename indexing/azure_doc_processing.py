@@ -1,8 +1,9 @@
 import os
-import uuid
+import argparse
+import asyncio
 import json
 import datetime
-from docx import Document
+from types import SimpleNamespace
 from azure.core.credentials import AzureKeyCredential
 from azure.search.documents.indexes import SearchIndexClient
 from azure.search.documents import SearchClient
@@ -13,11 +14,18 @@ from azure.search.documents.indexes.models import (
     VectorSearchAlgorithmMetric
 )
 from openai import AzureOpenAI
+from batch_embedding import embed_texts
+from bulk_uploader import BulkUploader
+from docx_stream import read_paragraph_texts
+from embedding_cache import get_default_cache
+from index_manifest import IndexManifest
+from report_store import rebuild_reports
 
 # ----------------------------- Configuration -----------------------------
 AZURE_SEARCH_ENDPOINT = "https://.search.windows.net"
 AZURE_SEARCH_KEY = ""
 INDEX_NAME = "legal-documents"
+POLICY_INDEX_NAME = "legal-instructions"  # for the full-document reports
 
 AZURE_OPENAI_API_KEY = ""
 AZURE_OPENAI_ENDPOINT = "https://.openai.azure.com/"
@@ -25,6 +33,7 @@ AZURE_OPENAI_DEPLOYMENT = "gpt-4o"
 AZURE_EMBEDDING_DEPLOYMENT = "text-embedding-ada-002"
 
 DOCUMENT_FOLDER = os.path.abspath("contract_documents")  # Use absolute path
+MANIFEST_PATH = os.path.abspath("index_manifest.json")  # What has been indexed so far
 
 # ----------------------------- GPT Prompt -----------------------------
 SYSTEM_PROMPT = """
@@ -60,7 +69,7 @@ def create_index_if_not_exists():
                     searchable=True, vector_search_dimensions=1536, vector_search_profile_name="myHnswProfile"),
         SimpleField(name="filename", type=SearchFieldDataType.String, filterable=True),
         SimpleField(name="department", type=SearchFieldDataType.String, filterable=True),
-        SimpleField(name="date", type=SearchFieldDataType.DateTimeOffset, filterable=True),
+        SimpleField(name="date", type=SearchFieldDataType.DateTimeOffset, filterable=True, sortable=True),
         SearchField(name="group", type=SearchFieldDataType.Collection(SearchFieldDataType.String), filterable=True),
         SimpleField(name="isCompliant", type=SearchFieldDataType.Boolean, filterable=True),
         SearchField(name="CompliantCollection", type=SearchFieldDataType.Collection(SearchFieldDataType.String)),
@@ -83,28 +92,39 @@ def create_index_if_not_exists():
     print(f"Index '{INDEX_NAME}' created successfully.")
 
 # ----------------------------- GPT & Embedding -----------------------------
+def metadata_messages(text):
+    return [
+        {"role": "system", "content": SYSTEM_PROMPT},
+        {"role": "user", "content": text}
+    ]
+
 def extract_metadata_with_gpt(text):
     client = AzureOpenAI(api_key=AZURE_OPENAI_API_KEY, api_version="2023-05-15", azure_endpoint=AZURE_OPENAI_ENDPOINT)
     response = client.chat.completions.create(
         model=AZURE_OPENAI_DEPLOYMENT,
-        messages=[
-            {"role": "system", "content": SYSTEM_PROMPT},
-            {"role": "user", "content": text}
-        ],
+        messages=metadata_messages(text),
         temperature=0.2
     )
     return json.loads(response.choices[0].message.content)
 
 def get_embedding(text):
+    return get_embeddings([text])[0]
+
+def get_embeddings(texts):
+    # One embeddings call per token-bounded batch instead of one per paragraph
     client = AzureOpenAI(api_key=AZURE_OPENAI_API_KEY, api_version="2023-05-15", azure_endpoint=AZURE_OPENAI_ENDPOINT)
-    result = client.embeddings.create(model=AZURE_EMBEDDING_DEPLOYMENT, input=[text])
-    return result.data[0].embedding
+    # Boilerplate clauses repeat across contracts; cached vectors are reused
+    return embed_texts(client, AZURE_EMBEDDING_DEPLOYMENT, texts, cache=get_default_cache())
+
+def report_embedding_cache():
+    cache = get_default_cache()
+    if cache is not None:
+        print(f"📊 {cache.report()}")
 
 # ----------------------------- Upload to Azure Search -----------------------------
-def upload_paragraph_to_index(file_name, paragraph, metadata, embedding, paragraph_id):
-    search_client = SearchClient(endpoint=AZURE_SEARCH_ENDPOINT, index_name=INDEX_NAME, credential=AzureKeyCredential(AZURE_SEARCH_KEY))
-    doc = {
-        "id": str(uuid.uuid4()),
+def build_document(key, file_name, paragraph, metadata, embedding, paragraph_id):
+    return {
+        "id": key,
         "title": metadata["title"],
         "paragraph": paragraph,
         "ParagraphId": paragraph_id,
@@ -113,46 +133,139 @@ def upload_paragraph_to_index(file_name, paragraph, metadata, embedding, paragra
         "embedding": embedding,
         "filename": file_name,
         "department": "Legal",
-        "date": datetime.datetime.utcnow().replace(tzinfo=datetime.timezone.utc).isoformat(),
+        "date": indexed_at(),
         "group": [],
         "isCompliant": metadata["isCompliant"],
         "CompliantCollection": metadata.get("CompliantCollection", []),
         "NonCompliantCollection": metadata.get("NonCompliantCollection", [])
     }
-    result = search_client.upload_documents(documents=[doc])
-    print(f"Uploaded document for: {file_name} | ParagraphId: {paragraph_id} | Status: {result[0].status_code}")
+
+def indexed_at():
+    # Every paragraph written or moved is stamped, so a file's latest date
+    # changes whenever its content or order does
+    return datetime.datetime.utcnow().replace(tzinfo=datetime.timezone.utc).isoformat()
+
+def upload_paragraph_to_index(uploader, key, file_name, paragraph, metadata, embedding, paragraph_id):
+    # Buffered: the uploader sends documents in bulk and reports per batch.
+    # Keys are deterministic, so an edited paragraph replaces its old version.
+    uploader.merge_or_upload(build_document(key, file_name, paragraph, metadata, embedding, paragraph_id))
+
+def apply_unchanged_content(uploader, plan):
+    # Paragraphs whose text is already indexed only need their position fixed,
+    # and paragraphs that disappeared from the file are removed
+    for key, paragraph_id in plan.moved:
+        uploader.merge({"id": key, "ParagraphId": paragraph_id, "date": indexed_at()})
+    for key in plan.removed:
+        uploader.delete(key)
+
+def describe_plan(filename, plan):
+    print(f"   {filename}: {len(plan.new)} new or changed, {len(plan.moved)} moved, "
+          f"{plan.unchanged} unchanged, {len(plan.removed)} removed")
+
+def plan_changes(plan):
+    return bool(plan.new or plan.moved or plan.removed)
+
+def remove_deleted_files(folder, uploader, manifest):
+    removed = []
+    for filename, keys in manifest.removed_files(list_documents(folder)).items():
+        print(f"🗑️ {filename} is gone, removing {len(keys)} paragraphs")
+        for key in keys:
+            uploader.delete(key)
+        manifest.drop_file(filename)
+        removed.append(filename)
+    return removed
+
+# ----------------------------- Full-document reports -----------------------------
+def report_connection():
+    # What the flows' `ally` connection provides to the report store
+    return SimpleNamespace(search_endpoint=AZURE_SEARCH_ENDPOINT, search_key=AZURE_SEARCH_KEY,
+                           search_document_index=INDEX_NAME, search_policy_index=POLICY_INDEX_NAME)
+
+async def build_reports(changed, removed):
+    # Only with ALLY_REPORT_PATH set: the serving workers build missing
+    # reports on first request otherwise
+    await rebuild_reports(report_connection(), changed, removed)
+
+# ----------------------------- Read Documents -----------------------------
+def list_documents(folder):
+    return [filename for filename in sorted(os.listdir(folder)) if filename.endswith(".docx")]
+
+def read_paragraphs(path):
+    # Read from the XML as it streams, without building python-docx's tree
+    return read_paragraph_texts(path)
 
 # ----------------------------- Main -----------------------------
-def process_all_documents():
+def process_all_documents(folder=DOCUMENT_FOLDER, manifest_path=MANIFEST_PATH, full=False):
     print("📁 Current working directory:", os.getcwd())
     create_index_if_not_exists()
 
-    for filename in os.listdir(DOCUMENT_FOLDER):
-        if filename.endswith(".docx"):
-            path = os.path.join(DOCUMENT_FOLDER, filename)
+    manifest = IndexManifest(manifest_path, INDEX_NAME, full=full)
+    search_client = SearchClient(endpoint=AZURE_SEARCH_ENDPOINT, index_name=INDEX_NAME, credential=AzureKeyCredential(AZURE_SEARCH_KEY))
+    with BulkUploader(search_client, INDEX_NAME) as uploader:
+        changed = process_documents(folder, uploader, manifest)
+        removed = remove_deleted_files(folder, uploader, manifest)
+    manifest.discard_failed(uploader.failed)
+    manifest.save()
+    report_embedding_cache()
+    asyncio.run(build_reports(changed, removed))
+
+def process_documents(folder, uploader, manifest):
+    changed = []
+    for filename in list_documents(folder):
+        path = os.path.join(folder, filename)
+
+        print(f"✅ Processing: {filename}")
+        try:
+            paragraphs = read_paragraphs(path)
+        except Exception as e:
+            print(f"❌ Failed to load Word document: {filename} | Error: {e}")
+            continue
 
-            if not os.path.exists(path):
-                print(f"❌ File not found: {path}")
-                continue
+        plan = manifest.plan(filename, paragraphs)
+        describe_plan(filename, plan)
+        try:
+            embeddings = get_embeddings([text for _, _, text in plan.new])
+        except Exception as e:
+            print(f"❌ Failed to embed paragraphs in {filename}: {e}")
+            continue
 
-            print(f"✅ Processing: {filename}")
+        apply_unchanged_content(uploader, plan)
+        indexed_keys = []
+        for (key, paragraph_id, paragraph_text), embedding in zip(plan.new, embeddings):
             try:
-                document = Document(path)
+                metadata = extract_metadata_with_gpt(paragraph_text)
+                upload_paragraph_to_index(uploader, key, filename, paragraph_text, metadata, embedding, paragraph_id)
+                indexed_keys.append(key)
             except Exception as e:
-                print(f"❌ Failed to load Word document: {filename} | Error: {e}")
-                continue
-
-            paragraph_id = 1
-            for para in document.paragraphs:
-                if para.text.strip():
-                    try:
-                        paragraph_text = para.text.strip()
-                        metadata = extract_metadata_with_gpt(paragraph_text)
-                        embedding = get_embedding(paragraph_text)
-                        upload_paragraph_to_index(filename, paragraph_text, metadata, embedding, paragraph_id)
-                        paragraph_id += 1
-                    except Exception as e:
-                        print(f"❌ Error processing paragraph {paragraph_id} in {filename}: {e}")
+                print(f"❌ Error processing paragraph {paragraph_id} in {filename}: {e}")
+        manifest.commit(filename, plan, indexed_keys)
+        if plan_changes(plan):
+            changed.append(filename)
+    return changed
+
+def main():
+    parser = argparse.ArgumentParser(description="Index contract documents into Azure AI Search.")
+    parser.add_argument("--folder", default=DOCUMENT_FOLDER, help="folder with the .docx files to index")
+    parser.add_argument("--manifest", default=MANIFEST_PATH, help="JSON file recording what has been indexed")
+    parser.add_argument("--full", action="store_true",
+                        help="re-index every paragraph (the manifest still lists what to remove)")
+    parser.add_argument("--mode", choices=["sequential", "concurrent"], default="sequential",
+                        help="sequential processes one paragraph at a time; concurrent overlaps "
+                             "GPT, embedding and upload calls across paragraphs and files")
+    parser.add_argument("--chat-concurrency", type=int, default=8, help="max GPT calls in flight (concurrent mode)")
+    parser.add_argument("--embedding-concurrency", type=int, default=4, help="max embedding calls in flight (concurrent mode)")
+    parser.add_argument("--search-concurrency", type=int, default=4, help="max upload calls in flight (concurrent mode)")
+    parser.add_argument("--file-concurrency", type=int, default=4, help="max documents processed at once (concurrent mode)")
+    args = parser.parse_args()
+
+    if args.mode == "concurrent":
+        from async_ingest import ConcurrencyLimits, process_all_documents_async
+        limits = ConcurrencyLimits(chat=args.chat_concurrency, embeddings=args.embedding_concurrency,
+                                   search=args.search_concurrency, files=args.file_concurrency)
+        asyncio.run(process_all_documents_async(os.path.abspath(args.folder), os.path.abspath(args.manifest), limits,
+                                                full=args.full))
+    else:
+        process_all_documents(os.path.abspath(args.folder), os.path.abspath(args.manifest), full=args.full)
 
 if __name__ == "__main__":
-    process_all_documents()
+    main()
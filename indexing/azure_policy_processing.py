@@ -1,7 +1,6 @@
 import uuid
 import json
 import os
-from docx import Document
 from azure.core.credentials import AzureKeyCredential
 from azure.search.documents.indexes import SearchIndexClient
 from azure.search.documents import SearchClient
@@ -12,6 +11,11 @@ from azure.search.documents.indexes.models import (
     VectorSearchAlgorithmMetric
 )
 from openai import AzureOpenAI
+from batch_embedding import embed_texts
+from bulk_uploader import BulkUploader
+from docx_stream import read_paragraph_texts
+from embedding_cache import get_default_cache
+import language_id
 
 # -----------------------------
 # Azure Search Configuration
@@ -97,13 +101,17 @@ def create_index_if_not_exists():
 # Read Word Document
 # -----------------------------
 def extract_text_from_docx(file_path):
-    doc = Document(file_path)
-    return "\n".join([p.text.strip() for p in doc.paragraphs if p.text.strip()])
+    # The policy is analyzed in one prompt, so its text is joined; only the
+    # text is held, not python-docx's tree of the document
+    return "\n".join(read_paragraph_texts(file_path))
 
 # -----------------------------
-# Detect Language with OpenAI
+# Detect Language (OpenAI only for ambiguous text)
 # -----------------------------
 def detect_language(text):
+    return language_id.detect_language(text, fallback=detect_language_with_openai)
+
+def detect_language_with_openai(text):
     client = AzureOpenAI(
         api_key=AZURE_OPENAI_API_KEY,
         api_version=AZURE_API_VERSION,
@@ -158,26 +166,20 @@ def analyze_text_with_openai(text):
 # Get Embedding for Instruction
 # -----------------------------
 def get_embedding(text):
+    return get_embeddings([text])[0]
+
+def get_embeddings(texts):
     client = AzureOpenAI(
         api_key=AZURE_OPENAI_API_KEY,
         api_version=AZURE_API_VERSION,
         azure_endpoint=AZURE_OPENAI_ENDPOINT,
     )
-    response = client.embeddings.create(
-        model=AZURE_EMBEDDING_DEPLOYMENT,
-        input=[text]
-    )
-    return response.data[0].embedding
+    return embed_texts(client, AZURE_EMBEDDING_DEPLOYMENT, texts, cache=get_default_cache())
 
 # -----------------------------
 # Upload to Azure Search
 # -----------------------------
-def upload_to_search(data, embedding, language):
-    search_client = SearchClient(
-        endpoint=AZURE_SEARCH_ENDPOINT,
-        index_name=INDEX_NAME,
-        credential=AzureKeyCredential(AZURE_SEARCH_KEY)
-    )
+def upload_to_search(uploader, data, embedding, language):
     id = str(uuid.uuid4())
     doc = {
         "id": id,
@@ -192,8 +194,7 @@ def upload_to_search(data, embedding, language):
         "language": language
     }
 
-    result = search_client.upload_documents(documents=[doc])
-    print("Document uploaded:", result)
+    uploader.upload(doc)
 
 # -----------------------------
 # Main Execution
@@ -207,14 +208,25 @@ if __name__ == "__main__":
     base_dir = os.path.dirname(__file__)  # Path to indexing/
     folder_path = os.path.join(base_dir, "..", "policy_document")
 
+    # Extract -> Detect Language -> Analyze for every policy first,
+    # then embed all instructions in batched calls before uploading
+    policies = []
     for filename in os.listdir(folder_path):
         if filename.endswith(".docx"):
             docx_path = os.path.join(folder_path, filename)
             print(f"Processing: {docx_path}")
 
-            # Extract -> Detect Language -> Analyze -> Embed -> Upload
             text = extract_text_from_docx(docx_path)
             language = detect_language(text)
             structured_data = analyze_text_with_openai(text)
-            embedding = get_embedding(structured_data["instruction"])
-            upload_to_search(structured_data, embedding, language)
\ No newline at end of file
+            policies.append((structured_data, language))
+
+    embeddings = get_embeddings([data["instruction"] for data, _ in policies])
+    search_client = SearchClient(
+        endpoint=AZURE_SEARCH_ENDPOINT,
+        index_name=INDEX_NAME,
+        credential=AzureKeyCredential(AZURE_SEARCH_KEY)
+    )
+    with BulkUploader(search_client, INDEX_NAME) as uploader:
+        for (structured_data, language), embedding in zip(policies, embeddings):
+            upload_to_search(uploader, structured_data, embedding, language)
\ No newline at end of file
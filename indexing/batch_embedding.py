@@ -0,0 +1,87 @@
+import asyncio
+from token_count import count_tokens
+
+# -----------------------------
+# Batch limits
+# -----------------------------
+# Azure OpenAI accepts up to 2048 inputs per embeddings call. We stay well
+# below that so a single batch never trips the per-request token rate limiter.
+MAX_BATCH_TOKENS = 8000
+MAX_BATCH_ITEMS = 256
+
+# -----------------------------
+# Group texts into token-bounded batches
+# -----------------------------
+def iter_token_batches(texts, max_tokens=MAX_BATCH_TOKENS, max_items=MAX_BATCH_ITEMS):
+    """Yield lists of indexes into `texts`, each list fitting both limits.
+
+    Order is preserved so the caller can map vectors back by position. A text
+    that is larger than `max_tokens` on its own is sent alone.
+    """
+    batch, batch_tokens = [], 0
+    for i, text in enumerate(texts):
+        tokens = count_tokens(text)
+        if batch and (batch_tokens + tokens > max_tokens or len(batch) >= max_items):
+            yield batch
+            batch, batch_tokens = [], 0
+        batch.append(i)
+        batch_tokens += tokens
+    if batch:
+        yield batch
+
+
+# -----------------------------
+# Embed a list of texts with one call per batch
+# -----------------------------
+def embed_texts(client, deployment, texts, cache=None, max_tokens=MAX_BATCH_TOKENS, max_items=MAX_BATCH_ITEMS):
+    """Return one embedding per text, in the same order as `texts`.
+
+    With an EmbeddingCache only the texts it does not hold are sent.
+    """
+    if cache is not None:
+        return cache.embed(deployment, texts,
+                           lambda missing: embed_texts(client, deployment, missing, None, max_tokens, max_items))
+    embeddings = [None] * len(texts)
+    for batch in iter_token_batches(texts, max_tokens, max_items):
+        response = client.embeddings.create(model=deployment, input=[texts[i] for i in batch])
+        # The service returns items tagged with their position in the request,
+        # which is not guaranteed to match the order of `data`.
+        for item in response.data:
+            embeddings[batch[item.index]] = item.embedding
+    return embeddings
+
+
+# -----------------------------
+# asyncio variant: batches are sent concurrently
+# -----------------------------
+MAX_CONCURRENT_BATCHES = 4
+
+
+async def embed_texts_async(client, deployment, texts, semaphore=None, cache=None,
+                            max_tokens=MAX_BATCH_TOKENS, max_items=MAX_BATCH_ITEMS):
+    """Same contract as embed_texts for an AsyncAzureOpenAI client.
+
+    `semaphore` bounds how many embeddings requests are in flight; pass a
+    shared one to apply a single limit across several documents.
+    """
+    if cache is not None:
+        vectors = cache.get_many(deployment, texts)
+        missing = list(dict.fromkeys(text for text, vector in zip(texts, vectors) if vector is None))
+        if missing:
+            fresh = await embed_texts_async(client, deployment, missing, semaphore, None, max_tokens, max_items)
+            cache.put_many(deployment, missing, fresh)
+            fresh = dict(zip(missing, fresh))
+            vectors = [fresh[text] if vector is None else vector for text, vector in zip(texts, vectors)]
+        return vectors
+
+    semaphore = semaphore or asyncio.Semaphore(MAX_CONCURRENT_BATCHES)
+    embeddings = [None] * len(texts)
+
+    async def embed_batch(batch):
+        async with semaphore:
+            response = await client.embeddings.create(model=deployment, input=[texts[i] for i in batch])
+        for item in response.data:
+            embeddings[batch[item.index]] = item.embedding
+
+    await asyncio.gather(*(embed_batch(batch) for batch in iter_token_batches(texts, max_tokens, max_items)))
+    return embeddings
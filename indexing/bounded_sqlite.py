@@ -0,0 +1,84 @@
+import sqlite3
+
+# -----------------------------
+# Size-bounded SQLite tables
+# -----------------------------
+# The embedding cache and the memo store keep their rows in a SQLite file
+# that several processes (gunicorn workers, indexing runs) share, bounded by
+# evicting the least recently used rows. Every row records its `size`, but
+# summing that column reads every row (and the overflow pages of the blob or
+# text stored before it), so each process keeps a running total instead: read
+# once when the file is opened, raised by its own inserts, lowered by its own
+# evictions. Only when it passes max_bytes is the column summed again, which
+# also picks up what other processes added or evicted since; a process can
+# therefore overshoot by what the others wrote before its next sum.
+
+# Evict down to this fraction of max_bytes so we do not evict on every insert
+EVICT_TO = 0.9
+
+
+def remember(memory, key, value, max_items):
+    """Put `value` at the recent end of an OrderedDict LRU of `max_items`."""
+    memory[key] = value
+    memory.move_to_end(key)
+    while len(memory) > max_items:
+        memory.popitem(last=False)
+
+
+class BoundedTable:
+    """One table of a shared SQLite file, kept under `max_bytes`.
+
+    `columns` is the table definition; it must have `key TEXT PRIMARY KEY`,
+    `size INTEGER` and `last_used REAL` columns. Not locked: the owner calls
+    it with its own lock held.
+    """
+
+    def __init__(self, path, table, columns, max_bytes, evict_to=EVICT_TO):
+        self.table = table
+        self.max_bytes = max_bytes
+        self.evict_to = evict_to
+        self.db = sqlite3.connect(path, timeout=30, check_same_thread=False, isolation_level=None)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute(f"CREATE TABLE IF NOT EXISTS {table} ({columns})")
+        self.db.execute(f"CREATE INDEX IF NOT EXISTS {table}_last_used ON {table} (last_used)")
+        self.total = self._sum()
+
+    def insert(self, rows, sizes):
+        """INSERT OR REPLACE `rows` (values in column order) of `sizes` bytes,
+        then evict if the table outgrew max_bytes. A replaced row is counted
+        twice until the next sum, which only brings that sum forward."""
+        if not rows:
+            return
+        placeholders = ",".join("?" * len(rows[0]))
+        self.db.executemany(f"INSERT OR REPLACE INTO {self.table} VALUES ({placeholders})", rows)
+        self.total += sum(sizes)
+        if self.total > self.max_bytes:
+            self.evict()
+
+    def touch(self, keys, now):
+        # SQLite limits the number of bound parameters per statement
+        for start in range(0, len(keys), 500):
+            chunk = keys[start:start + 500]
+            placeholders = ",".join("?" * len(chunk))
+            self.db.execute(f"UPDATE {self.table} SET last_used = ? WHERE key IN ({placeholders})", [now] + chunk)
+
+    def evict(self):
+        self.total = self._sum()
+        if self.total <= self.max_bytes:
+            return
+        target = self.total - int(self.max_bytes * self.evict_to)
+        freed = 0
+        evicted = []
+        for key, size in self.db.execute(f"SELECT key, size FROM {self.table} ORDER BY last_used"):
+            evicted.append((key,))
+            freed += size
+            if freed >= target:
+                break
+        self.db.executemany(f"DELETE FROM {self.table} WHERE key = ?", evicted)
+        self.total -= freed
+
+    def count(self):
+        return self.db.execute(f"SELECT COUNT(*) FROM {self.table}").fetchone()[0]
+
+    def _sum(self):
+        return self.db.execute(f"SELECT COALESCE(SUM(size), 0) FROM {self.table}").fetchone()[0]
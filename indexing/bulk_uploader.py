@@ -0,0 +1,296 @@
+import asyncio
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from azure.core.exceptions import AzureError, HttpResponseError
+from azure.search.documents import IndexDocumentsBatch
+
+# -----------------------------
+# Batch limits
+# -----------------------------
+# Azure AI Search accepts at most 1000 actions and 16 MB per indexing request.
+# The byte limit is kept lower because the JSON size we estimate locally is not
+# exactly what the SDK serializes.
+MAX_BATCH_DOCUMENTS = 1000
+MAX_BATCH_BYTES = 8 * 1024 * 1024
+MAX_WORKERS = 4
+MAX_RETRIES = 3
+RETRY_BACKOFF = 1.0
+
+# Per-document status codes the service documents as transient
+RETRYABLE_STATUS_CODES = {409, 422, 503}
+
+UPLOAD = "upload"
+MERGE = "merge"
+MERGE_OR_UPLOAD = "mergeOrUpload"
+DELETE = "delete"
+
+
+# -----------------------------
+# Request building and result handling
+# -----------------------------
+def build_batch(actions):
+    batch = IndexDocumentsBatch()
+    for action, document in actions:
+        if action == UPLOAD:
+            batch.add_upload_actions([document])
+        elif action == MERGE:
+            batch.add_merge_actions([document])
+        elif action == MERGE_OR_UPLOAD:
+            batch.add_merge_or_upload_actions([document])
+        elif action == DELETE:
+            batch.add_delete_actions([document])
+        else:
+            raise ValueError(f"Unknown index action: {action}")
+    return batch
+
+
+def classify_results(actions, results, key_field):
+    """Split per-document results into (permanent_failures, retryable_failures),
+    each a list of ((action, document), reason)."""
+    by_key = {document[key_field]: (action, document) for action, document in actions}
+    failed, retryable = [], []
+    for result in results:
+        if result.succeeded:
+            continue
+        entry = (by_key[result.key], result.error_message or str(result.status_code))
+        if result.status_code in RETRYABLE_STATUS_CODES:
+            retryable.append(entry)
+        else:
+            failed.append(entry)
+    return failed, retryable
+
+
+def classify_error(actions, error):
+    """Same as classify_results for a request that failed as a whole."""
+    entries = [(item, str(error)) for item in actions]
+    status_code = getattr(error, "status_code", None)
+    if not isinstance(error, HttpResponseError) or status_code is None \
+            or status_code in RETRYABLE_STATUS_CODES or status_code >= 500:
+        # Connection resets and timeouts never reached the index
+        return [], entries
+    return entries, []
+
+
+def is_too_large(actions, error):
+    return isinstance(error, HttpResponseError) and error.status_code == 413 and len(actions) > 1
+
+
+class _BatchBuffer:
+    """Buffering and reporting shared by the sync and async uploaders."""
+
+    def __init__(self, index_name, key_field, max_documents, max_bytes, max_retries, retry_backoff):
+        self.index_name = index_name
+        self.key_field = key_field
+        self.max_documents = max_documents
+        self.max_bytes = max_bytes
+        self.max_retries = max_retries
+        self.retry_backoff = retry_backoff
+
+        self.succeeded = 0
+        self.failed = []
+        self._buffer = []
+        self._buffer_bytes = 0
+        self._batch_number = 0
+
+    def _buffer_action(self, document, action):
+        """Buffer one action. Returns a full batch to send first, if any."""
+        full = None
+        size = len(json.dumps(document, default=str))
+        if self._buffer and (len(self._buffer) >= self.max_documents or self._buffer_bytes + size > self.max_bytes):
+            full = self._take_batch()
+        self._buffer.append((action, document))
+        self._buffer_bytes += size
+        return full
+
+    def _take_batch(self):
+        self._batch_number += 1
+        actions, self._buffer, self._buffer_bytes = self._buffer, [], 0
+        return self._batch_number, actions
+
+    def _record(self, batch_number, total, failed, attempt, elapsed):
+        ok = total - len(failed)
+        self.succeeded += ok
+        self.failed.extend(failed)
+        status = "OK" if not failed else f"{len(failed)} failed"
+        print(f"Batch {batch_number} -> '{self.index_name}': {ok}/{total} succeeded, "
+              f"{attempt} retries, {elapsed:.2f}s [{status}]")
+
+    def _summary(self):
+        print(f"Bulk upload to '{self.index_name}' finished: {self.succeeded} succeeded, {len(self.failed)} failed")
+
+
+class BulkUploader(_BatchBuffer):
+    """Buffer index actions and send them to Azure AI Search in bulk.
+
+    Documents are collected until a batch reaches `max_documents` or
+    `max_bytes`, then the batch is sent on a worker thread so several batches
+    can be in flight at once. Only the documents the service reports as
+    failed are retried. Works with any index whose key field is `key_field`,
+    e.g. `legal-documents` and `legal-instructions`.
+
+        with BulkUploader(search_client, "legal-documents") as uploader:
+            for doc in docs:
+                uploader.upload(doc)
+    """
+
+    def __init__(self, search_client, index_name, key_field="id", max_documents=MAX_BATCH_DOCUMENTS,
+                 max_bytes=MAX_BATCH_BYTES, max_workers=MAX_WORKERS, max_retries=MAX_RETRIES,
+                 retry_backoff=RETRY_BACKOFF):
+        super().__init__(index_name, key_field, max_documents, max_bytes, max_retries, retry_backoff)
+        self.search_client = search_client
+        self._futures = []
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="bulk-upload")
+
+    # -----------------------------
+    # Public API
+    # -----------------------------
+    def upload(self, document):
+        self.add(document, UPLOAD)
+
+    def merge(self, document):
+        self.add(document, MERGE)
+
+    def merge_or_upload(self, document):
+        self.add(document, MERGE_OR_UPLOAD)
+
+    def delete(self, key):
+        self.add({self.key_field: key}, DELETE)
+
+    def add(self, document, action=UPLOAD):
+        full = self._buffer_action(document, action)
+        if full:
+            self._submit(full)
+
+    def flush(self):
+        """Send whatever is buffered and wait for every in-flight batch."""
+        if self._buffer:
+            self._submit(self._take_batch())
+        futures, self._futures = self._futures, []
+        for future in futures:
+            future.result()
+
+    def close(self):
+        self.flush()
+        self._executor.shutdown()
+        self._summary()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    # -----------------------------
+    # Batching
+    # -----------------------------
+    def _submit(self, batch):
+        self._futures.append(self._executor.submit(self._send_batch, *batch))
+
+    def _send_batch(self, batch_number, actions):
+        start = time.perf_counter()
+        pending = actions
+        attempt = 0
+        while pending:
+            failed, retryable = self._index(pending)
+            if not retryable or attempt >= self.max_retries:
+                failed.extend(retryable)
+                break
+            attempt += 1
+            time.sleep(self.retry_backoff * 2 ** (attempt - 1))
+            pending = [item for item, _ in retryable]
+
+        with self._lock:
+            self._record(batch_number, len(actions), failed, attempt, time.perf_counter() - start)
+
+    def _index(self, actions):
+        """Send one request. Returns (permanent_failures, retryable_failures)."""
+        try:
+            results = self.search_client.index_documents(build_batch(actions))
+        except AzureError as e:
+            if is_too_large(actions, e):
+                # Payload too large: split the batch and send both halves
+                middle = len(actions) // 2
+                first = self._index(actions[:middle])
+                second = self._index(actions[middle:])
+                return first[0] + second[0], first[1] + second[1]
+            return classify_error(actions, e)
+        return classify_results(actions, results, self.key_field)
+
+
+class AsyncBulkUploader(_BatchBuffer):
+    """asyncio counterpart of BulkUploader for `azure.search.documents.aio`.
+
+    Full batches are sent as tasks; at most `max_concurrency` requests are in
+    flight at once, or fewer if a shared `semaphore` is passed in.
+    """
+
+    def __init__(self, search_client, index_name, key_field="id", max_documents=MAX_BATCH_DOCUMENTS,
+                 max_bytes=MAX_BATCH_BYTES, max_concurrency=MAX_WORKERS, max_retries=MAX_RETRIES,
+                 retry_backoff=RETRY_BACKOFF, semaphore=None):
+        super().__init__(index_name, key_field, max_documents, max_bytes, max_retries, retry_backoff)
+        self.search_client = search_client
+        self._semaphore = semaphore or asyncio.Semaphore(max_concurrency)
+        self._tasks = []
+
+    async def upload(self, document):
+        await self.add(document, UPLOAD)
+
+    async def merge(self, document):
+        await self.add(document, MERGE)
+
+    async def merge_or_upload(self, document):
+        await self.add(document, MERGE_OR_UPLOAD)
+
+    async def delete(self, key):
+        await self.add({self.key_field: key}, DELETE)
+
+    async def add(self, document, action=UPLOAD):
+        full = self._buffer_action(document, action)
+        if full:
+            self._tasks.append(asyncio.create_task(self._send_batch(*full)))
+
+    async def flush(self):
+        if self._buffer:
+            self._tasks.append(asyncio.create_task(self._send_batch(*self._take_batch())))
+        tasks, self._tasks = self._tasks, []
+        await asyncio.gather(*tasks)
+
+    async def close(self):
+        await self.flush()
+        self._summary()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.close()
+
+    async def _send_batch(self, batch_number, actions):
+        start = time.perf_counter()
+        pending = actions
+        attempt = 0
+        while pending:
+            failed, retryable = await self._index(pending)
+            if not retryable or attempt >= self.max_retries:
+                failed.extend(retryable)
+                break
+            attempt += 1
+            await asyncio.sleep(self.retry_backoff * 2 ** (attempt - 1))
+            pending = [item for item, _ in retryable]
+        self._record(batch_number, len(actions), failed, attempt, time.perf_counter() - start)
+
+    async def _index(self, actions):
+        try:
+            async with self._semaphore:
+                results = await self.search_client.index_documents(build_batch(actions))
+        except AzureError as e:
+            if is_too_large(actions, e):
+                middle = len(actions) // 2
+                first, second = await asyncio.gather(self._index(actions[:middle]), self._index(actions[middle:]))
+                return first[0] + second[0], first[1] + second[1]
+            return classify_error(actions, e)
+        return classify_results(actions, results, self.key_field)
@@ -0,0 +1,244 @@
+import os
+import re
+
+from token_count import count_tokens
+
+# -----------------------------
+# Configuration
+# -----------------------------
+# Contracts are split along their own structure instead of by a model: a
+# chunk is one numbered or headed clause, and a clause longer than
+# MAX_TOKENS is split between its (a)/(b) items, then its (i)/(ii) items,
+# then its sentences. A piece of a split clause shorter than MIN_TOKENS is
+# merged into its neighbour when both fit; a heading with no text of its own
+# becomes part of the next clause's title. Tokens are counted as the
+# embedding model does.
+MAX_TOKENS = int(os.environ.get("ALLY_CHUNK_MAX_TOKENS", "512"))
+MIN_TOKENS = int(os.environ.get("ALLY_CHUNK_MIN_TOKENS", "32"))
+
+# "1.", "12.3", "12.3.1" before a clause
+NUMBERED = re.compile(r"^(\d{1,3}(?:\.\d{1,3})*)\.?[\t ]+(?=\S)")
+# "(a)", "(ii)", "(3)", "a)" before an item
+ENUMERATED = re.compile(r"^\(?([a-z]{1,2}|[ivxlc]{1,6}|\d{1,3})\)[\t ]+(?=\S)", re.IGNORECASE)
+ROMAN = re.compile(r"^[ivxlc]{1,6}$", re.IGNORECASE)
+# Footers and page numbers Word leaves in the body text
+PAGE_NUMBER = re.compile(r"^(?:page\s+)?\d{1,4}(?:\s+of\s+\d{1,4})?$", re.IGNORECASE)
+SENTENCE_END = re.compile(r"(?<=[.;:])\s+(?=[(\"“A-Z0-9])")
+SMALL_WORDS = {"a", "an", "and", "as", "at", "by", "for", "in", "of", "on", "or", "the", "to", "with"}
+
+# Line kinds
+HEADING, CLAUSE, ITEM, SUBITEM, TEXT = "heading", "clause", "item", "subitem", "text"
+
+
+def title_case(text):
+    words = text.lower().split()
+    return " ".join(word if i and word in SMALL_WORDS else word[:1].upper() + word[1:] for i, word in enumerate(words))
+
+
+def is_heading(line):
+    # A short line in capitals without a final full stop, e.g. "DELIVERY AND PACKING"
+    letters = [c for c in line if c.isalpha()]
+    return (len(line.split()) <= 14 and len(letters) >= 3 and all(c.isupper() for c in letters)
+            and not line.endswith((".", ";", ",")))
+
+
+def is_capitals(text):
+    return not any(c.islower() for c in text)
+
+
+def continues(previous, line):
+    """Whether `line` carries on the sentence of the `previous` classified
+    line, broken by a page break or a narrow column."""
+    kind, marker, text = previous
+    if text.endswith((".", ";", ":")):
+        return False
+    if kind == HEADING:
+        return not marker and is_capitals(text) and is_capitals(line) and not is_heading(line)
+    return line[:1].islower() or (is_capitals(text) and is_capitals(line))
+
+
+def classify(lines):
+    """(kind, marker, text) for every non-empty line, lazily. Lines continuing
+    the previous one across a page break are joined to it, so each entry is
+    yielded once the next line has been read."""
+    previous = None
+    letter = None  # last (a)/(b) letter seen, to tell (i) the letter from (i) the numeral
+    for raw in lines:
+        line = " ".join(raw.replace("\t", " ").split())
+        if not line or PAGE_NUMBER.match(line):
+            continue
+        numbered = NUMBERED.match(raw.strip())
+        enumerated = ENUMERATED.match(line)
+        if numbered:
+            text = line[len(numbered.group(1)):].lstrip(". ")
+            entry = [HEADING if is_heading(text) else CLAUSE, numbered.group(1), text]
+            letter = None
+        elif enumerated:
+            marker = enumerated.group(1).lower()
+            text = line[enumerated.end():]
+            roman = ROMAN.match(marker) and not (len(marker) == len(letter or "") == 1 and ord(marker) == ord(letter) + 1)
+            if marker.isdigit() or roman:
+                entry = [SUBITEM, f"({marker})", text]
+            else:
+                entry = [ITEM, f"({marker})", text]
+                letter = marker
+        elif is_heading(line):
+            entry = [HEADING, "", line]
+            letter = None
+        elif previous and continues(previous, line):
+            # A heading that runs on into capitalised prose was prose too
+            previous[0] = TEXT if previous[0] == HEADING else previous[0]
+            previous[2] += " " + line
+            continue
+        else:
+            entry = [TEXT, "", line]
+        if previous:
+            yield previous
+        previous = entry
+    if previous:
+        yield previous
+
+
+def clauses(lines):
+    """Group classified lines into clauses, lazily: (title, [line, ...]), a
+    new clause starting at every heading and top-level numbered clause."""
+    title, body = None, []
+    for kind, marker, text in lines:
+        top_level = kind == CLAUSE and "." not in marker
+        if kind == HEADING or top_level:
+            if body or (title is not None and kind != HEADING):
+                yield title, body
+                title, body = None, []
+            if kind == HEADING:
+                # Consecutive headings ("SCHEDULE 1" / "PRICES") read as one
+                title = text if title is None else f"{title} - {text}"
+                continue
+        body.append((kind, marker, text))
+    if body or title is not None:
+        yield title, body
+
+
+def render(lines):
+    return "\n".join(f"{marker} {text}" if marker else text for _, marker, text in lines)
+
+
+def split_units(lines, kind):
+    """Split a clause's lines before every line of `kind`; lines before the
+    first one (an introduction) stay with it."""
+    units = [[]]
+    for line in lines:
+        if line[0] == kind and any(existing[0] == kind for existing in units[-1]):
+            units.append([])
+        units[-1].append(line)
+    return units
+
+
+def split_text(text, max_tokens):
+    """Sentences of `text` packed up to `max_tokens`; a longer sentence is
+    cut between words."""
+    pieces = []
+    for sentence in SENTENCE_END.split(text):
+        while count_tokens(sentence) > max_tokens:
+            words = sentence.split()
+            # Tokens per word vary; shrink the cut until it fits
+            cut = max(1, len(words) * max_tokens // count_tokens(sentence))
+            while cut > 1 and count_tokens(" ".join(words[:cut])) > max_tokens:
+                cut = max(1, cut * 9 // 10)
+            pieces.append(" ".join(words[:cut]))
+            sentence = " ".join(words[cut:])
+        if sentence:
+            pieces.append(sentence)
+    return pack(pieces, max_tokens, " ")
+
+
+def pack(pieces, max_tokens, separator="\n"):
+    """Join consecutive pieces while they fit in `max_tokens`."""
+    packed = []
+    for piece in pieces:
+        if packed and count_tokens(packed[-1] + separator + piece) <= max_tokens:
+            packed[-1] += separator + piece
+        else:
+            packed.append(piece)
+    return packed
+
+
+def split_clause(lines, max_tokens):
+    """The clause's text in pieces of at most `max_tokens`, cut at the
+    coarsest boundary that gets each piece under the limit."""
+    text = render(lines)
+    if count_tokens(text) <= max_tokens:
+        return [text]
+    pieces = []
+    for kind in (ITEM, SUBITEM, None):
+        units = split_units(lines, kind) if kind else None
+        if units is not None and len(units) > 1:
+            for unit in units:
+                pieces.extend(split_clause(unit, max_tokens))
+            return pack(pieces, max_tokens)
+    return split_text(text, max_tokens)
+
+
+def fallback_title(text):
+    words = text.split()
+    return " ".join(words[:8]) + (" ..." if len(words) > 8 else "")
+
+
+def merge_small(pieces, max_tokens, min_tokens):
+    """Merge a piece under `min_tokens` into its neighbour in the same
+    clause (the next one, or the previous one for the last piece) when both
+    fit in `max_tokens`."""
+    merged = list(pieces)
+    i = 0
+    while i < len(merged) and len(merged) > 1:
+        if count_tokens(merged[i]) < min_tokens:
+            j = i + 1 if i + 1 < len(merged) else i - 1
+            first, second = sorted((i, j))
+            joined = merged[first] + "\n" + merged[second]
+            if count_tokens(joined) <= max_tokens:
+                merged[first:second + 1] = [joined]
+                i = first
+                continue
+        i += 1
+    return merged
+
+
+def iter_chunks(lines, max_tokens=None, min_tokens=None):
+    """Yield {"id", "title", "paragraph"} for a contract read line by line,
+    each clause's chunks as soon as the next clause starts, so `lines` can be
+    a generator over a document still being read.
+
+    Ids count from "1". A chunk's title is its clause's heading (with the
+    first item's marker when the clause is split), or the start of its text
+    when the clause has none. The limits default to ALLY_CHUNK_MAX_TOKENS
+    and ALLY_CHUNK_MIN_TOKENS; a clause shorter than `min_tokens` is kept
+    whole rather than merged across clause boundaries.
+    """
+    max_tokens = MAX_TOKENS if max_tokens is None else max_tokens
+    min_tokens = MIN_TOKENS if min_tokens is None else min_tokens
+    count = 0
+    pending = None  # headings with no text of their own, for the next clause's title
+    for title, body in clauses(classify(lines)):
+        heading = title_case(title) if title and title.isupper() else title
+        if not body:
+            pending = heading if pending is None else f"{pending} - {heading}"
+            continue
+        if pending:
+            heading = f"{pending} - {heading}" if heading else pending
+            pending = None
+        pieces = merge_small(split_clause(body, max_tokens), max_tokens, min_tokens)
+        for i, piece in enumerate(pieces):
+            if not heading:
+                piece_title = fallback_title(piece)
+            elif i:
+                marker = ENUMERATED.match(piece)
+                piece_title = f"{heading} {marker.group(0).strip()}" if marker else f"{heading} (continued)"
+            else:
+                piece_title = heading
+            count += 1
+            yield {"id": str(count), "title": piece_title, "paragraph": piece}
+
+
+def chunk_contract(text, max_tokens=None, min_tokens=None):
+    """Split a contract's text into [{"id", "title", "paragraph"}], in order;
+    see `iter_chunks`."""
+    return list(iter_chunks(str(text).splitlines(), max_tokens, min_tokens))
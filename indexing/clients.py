@@ -0,0 +1,188 @@
+import asyncio
+import os
+import threading
+import weakref
+
+import httpx
+import requests
+from azure.core.credentials import AzureKeyCredential
+from azure.core.exceptions import HttpResponseError
+from azure.core.pipeline.transport import RequestsTransport
+from azure.search.documents import SearchClient
+from azure.search.documents.aio import SearchClient as AsyncSearchClient
+from azure.search.documents.indexes import SearchIndexClient
+from openai import APIStatusError, AsyncAzureOpenAI, AzureOpenAI, DefaultAsyncHttpxClient, DefaultHttpxClient
+
+import telemetry
+
+# -----------------------------
+# Configuration
+# -----------------------------
+# One AzureOpenAI / SearchClient per endpoint (and index) per process, each
+# with its own keep-alive pool, so flow nodes stop paying a TCP and TLS
+# handshake on every request. The pool should be at least as large as the
+# number of threads a worker runs (PROMPTFLOW_WORKER_THREADS plus the node
+# threads PromptFlow starts for one request).
+POOL_SIZE = int(os.environ.get("ALLY_HTTP_POOL_SIZE", "32"))
+KEEPALIVE_SECONDS = float(os.environ.get("ALLY_HTTP_KEEPALIVE", "120"))
+
+_lock = threading.Lock()
+_openai_clients = {}
+_search_clients = {}
+_index_clients = {}
+# Async clients hold connections bound to the event loop they were used on,
+# so they are kept per loop: under uvicorn that is one pool per worker, under
+# flask (one asyncio.run per request) one pool per request.
+_async_clients = weakref.WeakKeyDictionary()
+
+
+def _search_transport():
+    # azure-core's default transport keeps only 10 connections per host
+    session = requests.Session()
+    adapter = requests.adapters.HTTPAdapter(pool_connections=4, pool_maxsize=POOL_SIZE)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return RequestsTransport(session=session, session_owner=False)
+
+
+def get_openai_client(endpoint, key, api_version):
+    """Shared AzureOpenAI client. httpx clients are safe to use from several
+    threads at once."""
+    cache_key = (endpoint, key, api_version)
+    with _lock:
+        client = _openai_clients.get(cache_key)
+        if client is None:
+            http_client = DefaultHttpxClient(limits=httpx.Limits(
+                max_connections=POOL_SIZE, max_keepalive_connections=POOL_SIZE,
+                keepalive_expiry=KEEPALIVE_SECONDS,
+            ), event_hooks=telemetry.httpx_event_hooks())
+            client = _openai_clients[cache_key] = AzureOpenAI(
+                azure_endpoint=endpoint, api_key=key, api_version=api_version, http_client=http_client,
+            )
+        return client
+
+
+def get_search_client(endpoint, index_name, key):
+    """Shared SearchClient for one index."""
+    cache_key = (endpoint, index_name, key)
+    with _lock:
+        client = _search_clients.get(cache_key)
+        if client is None:
+            client = _search_clients[cache_key] = SearchClient(
+                endpoint, index_name, AzureKeyCredential(key), transport=_search_transport(),
+                per_call_policies=telemetry.search_policies(),
+            )
+        return client
+
+
+def get_index_client(endpoint, key):
+    cache_key = (endpoint, key)
+    with _lock:
+        client = _index_clients.get(cache_key)
+        if client is None:
+            client = _index_clients[cache_key] = SearchIndexClient(
+                endpoint, AzureKeyCredential(key), transport=_search_transport(),
+                per_call_policies=telemetry.search_policies(),
+            )
+        return client
+
+
+def _loop_clients():
+    loop = asyncio.get_running_loop()
+    with _lock:
+        clients = _async_clients.get(loop)
+        if clients is None:
+            clients = _async_clients[loop] = {}
+            # asyncio.run() closes async generators before closing the loop,
+            # which is our chance to close the clients' sessions on it
+            closer = clients["_closer"] = _close_at_shutdown(clients)
+            loop.create_task(closer.__anext__())
+        return clients
+
+
+async def _close_at_shutdown(clients):
+    try:
+        yield
+    finally:
+        for name, client in list(clients.items()):
+            if name != "_closer":
+                await client.close()
+
+
+def get_async_openai_client(endpoint, key, api_version):
+    """AsyncAzureOpenAI shared by every coroutine on the running loop."""
+    clients = _loop_clients()
+    cache_key = ("openai", endpoint, key, api_version)
+    client = clients.get(cache_key)
+    if client is None:
+        http_client = DefaultAsyncHttpxClient(limits=httpx.Limits(
+            max_connections=POOL_SIZE, max_keepalive_connections=POOL_SIZE,
+            keepalive_expiry=KEEPALIVE_SECONDS,
+        ), event_hooks=telemetry.httpx_event_hooks(async_client=True))
+        client = clients[cache_key] = AsyncAzureOpenAI(
+            azure_endpoint=endpoint, api_key=key, api_version=api_version, http_client=http_client,
+        )
+    return client
+
+
+def get_async_search_client(endpoint, index_name, key):
+    """azure.search.documents.aio.SearchClient shared on the running loop."""
+    clients = _loop_clients()
+    cache_key = ("search", endpoint, index_name, key)
+    client = clients.get(cache_key)
+    if client is None:
+        client = clients[cache_key] = AsyncSearchClient(endpoint, index_name, AzureKeyCredential(key),
+                                                        per_call_policies=telemetry.search_policies())
+    return client
+
+
+# -----------------------------
+# Helpers for the `ally` CustomConnection
+# -----------------------------
+def connection_setting(connection, name, default=None):
+    """Setting `name` of a connection: its configs (under the `ally`
+    connection's names, e.g. search_document_index), else the ALLY_<NAME>
+    environment variable, else `default`."""
+    configs = getattr(connection, "configs", None) or {}
+    return configs.get(name) or os.environ.get(f"ALLY_{name.upper()}") or default
+
+
+def openai_client(ally):
+    return get_openai_client(ally.openai_endpoint, ally.openai_key, ally.openai_api_version)
+
+
+def search_client(ally, index_name):
+    return get_search_client(ally.search_endpoint, index_name, ally.search_key)
+
+
+def async_openai_client(ally):
+    return get_async_openai_client(ally.openai_endpoint, ally.openai_key, ally.openai_api_version)
+
+
+def async_search_client(ally, index_name):
+    return get_async_search_client(ally.search_endpoint, index_name, ally.search_key)
+
+
+def prewarm(ally):
+    """Open a pooled connection to every endpoint the flow uses, so the first
+    request a worker serves does not pay for DNS, TCP and TLS setup.
+    Any HTTP response counts, even an error status: the connection is open.
+    Connection failures are reported and otherwise ignored."""
+    warmed = []
+    for index_name in (ally.search_document_index, ally.search_policy_index):
+        try:
+            search_client(ally, index_name).get_document_count()
+            warmed.append(index_name)
+        except HttpResponseError:
+            warmed.append(index_name)
+        except Exception as e:
+            print(f"Pre-warming search index '{index_name}' failed: {e}")
+    try:
+        openai_client(ally).models.list()
+        warmed.append("openai")
+    except APIStatusError:
+        warmed.append("openai")
+    except Exception as e:
+        print(f"Pre-warming Azure OpenAI failed: {e}")
+    print(f"Pre-warmed connections: {', '.join(warmed) or 'none'}")
+    return warmed
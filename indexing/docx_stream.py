@@ -0,0 +1,210 @@
+import os
+import zipfile
+import xml.etree.ElementTree as ElementTree
+from collections import namedtuple
+
+from token_count import count_tokens
+from clause_chunker import iter_chunks
+
+# -----------------------------
+# Streaming .docx reader
+# -----------------------------
+# python-docx parses the whole of word/document.xml into a tree before the
+# first paragraph can be read, and keeps it (several times the size of the
+# file) for as long as the Document lives. Here the XML is read from the
+# archive with iterparse: a paragraph is yielded as soon as its closing tag
+# has been read, and everything parsed before it is dropped, so memory stays
+# flat however long the agreement is and the caller can embed or upload the
+# first clauses while the rest is still being read. Only numbering.xml and
+# styles.xml, which do not grow with the text, are parsed whole.
+W = "{http://schemas.openxmlformats.org/wordprocessingml/2006/main}"
+DOCUMENT_PART = "word/document.xml"
+NUMBERING_PART = "word/numbering.xml"
+STYLES_PART = "word/styles.xml"
+
+# Run content python-docx reads as text (Paragraph.text), so paragraphs read
+# here hash the same for the index manifest
+RUN_TEXT = {W + "tab": "\t", W + "ptab": "\t", W + "cr": "\n", W + "noBreakHyphen": "-"}
+
+# One body paragraph. `style` is the paragraph's style id ("Heading1"),
+# `marker` the list number Word shows before it ("4.\t", "(a)\t"), if any
+DocxParagraph = namedtuple("DocxParagraph", ["index", "style", "marker", "text"])
+
+ROMAN = [(1000, "m"), (900, "cm"), (500, "d"), (400, "cd"), (100, "c"), (90, "xc"),
+         (50, "l"), (40, "xl"), (10, "x"), (9, "ix"), (5, "v"), (4, "iv"), (1, "i")]
+
+
+def roman(number):
+    text = ""
+    for value, numeral in ROMAN:
+        while number >= value:
+            text, number = text + numeral, number - value
+    return text
+
+
+def letters(number):
+    # 1 -> a, 26 -> z, 27 -> aa, as Word counts
+    return chr(ord("a") + (number - 1) % 26) * ((number - 1) // 26 + 1)
+
+
+FORMATS = {
+    "decimal": str,
+    "lowerLetter": letters,
+    "upperLetter": lambda number: letters(number).upper(),
+    "lowerRoman": roman,
+    "upperRoman": lambda number: roman(number).upper(),
+}
+
+
+def value(element, path, default=None):
+    found = element.find(path)
+    return found.get(W + "val", default) if found is not None else default
+
+
+def num_properties(properties):
+    """(numId, ilvl) of a w:pPr, with None for what it does not set."""
+    numbering = properties.find(W + "numPr") if properties is not None else None
+    if numbering is None:
+        return None, None
+    ilvl = value(numbering, W + "ilvl")
+    return value(numbering, W + "numId"), int(ilvl) if ilvl is not None else None
+
+
+class Numbering:
+    """List numbers of a document: the levels of its numbering.xml and the
+    numbering its paragraph styles apply, with one set of counters per list."""
+
+    def __init__(self, archive):
+        names = set(archive.namelist())
+        self.levels = {}  # numId -> {ilvl: (start, format, text, suffix)}
+        self.styles = {}  # style id -> (numId, ilvl)
+        if NUMBERING_PART in names:
+            self._read_numbering(ElementTree.fromstring(archive.read(NUMBERING_PART)))
+        if STYLES_PART in names:
+            self._read_styles(ElementTree.fromstring(archive.read(STYLES_PART)))
+        self.counters = {}
+
+    def _read_numbering(self, root):
+        abstract = {}
+        for definition in root.iter(W + "abstractNum"):
+            abstract[definition.get(W + "abstractNumId")] = {
+                int(level.get(W + "ilvl")): (int(value(level, W + "start", "1")), value(level, W + "numFmt", "decimal"),
+                                             value(level, W + "lvlText", ""), value(level, W + "suff", "tab"))
+                for level in definition.iter(W + "lvl")
+            }
+        for num in root.iter(W + "num"):
+            levels = dict(abstract.get(value(num, W + "abstractNumId"), {}))
+            for override in num.iter(W + "lvlOverride"):
+                ilvl, start = int(override.get(W + "ilvl")), value(override, W + "startOverride")
+                if start is not None and ilvl in levels:
+                    levels[ilvl] = (int(start),) + levels[ilvl][1:]
+            self.levels[num.get(W + "numId")] = levels
+
+    def _read_styles(self, root):
+        styles = {}
+        for style in root.iter(W + "style"):
+            num_id, ilvl = num_properties(style.find(W + "pPr"))
+            styles[style.get(W + "styleId")] = (value(style, W + "basedOn"), num_id, ilvl)
+        for style_id in styles:
+            # A style's numbering may come from the style it is based on
+            seen, current = set(), style_id
+            while current in styles and current not in seen:
+                seen.add(current)
+                based_on, num_id, ilvl = styles[current]
+                if num_id is not None:
+                    self.styles[style_id] = (num_id, ilvl or 0)
+                    break
+                current = based_on
+
+    def marker(self, style, num_id, ilvl):
+        """The number Word shows before a paragraph, counting it; "" for a
+        paragraph that is not in a list (numId 0 switches a style's off)."""
+        if num_id is None and style in self.styles:
+            num_id, style_ilvl = self.styles[style]
+            ilvl = style_ilvl if ilvl is None else ilvl
+        levels = self.levels.get(num_id)
+        ilvl = ilvl or 0
+        if not levels or ilvl not in levels:
+            return ""
+        counters = self.counters.setdefault(num_id, {})
+        counters[ilvl] = counters.get(ilvl, levels[ilvl][0] - 1) + 1
+        for deeper in [level for level in counters if level > ilvl]:
+            del counters[deeper]
+        start, number_format, text, suffix = levels[ilvl]
+        if number_format == "none":
+            return ""
+        for level in range(ilvl, -1, -1):
+            if f"%{level + 1}" in text:
+                count = counters.get(level, levels.get(level, (1,))[0])
+                text = text.replace(f"%{level + 1}", FORMATS.get(levels.get(level, levels[ilvl])[1], str)(count))
+        if number_format == "bullet" or not text:
+            return ""
+        return text + {"tab": "\t", "space": " "}.get(suffix, "")
+
+
+def paragraph_text(paragraph):
+    # Runs directly in the paragraph or in a hyperlink, as python-docx reads them
+    parts = []
+    for child in paragraph:
+        runs = [child] if child.tag == W + "r" else child.findall(W + "r") if child.tag == W + "hyperlink" else []
+        for run in runs:
+            for item in run:
+                if item.tag == W + "t":
+                    parts.append(item.text or "")
+                elif item.tag == W + "br":
+                    parts.append("\n" if item.get(W + "type", "textWrapping") == "textWrapping" else "")
+                else:
+                    parts.append(RUN_TEXT.get(item.tag, ""))
+    return "".join(parts)
+
+
+def iter_paragraphs(path):
+    """Yield a DocxParagraph for every paragraph of the document body, in
+    order, as python-docx's Document.paragraphs lists them (tables and
+    content controls are skipped), while the file is being read."""
+    with zipfile.ZipFile(path) as archive:
+        numbering = Numbering(archive)
+        with archive.open(DOCUMENT_PART) as part:
+            stack = []
+            index = 0
+            for event, element in ElementTree.iterparse(part, events=("start", "end")):
+                if event == "start":
+                    stack.append(element)
+                    continue
+                stack.pop()
+                if element.tag == W + "p" and stack and stack[-1].tag == W + "body":
+                    properties = element.find(W + "pPr")
+                    style = value(properties, W + "pStyle") if properties is not None else None
+                    num_id, ilvl = num_properties(properties)
+                    yield DocxParagraph(index, style, numbering.marker(style, num_id, ilvl), paragraph_text(element))
+                    index += 1
+                if len(stack) == 2 and stack[-1].tag == W + "body":
+                    # A paragraph or table of the body is done with
+                    stack[-1].clear()
+
+
+def read_paragraph_texts(path):
+    """The stripped, non-empty paragraph texts of a .docx, as the indexing
+    scripts store them."""
+    return [paragraph.text.strip() for paragraph in iter_paragraphs(path) if paragraph.text.strip()]
+
+
+def iter_lines(path):
+    # The body text as Word gives it to the add-in: list numbers written out
+    for paragraph in iter_paragraphs(path):
+        yield from (paragraph.marker + paragraph.text).splitlines()
+
+
+def iter_clauses(path, max_tokens=None, min_tokens=None):
+    """Yield the clause chunks of a .docx ({"id", "title", "paragraph"}, see
+    clause_chunker.iter_chunks) while it is being read, each with its
+    "tokens" and the running "total_tokens" of the document so far."""
+    total = 0
+    for chunk in iter_chunks(iter_lines(path), max_tokens, min_tokens):
+        tokens = count_tokens(chunk["paragraph"])
+        total += tokens
+        yield dict(chunk, tokens=tokens, total_tokens=total)
+
+
+def is_docx(filename):
+    return os.path.splitext(filename)[1].lower() == ".docx"
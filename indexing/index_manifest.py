@@ -0,0 +1,119 @@
+import hashlib
+import json
+import os
+from collections import namedtuple
+
+from bulk_uploader import DELETE, MERGE
+
+
+# -----------------------------
+# Deterministic document keys
+# -----------------------------
+def content_hash(text):
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def document_key(filename, paragraph_hash, occurrence=0):
+    """Index key for a paragraph: same file + same text -> same key.
+
+    Azure AI Search keys may only contain letters, digits, '_', '-' and '=',
+    so the filename is hashed too. A paragraph repeated verbatim in one file
+    gets an occurrence suffix to keep the keys distinct.
+    """
+    key = f"{content_hash(filename)[:16]}-{paragraph_hash[:40]}"
+    return f"{key}-{occurrence}" if occurrence else key
+
+
+# What to do with one file's paragraphs on this run:
+#   entries   - key -> {"hash", "ParagraphId"} for every paragraph now in the file
+#   new       - (key, ParagraphId, text) that need GPT metadata and an embedding
+#   moved     - (key, ParagraphId) whose text is indexed but whose position changed
+#   unchanged - number of paragraphs that need no call at all
+#   removed   - keys that are indexed but no longer in the file
+DocumentPlan = namedtuple("DocumentPlan", ["entries", "new", "moved", "unchanged", "removed"])
+
+
+class IndexManifest:
+    """Local record of which paragraphs are in the index.
+
+    The manifest is a JSON file mapping each filename to the keys indexed for
+    it, with the content hash and ParagraphId each key was indexed with. It
+    lets a re-run touch only paragraphs that were added, edited, moved or
+    removed since the last run. With `full`, every paragraph now in a file is
+    planned as new (re-indexed), while keys recorded before are still
+    planned for removal when their paragraph is gone.
+    """
+
+    def __init__(self, path, index_name, full=False):
+        self.path = path
+        self.index_name = index_name
+        self.full = full
+        self.files = {}
+        self._previous = {}
+        if os.path.exists(path):
+            with open(path, encoding="utf-8") as f:
+                data = json.load(f)
+            if data.get("index") == index_name:
+                self.files = data.get("files", {})
+            else:
+                print(f"⚠️ Manifest {path} belongs to index '{data.get('index')}', ignoring it")
+
+    def plan(self, filename, paragraphs):
+        indexed = self.files.get(filename, {})
+        entries, new, moved = {}, [], []
+        occurrences = {}
+        for paragraph_id, text in enumerate(paragraphs, start=1):
+            paragraph_hash = content_hash(text)
+            occurrence = occurrences.get(paragraph_hash, 0)
+            occurrences[paragraph_hash] = occurrence + 1
+            key = document_key(filename, paragraph_hash, occurrence)
+            entries[key] = {"hash": paragraph_hash, "ParagraphId": paragraph_id}
+            if key not in indexed or self.full:
+                new.append((key, paragraph_id, text))
+            elif indexed[key]["ParagraphId"] != paragraph_id:
+                moved.append((key, paragraph_id))
+        removed = [key for key in indexed if key not in entries]
+        unchanged = len(entries) - len(new) - len(moved)
+        return DocumentPlan(entries, new, moved, unchanged, removed)
+
+    def commit(self, filename, plan, indexed_keys):
+        """Record the file as planned, minus new paragraphs that were not
+        indexed (a paragraph re-indexed by a full run keeps its earlier
+        entry, as its earlier document is still in the index)."""
+        indexed_keys = set(indexed_keys)
+        skipped = {key for key, _, _ in plan.new if key not in indexed_keys}
+        previous = self.files.get(filename, {})
+        replaced = [key for key, _, _ in plan.new if key in previous]
+        for key in plan.removed + [key for key, _ in plan.moved] + replaced:
+            self._previous[key] = (filename, previous[key])
+        self.files[filename] = {key: previous[key] if key in skipped else entry
+                                for key, entry in plan.entries.items() if key not in skipped or key in previous}
+
+    def removed_files(self, filenames):
+        """Files in the manifest that are no longer present, with their keys."""
+        present = set(filenames)
+        return {filename: list(keys) for filename, keys in self.files.items() if filename not in present}
+
+    def drop_file(self, filename):
+        for key, entry in self.files.pop(filename, {}).items():
+            self._previous[key] = (filename, entry)
+
+    def discard_failed(self, failed):
+        """Undo manifest changes for actions the uploader could not apply,
+        so the next run tries them again."""
+        for (action, document), _ in failed:
+            key = document["id"]
+            if action in (DELETE, MERGE) or key in self._previous:
+                # Put back what is still in the index
+                filename, entry = self._previous[key]
+                self.files.setdefault(filename, {})[key] = entry
+                continue
+            for entries in self.files.values():
+                entries.pop(key, None)
+
+    def save(self):
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"index": self.index_name, "files": self.files}, f, indent=2)
+        os.replace(tmp_path, self.path)
+        self._previous = {}
@@ -0,0 +1,100 @@
+import re
+
+# -----------------------------
+# Offline English/German identification
+# -----------------------------
+# Policies are indexed as either 'English' or 'German', so telling the two
+# apart is all the search needs. Function words and German-only letters
+# settle that for almost any sentence; an LLM is only worth asking when the
+# text has evidence for both and neither clearly wins.
+ENGLISH = "English"
+GERMAN = "German"
+
+# Function words that are frequent in one language and rare or absent in
+# the other. Words shared by both ("in", "an", "so", "was", "die", "will")
+# are left out, and so is subject vocabulary, which would only fit the
+# documents the lists were tried on.
+ENGLISH_WORDS = frozenset("""
+the of and to is are be been being by for from with that this these those
+which who whom whose shall must may not or any all other such each its it
+their they them he she his her we our you your at on as if than then there
+where when would should could has have had do does did no nor upon into
+under over between within without before after during against about
+whether unless until both either neither because while
+""".split())
+
+GERMAN_WORDS = frozenset("""
+der den dem des das ein eine einer einem eines und ist sind sein wird werden
+wurde wurden nicht oder auch auf aus bei mit nach von vor zu zum zur für über
+unter gegen ohne durch dass daß sich sie er es wir ihr ihre ihren ihrem ihres
+sein seine seiner seinem dieser diese dieses diesem diesen jeder jede jedes
+alle allen kein keine keiner wenn als wie noch nur soll sollen muss müssen
+kann können darf dürfen hat haben hatte innerhalb gemäß sowie bzw im bis
+zwischen während jedoch ob sofern soweit
+""".split())
+
+GERMAN_LETTERS = frozenset("äöüß")
+
+# Endings that are common in German words and rare in English ones ("ern"
+# and "chen" are not: govern, pattern, kitchen)
+GERMAN_SUFFIXES = ("ung", "keit", "heit", "lich", "schaft", "igt")
+
+# Below this margin between the languages the caller's fallback decides.
+# Text with signals for one language only is taken as that language, however
+# short, and text with none at all (a heading, a name, a number) as English,
+# which is what the search uses for anything but German.
+MIN_CONFIDENCE = 0.6
+
+_WORD = re.compile(r"[^\W\d_]+", re.UNICODE)
+
+
+def score_language(text):
+    """Return (language, confidence, evidence) for `text`.
+
+    confidence is the margin between the two languages' scores, from 0 (a tie)
+    to 1 (every signal points the same way); evidence is how many signals were
+    seen in total.
+    """
+    english = german = 0.0
+    for word in _WORD.findall(text.lower()):
+        if word in ENGLISH_WORDS:
+            english += 1
+        elif word in GERMAN_WORDS:
+            german += 1
+        elif GERMAN_LETTERS.intersection(word):
+            german += 1
+        elif len(word) > 5 and word.endswith(GERMAN_SUFFIXES):
+            german += 0.5
+
+    evidence = english + german
+    if not evidence:
+        return ENGLISH, 0.0, 0
+    language = GERMAN if german > english else ENGLISH
+    return language, abs(german - english) / evidence, evidence
+
+
+def is_ambiguous(confidence, evidence, min_confidence=MIN_CONFIDENCE):
+    """Whether score_language found signals for both languages, with
+    neither ahead by `min_confidence`."""
+    return bool(evidence) and confidence < min_confidence
+
+
+def detect_language(text, fallback=None, min_confidence=MIN_CONFIDENCE):
+    """'English' or 'German' for `text`.
+
+    When the local guess is ambiguous, `fallback(text)` is called (e.g. an
+    LLM request) and its answer is used instead. Without a fallback the
+    local guess is returned as is.
+    """
+    language, confidence, evidence = score_language(text)
+    if fallback is not None and is_ambiguous(confidence, evidence, min_confidence):
+        return fallback(text)
+    return language
+
+
+async def detect_language_async(text, fallback=None, min_confidence=MIN_CONFIDENCE):
+    """detect_language for async tools; `fallback` is a coroutine function."""
+    language, confidence, evidence = score_language(text)
+    if fallback is not None and is_ambiguous(confidence, evidence, min_confidence):
+        return await fallback(text)
+    return language
@@ -0,0 +1,218 @@
+import json
+import math
+import os
+import re
+import threading
+from collections import Counter
+
+import numpy as np
+
+# -----------------------------
+# In-process BM25 and vector scoring
+# -----------------------------
+# The ranking Azure AI Search gives a hybrid query, over records held in
+# memory: LocalIndex serves ALLY_SEARCH_BACKEND=local (search_backend) and
+# the policy catalog's search.
+
+# Searchable fields of the two indexes
+DOCUMENT_TEXT_FIELDS = ("title", "paragraph", "keyphrases", "summary")
+POLICY_TEXT_FIELDS = ("title", "instruction", "tags")
+
+# Azure AI Search's BM25 defaults, how many keyword hits it fuses with the
+# vector hits in a hybrid query (also the page a query returns without
+# `top`), and the constant of its reciprocal rank fusion
+BM25_K1 = 1.2
+BM25_B = 0.75
+KEYWORD_CANDIDATES = 50
+RRF_K = 60
+
+# English and German function words (Lucene's stop word lists), left out of
+# the policy catalog's keyword matching: a policy should not match a query
+# just because both contain "the" or "der"
+STOPWORDS = frozenset("""
+a an and are as at be but by for if in into is it no not of on or such that the their then there these
+they this to was will with
+aber als am an auch auf aus bei bin bis da damit das dass der den des dem die doch dort du ein eine
+einem einen einer eines er es für hat hatte ich ihr im in ist ja kein mit nach nicht noch nun oder sich
+sie sind so über um und uns von vor wenn wie wir wird zu zum zur
+""".split())
+
+_WORD = re.compile(r"\w+", re.UNICODE)
+
+
+def _tokens(value, stopwords=frozenset()):
+    if isinstance(value, (list, tuple)):
+        value = " ".join(str(item) for item in value)
+    return [term for term in _WORD.findall(str(value or "").lower()) if term not in stopwords]
+
+
+def _as_set(value):
+    if isinstance(value, (list, tuple, set, frozenset)):
+        return {str(item) for item in value}
+    return {str(value)}
+
+
+# -----------------------------
+# In-process index
+# -----------------------------
+class LocalIndex:
+    """The records of one index, held in memory.
+
+    Embeddings are kept as a row-normalised float32 matrix, so a vector query
+    is one matrix-vector product over the rows that pass the filters, and the
+    `text_fields` are indexed for BM25 scoring, without the `stopwords`.
+    """
+
+    def __init__(self, records, text_fields=DOCUMENT_TEXT_FIELDS, name="local", stopwords=frozenset()):
+        self.name = name
+        self.stopwords = stopwords
+        self.records = list(records)
+        count = len(self.records)
+
+        dimensions = max((len(record.get("embedding") or ()) for record in self.records), default=0)
+        self.vectors = np.zeros((count, dimensions), dtype=np.float32)
+        for i, record in enumerate(self.records):
+            if record.get("embedding"):
+                self.vectors[i] = record["embedding"]
+        norms = np.linalg.norm(self.vectors, axis=1)
+        self.has_vector = norms > 0
+        self.vectors[self.has_vector] /= norms[self.has_vector, None]
+
+        postings = {}
+        lengths = np.zeros(count, dtype=np.float32)
+        for i, record in enumerate(self.records):
+            terms = Counter(term for field in text_fields for term in _tokens(record.get(field), stopwords))
+            lengths[i] = sum(terms.values())
+            for term, frequency in terms.items():
+                postings.setdefault(term, []).append((i, frequency))
+        self._postings = {
+            term: (np.array([i for i, _ in hits], dtype=np.intp), np.array([f for _, f in hits], dtype=np.float32))
+            for term, hits in postings.items()
+        }
+        self._lengths = lengths
+        self._average_length = float(lengths.mean()) if count and lengths.any() else 1.0
+        # field -> {value: rows}, built the first time a field is filtered on
+        self._value_rows = {}
+        self._value_lock = threading.Lock()
+
+    @classmethod
+    def from_file(cls, path, text_fields=DOCUMENT_TEXT_FIELDS):
+        if not os.path.exists(path):
+            print(f"Local search data '{path}' not found, serving an empty index")
+            return cls([], text_fields, name=path)
+        with open(path, encoding="utf-8") as f:
+            return cls(json.load(f), text_fields, name=path)
+
+    def __len__(self):
+        return len(self.records)
+
+    # -----------------------------
+    # Scoring
+    # -----------------------------
+    def mask(self, filters=None):
+        """Boolean row mask for `eq` (scalar) and `search.in` (list) filters."""
+        mask = np.ones(len(self.records), dtype=bool)
+        for field, value in (filters or {}).items():
+            value_rows = self._rows_by_value(field)
+            field_mask = np.zeros(len(self.records), dtype=bool)
+            for allowed in _as_set(value):
+                field_mask[value_rows.get(allowed, [])] = True
+            mask &= field_mask
+        return mask
+
+    def _rows_by_value(self, field):
+        with self._value_lock:
+            value_rows = self._value_rows.get(field)
+            if value_rows is None:
+                rows = {}
+                for i, record in enumerate(self.records):
+                    rows.setdefault(str(record.get(field)), []).append(i)
+                value_rows = self._value_rows[field] = {value: np.array(r, dtype=np.intp) for value, r in rows.items()}
+            return value_rows
+
+    def bm25_scores(self, text):
+        scores = np.zeros(len(self.records), dtype=np.float32)
+        count = len(self.records)
+        for term in set(_tokens(text, self.stopwords)):
+            posting = self._postings.get(term)
+            if posting is None:
+                continue
+            rows, frequencies = posting
+            idf = math.log(1 + (count - len(rows) + 0.5) / (len(rows) + 0.5))
+            norm = frequencies + BM25_K1 * (1 - BM25_B + BM25_B * self._lengths[rows] / self._average_length)
+            scores[rows] += idf * frequencies * (BM25_K1 + 1) / norm
+        return scores
+
+    def cosine_scores(self, vector, rows):
+        """Cosine similarity of `vector` to the embeddings of `rows`."""
+        query = np.asarray(vector, dtype=np.float32)
+        norm = np.linalg.norm(query)
+        if not norm or query.shape[0] != self.vectors.shape[1]:
+            return np.zeros(len(rows), dtype=np.float32)
+        return self.vectors[rows] @ (query / norm)
+
+    # -----------------------------
+    # Queries
+    # -----------------------------
+    def search(self, text=None, vector=None, filters=None, top=50, k_nearest_neighbors=50, select=None):
+        """Hybrid query the way Azure AI Search runs one.
+
+        Up to KEYWORD_CANDIDATES BM25 matches of `text` and the
+        `k_nearest_neighbors` closest embeddings to `vector` (brute force)
+        are fused by reciprocal rank. Without either, this is a filtered scan.
+        """
+        if not (text and text != "*") and (vector is None or not len(vector)):
+            return self.scan(filters, select=select, top=top)
+        return [dict(self._project(i, select), **{"@search.score": score})
+                for i, score in self.rank(text, vector, filters, top, k_nearest_neighbors)]
+
+    def rank(self, text=None, vector=None, filters=None, top=50, k_nearest_neighbors=50):
+        """(row, fused score) of the best `top` records for `search`, best first."""
+        mask = self.mask(filters)
+        rankings = []
+        if text and text != "*":
+            scores = self.bm25_scores(text)
+            rows = np.flatnonzero(mask & (scores > 0))
+            rankings.append(_top(rows, scores[rows], KEYWORD_CANDIDATES))
+        if vector is not None and len(vector):
+            # Only the rows that pass the filters are scored
+            rows = np.flatnonzero(mask & self.has_vector)
+            rankings.append(_top(rows, self.cosine_scores(vector, rows), k_nearest_neighbors))
+
+        fused = {}
+        for ranking in rankings:
+            for rank, i in enumerate(ranking, start=1):
+                fused[i] = fused.get(i, 0.0) + 1.0 / (RRF_K + rank)
+        return [(i, fused[i]) for i in sorted(fused, key=fused.get, reverse=True)[:top]]
+
+    def scan(self, filters=None, select=None, order_by=None, top=None):
+        """Every record passing `filters`, optionally sorted on one field
+        (nulls first, as Azure sorts them)."""
+        rows = np.flatnonzero(self.mask(filters)).tolist()
+        if order_by:
+            field = order_by.split()[0]
+            descending = order_by.lower().endswith(" desc")
+            rows.sort(key=lambda i: (self.records[i].get(field) is not None, self.records[i].get(field)),
+                      reverse=descending)
+        if top is not None:
+            rows = rows[:top]
+        return [self._project(i, select) for i in rows]
+
+    def count(self, filters=None):
+        return int(self.mask(filters).sum())
+
+    def _project(self, i, select):
+        record = self.records[i]
+        if not select or select == "*":
+            return dict(record)
+        return {field: record.get(field) for field in select}
+
+
+def _top(rows, scores, k):
+    """The `k` of `rows` with the highest `scores` (aligned with rows), best first."""
+    if k <= 0:
+        return []
+    if len(rows) > k:
+        best = np.argpartition(-scores, k - 1)[:k]
+        rows, scores = rows[best], scores[best]
+    return rows[np.argsort(-scores, kind="stable")].tolist()
@@ -0,0 +1,218 @@
+import os
+import threading
+import time
+
+import numpy as np
+
+from clients import get_index_client, get_search_client
+from local_index import KEYWORD_CANDIDATES, POLICY_TEXT_FIELDS, STOPWORDS, LocalIndex
+
+# -----------------------------
+# Configuration
+# -----------------------------
+# Policies change a few times a week, so each worker keeps the whole
+# `legal-instructions` index in memory. It is reloaded after CATALOG_TTL
+# seconds at the latest, or sooner when the index statistics (document count
+# and storage size) checked every VERSION_CHECK_INTERVAL seconds change.
+CATALOG_TTL = float(os.environ.get("ALLY_POLICY_CATALOG_TTL", "900"))
+VERSION_CHECK_INTERVAL = float(os.environ.get("ALLY_POLICY_CATALOG_CHECK_INTERVAL", "30"))
+
+POLICY_FIELDS = ["id", "PolicyId", "title", "instruction", "tags", "severity", "language", "groups", "embedding"]
+
+class PolicyCatalog:
+    """Every policy of one index, loaded once and shared by the flow nodes.
+
+    `policies()` returns plain dicts with the fields in POLICY_FIELDS. If a
+    refresh fails the previous copy keeps being served; only the first load
+    raises.
+    """
+
+    def __init__(self, endpoint, index_name, key, ttl=CATALOG_TTL, check_interval=VERSION_CHECK_INTERVAL):
+        self.endpoint = endpoint
+        self.index_name = index_name
+        self.key = key
+        self.ttl = ttl
+        self.check_interval = check_interval
+        # _lock guards the snapshot below and is only held to read or swap
+        # it; _refresh_lock lets one thread at a time read the index
+        self._lock = threading.Lock()
+        self._refresh_lock = threading.Lock()
+        self._policies = None
+        self._by_id = {}
+        self._matrices = {}
+        self._index = None
+        self._version = None
+        self._loaded_at = 0.0
+        self._checked_at = 0.0
+
+    # -----------------------------
+    # Lookups
+    # -----------------------------
+    def policies(self, language=None):
+        policies = self._current()
+        if language is None:
+            return list(policies)
+        return [policy for policy in policies if policy.get("language") == language]
+
+    def get(self, policy_id):
+        self._current()
+        return self._by_id.get(str(policy_id))
+
+    def get_many(self, policy_ids):
+        self._current()
+        return {policy_id: self._by_id.get(str(policy_id)) for policy_id in policy_ids}
+
+    def search(self, query, vector, language=None, k_nearest_neighbors=1, top=KEYWORD_CANDIDATES):
+        """Rank policies the way the hybrid index query did.
+
+        BM25 matches of `query` in the searchable fields (stop words left
+        out) and the `k_nearest_neighbors` closest embeddings, fused by
+        reciprocal rank and cut at `top`, the page the index query returned.
+        """
+        index = self.local_index()
+        filters = {"language": language} if language is not None else None
+        return [index.records[i] for i, _ in index.rank(query, vector, filters, top, k_nearest_neighbors)]
+
+    def local_index(self):
+        """The catalog as a LocalIndex for keyword and vector ranking, built
+        once per reload."""
+        self._current()
+        with self._lock:
+            policies, index = self._policies, self._index
+        if index is None:
+            index = LocalIndex(policies, POLICY_TEXT_FIELDS, name=self.index_name, stopwords=STOPWORDS)
+            with self._lock:
+                if self._policies is policies:
+                    self._index = index
+        return index
+
+    def embedding_matrix(self, language=None):
+        """(policies, matrix): the policies of `language` that have an
+        embedding, and their embeddings scaled to unit length as the rows of
+        a float32 matrix. Built once per reload, so scoring a request is a
+        single matrix product."""
+        self._current()
+        with self._lock:
+            policies, matrices = self._policies, self._matrices
+            found = matrices.get(language)
+        if found is None:
+            rows = [policy for policy in policies if policy.get("embedding")
+                    and (language is None or policy.get("language") == language)]
+            matrix = np.asarray([policy["embedding"] for policy in rows], dtype=np.float32).reshape(len(rows), -1)
+            norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+            found = (rows, matrix / np.where(norms, norms, 1.0))
+            with self._lock:
+                # Two threads may both build it; either copy is the same
+                found = matrices.setdefault(language, found)
+        return found
+
+    # -----------------------------
+    # Refresh
+    # -----------------------------
+    def version(self):
+        """Token of the policies currently served; changes on every reload
+        that found a different index."""
+        self._current()
+        return self._version
+
+    def invalidate(self):
+        with self._lock:
+            self._loaded_at = 0.0
+
+    def _current(self):
+        now = time.monotonic()
+        with self._lock:
+            policies = self._policies
+            fresh = now - self._loaded_at <= self.ttl and now - self._checked_at <= self.check_interval
+            if policies is not None and fresh:
+                return policies
+        # The index is read without holding _lock, so the other threads keep
+        # being served the current copy meanwhile. Only the first load waits
+        # for a refresh another thread has started.
+        if policies is None:
+            with self._refresh_lock:
+                self._refresh()
+        elif self._refresh_lock.acquire(blocking=False):
+            try:
+                self._refresh()
+            finally:
+                self._refresh_lock.release()
+        with self._lock:
+            return self._policies
+
+    def _refresh(self):
+        now = time.monotonic()
+        with self._lock:
+            # Another thread may have refreshed while this one waited
+            expired = self._policies is None or now - self._loaded_at > self.ttl
+            if not expired and now - self._checked_at <= self.check_interval:
+                return
+            self._checked_at = now
+            version = self._version
+        if not expired:
+            try:
+                changed = self._read_version() != version
+            except Exception as e:
+                print(f"Policy catalog version check failed, keeping cached copy. Error: {e}")
+                changed = False
+            if not changed:
+                return
+        self._reload(now)
+
+    def _reload(self, now):
+        try:
+            version = self._read_version()
+            policies = self._load_policies()
+        except Exception as e:
+            if self._policies is None:
+                raise
+            print(f"Policy catalog refresh failed, keeping cached copy. Error: {e}")
+            with self._lock:
+                # Try again after the next check interval rather than on every call
+                self._loaded_at = now - self.ttl + self.check_interval
+                self._checked_at = now
+            return
+        by_id = {str(policy["PolicyId"]): policy for policy in policies if policy.get("PolicyId") is not None}
+        with self._lock:
+            self._policies = policies
+            self._by_id = by_id
+            self._matrices = {}
+            self._index = None
+            self._version = version
+            self._loaded_at = self._checked_at = now
+        print(f"Policy catalog '{self.index_name}' loaded: {len(policies)} policies")
+
+    # The two calls that reach the index; a catalog over another store
+    # (see search_backend.LocalPolicyCatalog) overrides just these
+    def _load_policies(self):
+        search_client = get_search_client(self.endpoint, self.index_name, self.key)
+        return [
+            {field: result.get(field) for field in POLICY_FIELDS}
+            for result in search_client.search(search_text="*", select=",".join(POLICY_FIELDS))
+        ]
+
+    def _read_version(self):
+        return index_version(self.endpoint, self.index_name, self.key)
+
+
+def index_version(endpoint, index_name, key):
+    """Document count and storage size of an index, which change whenever
+    documents are added, replaced or removed."""
+    stats = get_index_client(endpoint, key).get_index_statistics(index_name)
+    # Older SDKs return a dict, newer ones a model
+    if isinstance(stats, dict):
+        return stats.get("document_count"), stats.get("storage_size")
+    return stats.document_count, stats.storage_size
+
+
+_catalogs = {}
+_catalogs_lock = threading.Lock()
+
+
+def get_policy_catalog(endpoint, index_name, key):
+    """Per-process catalog for one search index."""
+    with _catalogs_lock:
+        catalog = _catalogs.get((endpoint, index_name))
+        if catalog is None:
+            catalog = _catalogs[(endpoint, index_name)] = PolicyCatalog(endpoint, index_name, key)
+        return catalog
@@ -0,0 +1,427 @@
+import asyncio
+import contextvars
+import functools
+import json
+import os
+import threading
+import time
+from urllib.parse import urlsplit
+
+from azure.core.pipeline.policies import SansIOHTTPPolicy
+
+import streaming
+
+# -----------------------------
+# Configuration
+# -----------------------------
+# Every tool and every Azure OpenAI / AI Search call records its wall time,
+# tokens, search hits and bytes, labelled with the request's query_type and
+# the node that made it. Each gunicorn worker serves its own totals at
+# /metrics in the Prometheus text format (the `pid` label keeps the workers'
+# series apart); a request sent with `X-Ally-Timing: 1` also gets its own
+# breakdown back in a Server-Timing header. ALLY_TELEMETRY=off records nothing.
+ENABLED = os.environ.get("ALLY_TELEMETRY", "on").lower() not in ("0", "off", "false", "no")
+TIMING_HEADER = "X-Ally-Timing"
+
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+
+_PID = str(os.getpid())
+_lock = threading.Lock()
+# (name, labels) -> value, or a [bucket counts..., count, sum] list for histograms
+_counters = {}
+_histograms = {}
+_HELP = {
+    "ally_request_seconds": ("histogram", "Wall time of /score requests"),
+    "ally_node_seconds": ("histogram", "Wall time of flow nodes"),
+    "ally_upstream_seconds": ("histogram", "Wall time of upstream calls made by flow nodes"),
+    "ally_upstream_requests_total": ("counter", "Upstream calls made by flow nodes"),
+    "ally_tokens_total": ("counter", "Azure OpenAI tokens, by kind (prompt/completion)"),
+    "ally_search_hits_total": ("counter", "Documents returned by search calls"),
+    "ally_upstream_request_bytes_total": ("counter", "Bytes sent upstream"),
+    "ally_upstream_response_bytes_total": ("counter", "Bytes received from upstream"),
+    "ally_cache_lookups_total": ("counter", "Cache lookups made by flow nodes, by result"),
+}
+
+# The request (query_type plus its breakdown) and the node currently running.
+# PromptFlow copies the context into the threads and tasks that run nodes.
+_request = contextvars.ContextVar("ally_request", default=None)
+_node = contextvars.ContextVar("ally_node", default="none")
+
+
+# -----------------------------
+# Recording
+# -----------------------------
+class RequestTimings:
+    """Per-request breakdown: wall time per node and per node+upstream."""
+
+    def __init__(self, query_type):
+        self.query_type = "none" if query_type is None else str(query_type)
+        self.started = time.perf_counter()
+        self.entries = {}
+        self._lock = threading.Lock()
+
+    def add(self, name, seconds, **usage):
+        with self._lock:
+            entry = self.entries.setdefault(name, {"seconds": 0.0, "calls": 0})
+            entry["seconds"] += seconds
+            entry["calls"] += 1
+            for key, value in usage.items():
+                if value:
+                    entry[key] = entry.get(key, 0) + value
+
+    def server_timing(self):
+        parts = []
+        with self._lock:
+            for name, entry in self.entries.items():
+                details = [f"{entry['calls']} calls"] + [f"{entry[key]} {key}" for key in
+                                                         ("prompt_tokens", "completion_tokens", "hits") if key in entry]
+                parts.append(f'{name};dur={entry["seconds"] * 1000:.1f};desc="{", ".join(details)}"')
+        parts.append(f"total;dur={(time.perf_counter() - self.started) * 1000:.1f}")
+        return ", ".join(parts)
+
+
+def _labels(**labels):
+    return tuple(sorted(dict(labels, pid=_PID).items()))
+
+
+def _inc(name, value, **labels):
+    key = (name, _labels(**labels))
+    with _lock:
+        _counters[key] = _counters.get(key, 0) + value
+
+
+def _observe(name, seconds, **labels):
+    key = (name, _labels(**labels))
+    with _lock:
+        histogram = _histograms.get(key)
+        if histogram is None:
+            histogram = _histograms[key] = [0] * len(BUCKETS) + [0, 0.0]
+        for i, bound in enumerate(BUCKETS):
+            if seconds <= bound:
+                histogram[i] += 1
+        histogram[-2] += 1
+        histogram[-1] += seconds
+
+
+def _query_type():
+    request = _request.get()
+    return request.query_type if request is not None else "none"
+
+
+def record_upstream(upstream, seconds, status="ok", prompt_tokens=0, completion_tokens=0, hits=None,
+                    request_bytes=0, response_bytes=0):
+    """Record one upstream call made by the node that is currently running."""
+    if not ENABLED:
+        return
+    labels = {"query_type": _query_type(), "node": _node.get(), "upstream": upstream}
+    _observe("ally_upstream_seconds", seconds, **labels)
+    _inc("ally_upstream_requests_total", 1, status=str(status), **labels)
+    if prompt_tokens:
+        _inc("ally_tokens_total", prompt_tokens, kind="prompt", **labels)
+    if completion_tokens:
+        _inc("ally_tokens_total", completion_tokens, kind="completion", **labels)
+    if hits is not None:
+        _inc("ally_search_hits_total", hits, **labels)
+    if request_bytes:
+        _inc("ally_upstream_request_bytes_total", request_bytes, **labels)
+    if response_bytes:
+        _inc("ally_upstream_response_bytes_total", response_bytes, **labels)
+    request = _request.get()
+    if request is not None:
+        request.add(f"{labels['node']}.{upstream}", seconds, prompt_tokens=prompt_tokens,
+                    completion_tokens=completion_tokens, hits=hits)
+
+
+def record_cache(cache, node, result):
+    """Record one lookup in a result cache; `result` is e.g. 'memory',
+    'disk', 'hit' or 'miss'."""
+    if ENABLED:
+        _inc("ally_cache_lookups_total", 1, query_type=_query_type(), cache=cache, node=node, result=result)
+
+
+def _record_node(node, seconds):
+    _observe("ally_node_seconds", seconds, query_type=_query_type(), node=node)
+    request = _request.get()
+    if request is not None:
+        request.add(node, seconds)
+
+
+def instrument(node):
+    """Decorator for a tool function: times it as `node` and attributes the
+    upstream calls it makes to that node. Goes below @tool."""
+    def decorator(fn):
+        if not ENABLED:
+            return fn
+        if asyncio.iscoroutinefunction(fn):
+            @functools.wraps(fn)
+            async def wrapper(*args, **kwargs):
+                token = _node.set(node)
+                start = time.perf_counter()
+                try:
+                    return await fn(*args, **kwargs)
+                finally:
+                    _record_node(node, time.perf_counter() - start)
+                    _node.reset(token)
+        else:
+            @functools.wraps(fn)
+            def wrapper(*args, **kwargs):
+                token = _node.set(node)
+                start = time.perf_counter()
+                try:
+                    return fn(*args, **kwargs)
+                finally:
+                    _record_node(node, time.perf_counter() - start)
+                    _node.reset(token)
+        return wrapper
+    return decorator
+
+
+def begin_request(query_type):
+    """Start the breakdown of one /score request; returns what end_request needs."""
+    timings = RequestTimings(query_type)
+    return timings, _request.set(timings)
+
+
+def end_request(state, status):
+    timings, token = state
+    _request.reset(token)
+    if ENABLED:
+        _observe("ally_request_seconds", time.perf_counter() - timings.started,
+                 query_type=timings.query_type, status=str(status))
+    return timings
+
+
+# -----------------------------
+# Upstream hooks (installed by clients.py)
+# -----------------------------
+def _openai_upstream(url):
+    path = urlsplit(str(url)).path
+    if path.endswith("/chat/completions"):
+        return "openai.chat"
+    if path.endswith("/embeddings"):
+        return "openai.embeddings"
+    return "openai.other"
+
+
+def _openai_usage(content):
+    try:
+        usage = json.loads(content).get("usage") or {}
+    except (ValueError, AttributeError):
+        return 0, 0
+    return usage.get("prompt_tokens") or 0, usage.get("completion_tokens") or 0
+
+
+def _httpx_request(request):
+    request.extensions["ally_started"] = time.perf_counter()
+
+
+def _httpx_record(response):
+    request = response.request
+    started = request.extensions.get("ally_started", time.perf_counter())
+    prompt_tokens, completion_tokens = _openai_usage(response.content)
+    record_upstream(_openai_upstream(request.url), time.perf_counter() - started, response.status_code,
+                    prompt_tokens, completion_tokens, request_bytes=len(request.content or b""),
+                    response_bytes=len(response.content))
+
+
+def _is_stream(response):
+    return response.headers.get("content-type", "").startswith("text/event-stream")
+
+
+def _httpx_response(response):
+    if _is_stream(response):
+        # Reading a stream here would buffer it; only its first byte is timed
+        started = response.request.extensions.get("ally_started", time.perf_counter())
+        record_upstream(_openai_upstream(response.request.url), time.perf_counter() - started,
+                        response.status_code, request_bytes=len(response.request.content or b""))
+        return
+    response.read()
+    _httpx_record(response)
+
+
+async def _httpx_request_async(request):
+    _httpx_request(request)
+
+
+async def _httpx_response_async(response):
+    if _is_stream(response):
+        _httpx_response(response)
+        return
+    await response.aread()
+    _httpx_record(response)
+
+
+def httpx_event_hooks(async_client=False):
+    """event_hooks for the httpx clients behind AzureOpenAI / AsyncAzureOpenAI."""
+    if not ENABLED:
+        return {}
+    if async_client:
+        return {"request": [_httpx_request_async], "response": [_httpx_response_async]}
+    return {"request": [_httpx_request], "response": [_httpx_response]}
+
+
+class SearchTelemetryPolicy(SansIOHTTPPolicy):
+    """azure-core policy recording every Azure AI Search call."""
+
+    def on_request(self, request):
+        request.context["ally_started"] = time.perf_counter()
+
+    def on_response(self, request, response):
+        http_request, http_response = request.http_request, response.http_response
+        path = urlsplit(http_request.url).path
+        if path.endswith("/docs/search.post.search"):
+            upstream = "search.query"
+        elif path.endswith("/docs/search.index"):
+            upstream = "search.index"
+        elif path.endswith("/search.stats"):
+            upstream = "search.stats"
+        else:
+            upstream = "search.other"
+        try:
+            body = http_response.body() or b""
+        except Exception:
+            # Not loaded yet (streamed download)
+            body = b""
+        hits = None
+        if upstream == "search.query" and body:
+            try:
+                hits = len(json.loads(body).get("value") or [])
+            except ValueError:
+                pass
+        request_body = http_request.body or b""
+        started = request.context.get("ally_started", time.perf_counter())
+        record_upstream(upstream, time.perf_counter() - started, http_response.status_code, hits=hits,
+                        request_bytes=len(request_body), response_bytes=len(body))
+
+
+def search_policies():
+    """per_call_policies for SearchClient / SearchIndexClient."""
+    return [SearchTelemetryPolicy()] if ENABLED else []
+
+
+# -----------------------------
+# Exposition
+# -----------------------------
+def _format_labels(labels):
+    return "{" + ",".join('{}="{}"'.format(k, str(v).replace("\\", "\\\\").replace('"', '\\"')) for k, v in labels) + "}"
+
+
+def render():
+    """Everything recorded by this process, in the Prometheus text format."""
+    with _lock:
+        counters = dict(_counters)
+        histograms = {key: list(value) for key, value in _histograms.items()}
+    lines = []
+    for name, (kind, help_text) in _HELP.items():
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} {kind}")
+        if kind == "counter":
+            for (metric, labels), value in sorted(counters.items()):
+                if metric == name:
+                    lines.append(f"{name}{_format_labels(labels)} {value}")
+            continue
+        for (metric, labels), values in sorted(histograms.items()):
+            if metric != name:
+                continue
+            for bound, count in zip(BUCKETS, values):
+                lines.append(f"{name}_bucket{_format_labels(labels + (('le', str(bound)),))} {count}")
+            lines.append(f"{name}_bucket{_format_labels(labels + (('le', '+Inf'),))} {values[-2]}")
+            lines.append(f"{name}_count{_format_labels(labels)} {values[-2]}")
+            lines.append(f"{name}_sum{_format_labels(labels)} {values[-1]}")
+    return "\n".join(lines) + "\n"
+
+
+# -----------------------------
+# Serving app
+# -----------------------------
+def create_app(engine="flask", **kwargs):
+    """PromptFlow's serving app plus GET /metrics, per-request timing and
+    the streaming flag the summary tools read (see streaming.py).
+
+    Used by runit/promptflow-serve/run in place of
+    promptflow.core._serving.app:create_app.
+    """
+    from promptflow.core._serving.app import create_app as create_promptflow_app
+
+    app = create_promptflow_app(engine=engine, **kwargs)
+    if engine == "flask":
+        _install_flask(app)
+    else:
+        _install_fastapi(app)
+    return app
+
+
+def _wants_breakdown(headers):
+    return headers.get(TIMING_HEADER, "").lower() in ("1", "on", "true", "yes")
+
+
+def _breakdown_headers(timings):
+    return {
+        "Server-Timing": timings.server_timing(),
+        # The add-in runs on another origin
+        "Timing-Allow-Origin": "*",
+        "Access-Control-Expose-Headers": "Server-Timing",
+    }
+
+
+def _install_flask(app):
+    from flask import Response, g, request
+
+    @app.before_request
+    def begin_ally_request():
+        if request.path == "/score":
+            body = request.get_json(silent=True) or {}
+            g.ally_request = begin_request(body.get("query_type") if isinstance(body, dict) else None)
+            g.ally_stream = streaming.begin_request(request.headers.get("Accept"))
+
+    @app.after_request
+    def end_ally_request(response):
+        state = g.pop("ally_request", None)
+        if state is not None:
+            timings = end_request(state, response.status_code)
+            if _wants_breakdown(request.headers):
+                response.headers.update(_breakdown_headers(timings))
+        return response
+
+    @app.teardown_request
+    def reset_ally_request(exc):
+        # after_request does not run when the view raises
+        state = g.pop("ally_request", None)
+        if state is not None:
+            end_request(state, 500)
+        stream = g.pop("ally_stream", None)
+        if stream is not None:
+            streaming.end_request(stream)
+
+    app.add_url_rule("/metrics", "ally_metrics",
+                     lambda: Response(render(), mimetype="text/plain; version=0.0.4"))
+
+
+def _install_fastapi(app):
+    from fastapi.responses import PlainTextResponse
+
+    @app.middleware("http")
+    async def ally_request(request, call_next):
+        if request.url.path != "/score":
+            return await call_next(request)
+        try:
+            body = json.loads(await request.body() or b"{}")
+        except ValueError:
+            body = {}
+        state = begin_request(body.get("query_type") if isinstance(body, dict) else None)
+        stream = streaming.begin_request(request.headers.get("accept"))
+        status = 500
+        try:
+            response = await call_next(request)
+            status = response.status_code
+        finally:
+            streaming.end_request(stream)
+            timings = end_request(state, status)
+        if _wants_breakdown(request.headers):
+            response.headers.update(_breakdown_headers(timings))
+        return response
+
+    async def metrics():
+        return PlainTextResponse(render(), media_type="text/plain; version=0.0.4")
+
+    app.add_api_route("/metrics", metrics, methods=["GET"])
@@ -0,0 +1,38 @@
+import threading
+
+import tiktoken
+
+# -----------------------------
+# Token counting
+# -----------------------------
+# One tokenizer cache for the embedding batches (cl100k_base, ada-002's
+# encoding) and the prompt budgets (the chat deployment's encoding).
+# tiktoken downloads an encoding's BPE file on first use; without network
+# access counts fall back to the usual ~4 characters per token estimate.
+EMBEDDING_ENCODING = "cl100k_base"
+
+_encodings = {}  # name -> tiktoken Encoding, or None when it could not be loaded
+_lock = threading.Lock()
+_warned = False
+
+
+def get_encoding(name=EMBEDDING_ENCODING):
+    """The tiktoken encoding `name`, or None when it cannot be loaded."""
+    global _warned
+    with _lock:
+        if name not in _encodings:
+            try:
+                _encodings[name] = tiktoken.get_encoding(name)
+            except Exception as e:
+                if not _warned:
+                    print(f"tiktoken unavailable, estimating token counts: {e}")
+                    _warned = True
+                _encodings[name] = None
+        return _encodings[name]
+
+
+def count_tokens(text, encoding_name=EMBEDDING_ENCODING):
+    encoding = get_encoding(encoding_name)
+    if encoding is None:
+        return len(text) // 4 + 1
+    return len(encoding.encode(text, disallowed_special=()))
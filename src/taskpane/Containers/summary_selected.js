@@ -96,7 +96,9 @@ async function processSelectedText(text, endpoint, language) {
   const response = await fetch(endpoint, {  
       method: 'POST',  
       headers: {  
-          'Content-Type': 'application/json'  
+          'Content-Type': 'application/json',
+          // Each PolicyItem is sent as its own event as soon as it is written
+          'Accept': 'text/event-stream'
       },  
       body: JSON.stringify({  
           query_type: 2,  
@@ -106,6 +108,12 @@ async function processSelectedText(text, endpoint, language) {
       })  
   });  
 
+  // The flow answers with plain JSON when there is nothing to stream (e.g. the warning)
+  if ((response.headers.get("Content-Type") || "").includes("text/event-stream")) {
+      await streamPolicyItems(response);
+      return;
+  }
+
   const data = await response.json();  
   console.log("Data", data)
   if (data.answer.warning) {  
@@ -179,12 +187,70 @@ function displayPolicyItems(policyItems) {
   });  
 
   // Always create the Review button at the end  
+  addReviewNextButton(container);
+}  
+
+// Display policy items one by one as their server-sent events arrive
+async function streamPolicyItems(response) {
+  const container = document.getElementById("policy-container");
+  const reader = response.body.getReader();
+  const decoder = new TextDecoder();
+  let buffer = "";
+  let count = 0;
+
+  while (true) {
+      const { value, done } = await reader.read();
+      buffer += decoder.decode(value || new Uint8Array(), { stream: !done });
+      // Events end with a blank line; the last part may still be incomplete
+      const events = buffer.split(/\r?\n\r?\n/);
+      buffer = done ? "" : events.pop();
+      events.forEach(event => {
+          const data = parseEventData(event);
+          if (!data || !data.answer || !data.answer.PolicyItem) {
+              return;
+          }
+          if (count === 0 && container) {
+              container.innerHTML = "";  // Clear the spinner
+          }
+          container.appendChild(createPolicyDiv(data.answer.PolicyItem, data.answer.index));
+          count++;
+      });
+      if (done) {
+          break;
+      }
+  }
+
+  if (count === 0) {
+      displayWarningMessage();
+  } else {
+      addReviewNextButton(container);
+  }
+}
+
+// The JSON payload of one server-sent event, or null
+function parseEventData(event) {
+  const data = event.split(/\r?\n/)
+      .filter(line => line.startsWith("data:"))
+      .map(line => line.slice(5).trim())
+      .join("\n");
+  if (!data || data === "[DONE]") {
+      return null;
+  }
+  try {
+      return JSON.parse(data);
+  } catch (error) {
+      console.log("Could not parse event: " + data);
+      return null;
+  }
+}
+
+function addReviewNextButton(container) {
   const reviewButton = document.createElement("button");  
   reviewButton.classList.add("search-button");  
   reviewButton.textContent = "Review Next";  
   reviewButton.addEventListener("click", summary);  
   container.appendChild(reviewButton);  
-}  
+}
 
 // Create a div for a policy item  
 function createPolicyDiv(item, index) {  
@@ -272,17 +272,30 @@ async function checkdocumentindex()
 {
   // check if the document has been indexed
   console.log("check index")
-  console.log(localStorage.getItem('filename'));
-  const response = await fetchData(localStorage.getItem('pfendpoint'), localStorage.getItem('filename'), localStorage.getItem('groups'));       
+  const filename = localStorage.getItem('filename');
+  console.log(filename);
+  // paint the last known answer for this file right away, the query below only corrects it
+  showIndexState(filename, localStorage.getItem('indexed:' + filename));
+
+  const response = await fetchData(localStorage.getItem('pfendpoint'), filename, localStorage.getItem('groups'));       
   const data = await response.json(); 
   console.log(data.answer.Found);
-  
-  if (data.answer.Found == false)
+  localStorage.setItem('indexed:' + filename, String(data.answer.Found));
+  showIndexState(filename, String(data.answer.Found));
+}
+
+function showIndexState(filename, found)
+{
+  // found is "true", "false" or null when the file has not been checked yet
+  if (found == "false")
   {
     document.getElementById("index-doc-container").style.display = "flex";    
     //change lebel filename-notindexed-label to the filename
-    document.getElementById("filename-notindexed-label").textContent = localStorage.getItem('filename');
-    
+    document.getElementById("filename-notindexed-label").textContent = filename;
+  }
+  else if (found == "true")
+  {
+    document.getElementById("index-doc-container").style.display = "none";
   }
 }
 